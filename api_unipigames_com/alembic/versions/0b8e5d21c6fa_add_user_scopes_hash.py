@@ -0,0 +1,34 @@
+"""Add user scopes hash
+
+Revision ID: 0b8e5d21c6fa
+Revises: f27a0d9c4b13
+Create Date: 2026-10-19 14:41:09.530274
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0b8e5d21c6fa'
+down_revision: Union[str, None] = 'f27a0d9c4b13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('user', sa.Column('scopes_hash', sa.String(length=64), nullable=True))
+
+    # Concurrent sign-ins could insert the same scope twice, keep the oldest row of each
+    op.execute("""
+        DELETE FROM user_scopes
+        WHERE id NOT IN (SELECT keep_id FROM (SELECT MIN(id) AS keep_id FROM user_scopes GROUP BY user_id, scope) AS keep)
+    """)
+    op.create_index('uq_user_scopes_user_scope', 'user_scopes', ['user_id', 'scope'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('uq_user_scopes_user_scope', table_name='user_scopes')
+    op.drop_column('user', 'scopes_hash')
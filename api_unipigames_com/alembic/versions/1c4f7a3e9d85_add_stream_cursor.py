@@ -0,0 +1,31 @@
+"""Add stream cursor
+
+Revision ID: 1c4f7a3e9d85
+Revises: 0b8e5d21c6fa
+Create Date: 2026-10-19 15:26:51.804117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1c4f7a3e9d85'
+down_revision: Union[str, None] = '0b8e5d21c6fa'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('stream_cursor',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('cursor', sa.String(length=100), nullable=False),
+    sa.Column('dateModified', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('stream_cursor')
@@ -0,0 +1,32 @@
+"""Add game listing indexes
+
+Revision ID: 2d7b9c1f4a60
+Revises: 1c4f7a3e9d85
+Create Date: 2026-10-19 16:02:14.538217
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2d7b9c1f4a60'
+down_revision: Union[str, None] = '1c4f7a3e9d85'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_game_status_id', 'game', ['status', 'id'], unique=False)
+    op.create_index('ix_game_status_end_time', 'game', ['status', 'end_time', 'id'], unique=False)
+    op.create_index('ix_game_type_id', 'game', ['game_type_id', 'id'], unique=False)
+    op.create_index('ix_game_config_game_id', 'game_config', ['game_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_game_config_game_id', table_name='game_config')
+    op.drop_index('ix_game_type_id', table_name='game')
+    op.drop_index('ix_game_status_end_time', table_name='game')
+    op.drop_index('ix_game_status_id', table_name='game')
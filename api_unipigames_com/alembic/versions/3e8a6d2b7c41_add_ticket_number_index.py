@@ -0,0 +1,92 @@
+"""Add ticket number index
+
+Revision ID: 3e8a6d2b7c41
+Revises: 2d7b9c1f4a60
+Create Date: 2026-10-19 16:48:37.102954
+
+Adds the canonical numbers_mask column and the ticket_number table and backfills both in
+primary-key batches, committing after each batch. Tickets written by workers still running
+the previous code during the rollout are caught up with `python -m src.utils.ticket_numbers backfill`.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3e8a6d2b7c41'
+down_revision: Union[str, None] = '2d7b9c1f4a60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# The mask format of src.utils.ticket_numbers at the time of this revision: bit n set for main
+# number n, written as fixed-width hex
+MASK_BITS = 128
+MASK_WIDTH = MASK_BITS // 4
+
+
+def ticket_numbers(numbers_played: str):
+    """Distinct main numbers of a ticket in mask range, or None when they cannot be indexed."""
+    try:
+        numbers = [int(value) for value in numbers_played.split(',') if value.strip()]
+    except (ValueError, AttributeError):
+        return None
+    if len(set(numbers)) != len(numbers) or any(number < 0 or number >= MASK_BITS for number in numbers):
+        return None
+    return sorted(numbers)
+
+
+def backfill(connection, batch_size: int):
+    select_batch = sa.text(
+        'SELECT id, game_id, numbers_played FROM ticket WHERE id > :last AND numbers_mask IS NULL ORDER BY id LIMIT :limit'
+    )
+    update_mask = sa.text('UPDATE ticket SET numbers_mask = :mask WHERE id = :id')
+    delete_numbers = sa.text('DELETE FROM ticket_number WHERE ticket_id IN :ids').bindparams(sa.bindparam('ids', expanding=True))
+    insert_number = sa.text('INSERT INTO ticket_number (ticket_id, game_id, number) VALUES (:ticket_id, :game_id, :number)')
+
+    last = 0
+    while True:
+        rows = connection.execute(select_batch, {'last': last, 'limit': batch_size}).all()
+        if not rows:
+            break
+
+        masks, numbers = [], []
+        for ticket_id, game_id, numbers_played in rows:
+            played = ticket_numbers(numbers_played)
+            if played is None:
+                continue
+            masks.append({'id': ticket_id, 'mask': format(sum(1 << number for number in played), f'0{MASK_WIDTH}x')})
+            numbers += [{'ticket_id': ticket_id, 'game_id': game_id, 'number': number} for number in played]
+
+        if masks:
+            connection.execute(delete_numbers, {'ids': [row['id'] for row in masks]})
+            if numbers:
+                connection.execute(insert_number, numbers)
+            connection.execute(update_mask, masks)
+        last = rows[-1][0]
+
+
+def upgrade() -> None:
+    op.add_column('ticket', sa.Column('numbers_mask', sa.String(length=32), nullable=True))
+    op.create_index('ix_ticket_game_numbers', 'ticket', ['game_id', 'numbers_mask', 'power_number'], unique=False)
+    op.create_table('ticket_number',
+    sa.Column('ticket_id', sa.Integer(), nullable=False),
+    sa.Column('number', sa.Integer(), nullable=False),
+    sa.Column('game_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['game_id'], ['game.id'], ),
+    sa.ForeignKeyConstraint(['ticket_id'], ['ticket.id'], ),
+    sa.PrimaryKeyConstraint('ticket_id', 'number')
+    )
+    op.create_index('ix_ticket_number_game_number', 'ticket_number', ['game_id', 'number', 'ticket_id'], unique=False)
+
+    # Each batch commits on its own instead of holding one transaction over the whole table
+    with op.get_context().autocommit_block():
+        backfill(op.get_bind(), batch_size=1000)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_ticket_number_game_number', table_name='ticket_number')
+    op.drop_table('ticket_number')
+    op.drop_index('ix_ticket_game_numbers', table_name='ticket')
+    op.drop_column('ticket', 'numbers_mask')
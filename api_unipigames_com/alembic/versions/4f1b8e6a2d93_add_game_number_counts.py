@@ -0,0 +1,45 @@
+"""Add game number counts
+
+Revision ID: 4f1b8e6a2d93
+Revises: 3e8a6d2b7c41
+Create Date: 2026-10-19 18:05:12.447310
+
+Counts are filled from ticket_number and ticket in the migration's transaction. Tickets
+written by workers still running the previous code during the rollout are caught up with
+`python -m src.utils.ticket_numbers recount`.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4f1b8e6a2d93'
+down_revision: Union[str, None] = '3e8a6d2b7c41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('game_number_count',
+    sa.Column('game_id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=10), nullable=False),
+    sa.Column('number', sa.Integer(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['game_id'], ['game.id'], ),
+    sa.PrimaryKeyConstraint('game_id', 'kind', 'number')
+    )
+
+    op.execute(
+        "INSERT INTO game_number_count (game_id, kind, number, count) "
+        "SELECT game_id, 'main', number, COUNT(*) FROM ticket_number GROUP BY game_id, number"
+    )
+    op.execute(
+        "INSERT INTO game_number_count (game_id, kind, number, count) "
+        "SELECT game_id, 'power', power_number, COUNT(*) FROM ticket GROUP BY game_id, power_number"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('game_number_count')
@@ -0,0 +1,99 @@
+"""Store fees and winnings as money units
+
+Revision ID: 7b3d5e9a1c28
+Revises: 4f1b8e6a2d93
+Create Date: 2026-10-19 19:12:40.215873
+
+Game entry fees and ticket winnings get *_units BIGINT columns next to their float columns,
+backfilled in primary-key batches like e81f4c3a9b62. The new code mirrors writes into the
+float columns, and rows changed by workers still on the old code during the rollout are
+caught up with `python -m src.utils.money backfill`.
+
+The leaderboard and game stats rollups are only written by this code's listeners, so their
+float columns are converted in place and dropped.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7b3d5e9a1c28'
+down_revision: Union[str, None] = '4f1b8e6a2d93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MONEY_SCALE = 10_000_000
+
+# (table, primary key, legacy float column, integer units column) converted by this revision
+MONEY_COLUMNS = [
+    ('game', 'id', 'entry_fee', 'entry_fee_units'),
+    ('lotto_stats', 'id', 'win_amount', 'win_amount_units'),
+]
+
+# (table, float column, integer units column, index) of the rollups
+ROLLUP_COLUMNS = [
+    ('user_leaderboard', 'total_won', 'total_won_units', 'ix_user_leaderboard_total_won'),
+    ('user_leaderboard', 'biggest_win', 'biggest_win_units', 'ix_user_leaderboard_biggest_win'),
+    ('game_stats', 'total_won', 'total_won_units', None),
+]
+
+
+def backfill(connection, batch_size: int):
+    for table, pk, legacy, units in MONEY_COLUMNS:
+        converted = f"CAST(ROUND(COALESCE({legacy}, 0) * {MONEY_SCALE}) AS BIGINT)"
+        select_first = sa.text(f'SELECT {pk} FROM "{table}" ORDER BY {pk} LIMIT :limit')
+        select_next = sa.text(f'SELECT {pk} FROM "{table}" WHERE {pk} > :last ORDER BY {pk} LIMIT :limit')
+        update_batch = sa.text(
+            f'UPDATE "{table}" SET {units} = {converted} '
+            f'WHERE {pk} IN :keys AND ({units} IS NULL OR {units} <> {converted})'
+        ).bindparams(sa.bindparam('keys', expanding=True))
+
+        last = None
+        while True:
+            if last is None:
+                keys = connection.execute(select_first, {'limit': batch_size}).scalars().all()
+            else:
+                keys = connection.execute(select_next, {'last': last, 'limit': batch_size}).scalars().all()
+            if not keys:
+                break
+
+            connection.execute(update_batch, {'keys': keys})
+            last = keys[-1]
+
+
+def upgrade() -> None:
+    for table, legacy, units, index in ROLLUP_COLUMNS:
+        op.add_column(table, sa.Column(units, sa.BigInteger(), nullable=True))
+        op.execute(f'UPDATE {table} SET {units} = CAST(ROUND(COALESCE({legacy}, 0) * {MONEY_SCALE}) AS BIGINT)')
+        if index:
+            op.drop_index(index, table_name=table)
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column(units, existing_type=sa.BigInteger(), nullable=False)
+            batch_op.drop_column(legacy)
+        if index:
+            op.create_index(index, table, [units], unique=False)
+
+    for table, _, _, units in MONEY_COLUMNS:
+        op.add_column(table, sa.Column(units, sa.BigInteger(), nullable=True))
+
+    # Each batch commits on its own instead of holding one transaction over the whole table
+    with op.get_context().autocommit_block():
+        backfill(op.get_bind(), batch_size=1000)
+
+
+def downgrade() -> None:
+    for table, _, _, units in reversed(MONEY_COLUMNS):
+        op.drop_column(table, units)
+
+    for table, legacy, units, index in reversed(ROLLUP_COLUMNS):
+        op.add_column(table, sa.Column(legacy, sa.Float(), nullable=True))
+        op.execute(f'UPDATE {table} SET {legacy} = CAST({units} AS FLOAT) / {MONEY_SCALE}')
+        if index:
+            op.drop_index(index, table_name=table)
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column(legacy, existing_type=sa.Float(), nullable=False)
+            batch_op.drop_column(units)
+        if index:
+            op.create_index(index, table, [legacy], unique=False)
@@ -0,0 +1,26 @@
+"""Add transaction expiry index
+
+Revision ID: a3c91e7d5f20
+Revises: d6a4ff053bc4
+Create Date: 2026-10-19 13:10:02.114387
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3c91e7d5f20'
+down_revision: Union[str, None] = 'd6a4ff053bc4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_transaction_status_type_modified', 'transaction', ['status', 'transaction_type', 'dateModified'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_transaction_status_type_modified', table_name='transaction')
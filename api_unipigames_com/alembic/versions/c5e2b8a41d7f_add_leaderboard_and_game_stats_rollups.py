@@ -0,0 +1,76 @@
+"""Add leaderboard and game stats rollups
+
+Revision ID: c5e2b8a41d7f
+Revises: a3c91e7d5f20
+Create Date: 2026-10-19 13:18:44.503112
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5e2b8a41d7f'
+down_revision: Union[str, None] = 'a3c91e7d5f20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('user_leaderboard',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('total_won', sa.Float(), nullable=False),
+    sa.Column('biggest_win', sa.Float(), nullable=False),
+    sa.Column('tickets_played', sa.Integer(), nullable=False),
+    sa.Column('games_played', sa.Integer(), nullable=False),
+    sa.Column('dateModified', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_index('ix_user_leaderboard_total_won', 'user_leaderboard', ['total_won'], unique=False)
+    op.create_index('ix_user_leaderboard_biggest_win', 'user_leaderboard', ['biggest_win'], unique=False)
+    op.create_index('ix_user_leaderboard_tickets_played', 'user_leaderboard', ['tickets_played'], unique=False)
+
+    op.create_table('game_stats',
+    sa.Column('game_id', sa.Integer(), nullable=False),
+    sa.Column('tickets_sold', sa.Integer(), nullable=False),
+    sa.Column('players', sa.Integer(), nullable=False),
+    sa.Column('winners', sa.Integer(), nullable=False),
+    sa.Column('total_won', sa.Float(), nullable=False),
+    sa.Column('dateModified', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['game_id'], ['game.id'], ),
+    sa.PrimaryKeyConstraint('game_id')
+    )
+
+    op.create_index('ix_ticket_game_user', 'ticket', ['game_id', 'user_id'], unique=False)
+
+    # Seed the rollups from the existing history, later changes are applied incrementally
+    op.execute("""
+        INSERT INTO game_stats (game_id, tickets_sold, players, winners, total_won, "dateModified")
+        SELECT t.game_id, COUNT(*), COUNT(DISTINCT t.user_id),
+               COALESCE((SELECT COUNT(*) FROM lotto_stats s WHERE s.game_id = CAST(t.game_id AS VARCHAR(100)) AND s.win_amount > 0), 0),
+               COALESCE((SELECT SUM(s.win_amount) FROM lotto_stats s WHERE s.game_id = CAST(t.game_id AS VARCHAR(100))), 0),
+               CURRENT_TIMESTAMP
+        FROM ticket t
+        GROUP BY t.game_id
+    """)
+    op.execute("""
+        INSERT INTO user_leaderboard (user_id, total_won, biggest_win, tickets_played, games_played, "dateModified")
+        SELECT t.user_id,
+               COALESCE((SELECT SUM(s.win_amount) FROM lotto_stats s WHERE s.user_id = t.user_id), 0),
+               COALESCE((SELECT MAX(s.win_amount) FROM lotto_stats s WHERE s.user_id = t.user_id), 0),
+               COUNT(*), COUNT(DISTINCT t.game_id), CURRENT_TIMESTAMP
+        FROM ticket t
+        GROUP BY t.user_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_ticket_game_user', table_name='ticket')
+    op.drop_table('game_stats')
+    op.drop_index('ix_user_leaderboard_tickets_played', table_name='user_leaderboard')
+    op.drop_index('ix_user_leaderboard_biggest_win', table_name='user_leaderboard')
+    op.drop_index('ix_user_leaderboard_total_won', table_name='user_leaderboard')
+    op.drop_table('user_leaderboard')
@@ -0,0 +1,77 @@
+"""Store money as integer units
+
+Revision ID: e81f4c3a9b62
+Revises: c5e2b8a41d7f
+Create Date: 2026-10-19 13:24:10.872311
+
+Expand step of the float to fixed-point money migration:
+
+1. This revision adds nullable *_units BIGINT columns next to the float columns and backfills
+   them in primary-key batches, committing after each batch, so it can run on a live database.
+   It is resumable: an interrupted run only converts the rows that are still missing.
+2. Deploy the new code. It reads and writes the units columns and mirrors every write into the
+   float columns, so workers still on the old code keep seeing correct values.
+3. Once every worker runs the new code, catch up rows that old workers changed during the
+   rollout with `python -m src.utils.money backfill`.
+4. A later revision makes the units columns NOT NULL and drops the float columns.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e81f4c3a9b62'
+down_revision: Union[str, None] = 'c5e2b8a41d7f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MONEY_SCALE = 10_000_000
+
+# (table, primary key, legacy float column, integer units column) converted by this revision
+MONEY_COLUMNS = [
+    ('user', 'id', 'balance', 'balance_units'),
+    ('game', 'id', 'pool_amount', 'pool_amount_units'),
+    ('transaction', 'id', 'amount', 'amount_units'),
+    ('account_transaction', 'id', 'amount', 'amount_units'),
+    ('payment', 'id', 'amount', 'amount_units'),
+]
+
+
+def backfill(connection, batch_size: int):
+    # Same conversion as src.utils.money.backfill_money_columns at the time of this revision
+    for table, pk, legacy, units in MONEY_COLUMNS:
+        converted = f"CAST(ROUND(COALESCE({legacy}, 0) * {MONEY_SCALE}) AS BIGINT)"
+        select_first = sa.text(f'SELECT {pk} FROM "{table}" ORDER BY {pk} LIMIT :limit')
+        select_next = sa.text(f'SELECT {pk} FROM "{table}" WHERE {pk} > :last ORDER BY {pk} LIMIT :limit')
+        update_batch = sa.text(
+            f'UPDATE "{table}" SET {units} = {converted} '
+            f'WHERE {pk} IN :keys AND ({units} IS NULL OR {units} <> {converted})'
+        ).bindparams(sa.bindparam('keys', expanding=True))
+
+        last = None
+        while True:
+            if last is None:
+                keys = connection.execute(select_first, {'limit': batch_size}).scalars().all()
+            else:
+                keys = connection.execute(select_next, {'last': last, 'limit': batch_size}).scalars().all()
+            if not keys:
+                break
+
+            connection.execute(update_batch, {'keys': keys})
+            last = keys[-1]
+
+
+def upgrade() -> None:
+    for table, _, _, units in MONEY_COLUMNS:
+        op.add_column(table, sa.Column(units, sa.BigInteger(), nullable=True))
+
+    # Each batch commits on its own instead of holding one transaction over the whole table
+    with op.get_context().autocommit_block():
+        backfill(op.get_bind(), batch_size=1000)
+
+
+def downgrade() -> None:
+    for table, _, _, units in reversed(MONEY_COLUMNS):
+        op.drop_column(table, units)
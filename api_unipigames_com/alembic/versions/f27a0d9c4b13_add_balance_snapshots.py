@@ -0,0 +1,58 @@
+"""Add balance snapshots
+
+Revision ID: f27a0d9c4b13
+Revises: e81f4c3a9b62
+Create Date: 2026-10-19 14:02:37.118406
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f27a0d9c4b13'
+down_revision: Union[str, None] = 'e81f4c3a9b62'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('balance_snapshot',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('balance_units', sa.BigInteger(), nullable=False),
+    sa.Column('last_entry_id', sa.Integer(), nullable=False),
+    sa.Column('taken_at', sa.DateTime(), nullable=False),
+    sa.Column('dateCreated', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_balance_snapshot_user_taken_at', 'balance_snapshot', ['user_id', 'taken_at'], unique=False)
+    op.create_index('ix_balance_snapshot_user_entry', 'balance_snapshot', ['user_id', 'last_entry_id'], unique=False)
+    op.create_index('ix_account_transaction_user_id_id', 'account_transaction', ['user_id', 'id'], unique=False)
+    op.create_index('ix_account_transaction_user_date', 'account_transaction', ['user_id', 'dateCreated'], unique=False)
+
+    # Deposits and withdrawals changed balances without a ledger entry until now. The difference
+    # between each balance and its ledger total becomes the user's opening snapshot, so
+    # replaying the ledger from it gives the current balance.
+    op.execute("""
+        INSERT INTO balance_snapshot (user_id, balance_units, last_entry_id, taken_at, "dateCreated")
+        SELECT u.id,
+               COALESCE(u.balance_units, 0) - COALESCE((
+                   SELECT SUM(CASE WHEN a.transaction_type IN ('withdrawal', 'game_entry', 'lotto_entry')
+                                   THEN -a.amount_units ELSE a.amount_units END)
+                   FROM account_transaction a WHERE a.user_id = u.id
+               ), 0),
+               0, COALESCE(u."dateCreated", CURRENT_TIMESTAMP), CURRENT_TIMESTAMP
+        FROM "user" u
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_account_transaction_user_date', table_name='account_transaction')
+    op.drop_index('ix_account_transaction_user_id_id', table_name='account_transaction')
+    op.drop_index('ix_balance_snapshot_user_entry', table_name='balance_snapshot')
+    op.drop_index('ix_balance_snapshot_user_taken_at', table_name='balance_snapshot')
+    op.drop_table('balance_snapshot')
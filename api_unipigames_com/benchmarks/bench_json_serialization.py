@@ -0,0 +1,75 @@
+# benchmarks/bench_json_serialization.py
+#
+# Compares the stdlib JSON response used before with the project's orjson-backed JSONResponse
+# for the two largest list payloads: a 1,000-game catalog and a 10,000-ticket history.
+#
+# Usage: python -m benchmarks.bench_json_serialization [--repeat=20]
+import sys
+import timeit
+import datetime
+from starlette.responses import JSONResponse as StdlibJSONResponse
+from src.utils.utils import JSONResponse
+
+
+def build_games(count: int, isoformat: bool):
+    now = datetime.datetime(2024, 5, 15, 19, 48, 54, 957004)
+    games = []
+    for i in range(count):
+        end_time = now + datetime.timedelta(hours=i)
+        games.append({
+            "id": i,
+            "name": f"Pi Lotto #{i}",
+            "game_type": "lotto",
+            "pool_amount": 1234.5 + i,
+            "entry_fee": 3.14,
+            "end_time": end_time.isoformat() if isoformat else end_time,
+            "status": "active",
+            "winner_id": None,
+            "dateCreated": now.isoformat() if isoformat else now,
+            "dateModified": now.isoformat() if isoformat else now,
+            "max_players": 1000,
+            "game_config": {
+                "entry_fee": "3.14",
+                "service_fee": "0.1",
+                "max_players": "1000",
+                "number_range": '{"main": [1, 70], "power": [1, 25]}'
+            }
+        })
+    return {"games": games}
+
+
+def build_tickets(count: int, isoformat: bool):
+    now = datetime.datetime(2024, 5, 15, 19, 48, 54, 957004)
+    tickets = []
+    for i in range(count):
+        purchased = now + datetime.timedelta(minutes=i)
+        tickets.append({
+            'ticket_id': i,
+            'game_id': i % 50,
+            'game_name': f"Pi Lotto #{i % 50}",
+            'numbers_played': '4,18,23,42,61',
+            'power_number': 7,
+            'date_purchased': purchased.isoformat() if isoformat else purchased,
+            'won': i % 97 == 0,
+            'prize_claimed': False
+        })
+    return {'tickets': tickets}
+
+
+def bench(label: str, builder, count: int, repeat: int):
+    # The old path formats datetimes in Python before encoding, the new one hands them to orjson
+    stdlib = min(timeit.repeat(lambda: StdlibJSONResponse(builder(count, True)), number=1, repeat=repeat))
+    fast = min(timeit.repeat(lambda: JSONResponse(builder(count, False)), number=1, repeat=repeat))
+
+    print(f"{label:<24} stdlib: {stdlib * 1000:8.2f} ms   orjson: {fast * 1000:8.2f} ms   speedup: {stdlib / fast:5.1f}x")
+
+
+if __name__ == "__main__":
+    repeat = 20
+    for arg in sys.argv:
+        if arg.startswith("--repeat="):
+            repeat = int(arg.split("=")[1])
+
+    print(f"Best of {repeat} runs, building and serializing the payload")
+    bench("1,000-game catalog", build_games, 1000, repeat)
+    bench("10,000-ticket history", build_tickets, 10000, repeat)
@@ -0,0 +1,93 @@
+# benchmarks/bench_startup.py
+#
+# Measures how long a fresh worker takes to import the app and to run its startup handlers,
+# and reports where import time goes (python -X importtime), so that a module doing network
+# or heavy work at import shows up. Every run is a new interpreter, as a gunicorn worker is.
+# Run from the directory holding config/config.yml.
+#
+# Usage: python -m benchmarks.bench_startup [--repeat=5] [--top=20] [--report=import_profile.txt]
+import re
+import sys
+import json
+import statistics
+import subprocess
+
+# Run in the child: time the import of main, then the startup and shutdown handlers
+CHILD = """
+import time, json, asyncio
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+asyncio.run(main.app.router.startup())
+ready = time.perf_counter()
+asyncio.run(main.app.router.shutdown())
+print(json.dumps({'import': imported - started, 'startup': ready - imported}))
+"""
+
+IMPORT_TIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)')
+
+
+def time_startup(repeat: int):
+    imports, startups = [], []
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, '-c', CHILD], capture_output=True, text=True, check=True)
+        timings = json.loads(result.stdout.strip().splitlines()[-1])
+        imports.append(timings['import'])
+        startups.append(timings['startup'])
+    return imports, startups
+
+
+def import_profile():
+    """(self_us, cumulative_us, depth, module) for every module imported by main."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import main'], capture_output=True, text=True, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            rows.append((int(match.group(1)), int(match.group(2)), len(match.group(3)) // 2, match.group(4)))
+    return rows
+
+
+def format_profile(rows, top: int):
+    lines = []
+    total = next((cumulative for _, cumulative, _, module in rows if module == 'main'), 0)
+    lines.append(f"Importing main: {total / 1000:.1f} ms")
+
+    # Direct imports of main and the app's own modules, by cumulative time
+    lines.append("")
+    lines.append(f"{'cumulative ms':>14} {'self ms':>9}  app module")
+    app_rows = [row for row in rows if row[3].startswith('src.') or row[2] == 1]
+    for self_us, cumulative_us, _, module in sorted(app_rows, key=lambda row: -row[1])[:top]:
+        lines.append(f"{cumulative_us / 1000:14.1f} {self_us / 1000:9.1f}  {module}")
+
+    # Modules whose own body is slow, wherever they are imported from
+    lines.append("")
+    lines.append(f"{'self ms':>14}  module")
+    for self_us, _, _, module in sorted(rows, key=lambda row: -row[0])[:top]:
+        lines.append(f"{self_us / 1000:14.1f}  {module}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    repeat = 5
+    top = 20
+    report = None
+    for arg in sys.argv:
+        if arg.startswith("--repeat="):
+            repeat = int(arg.split("=")[1])
+        if arg.startswith("--top="):
+            top = int(arg.split("=")[1])
+        if arg.startswith("--report="):
+            report = arg.split("=")[1]
+
+    imports, startups = time_startup(repeat)
+    print(f"{repeat} fresh interpreters")
+    print(f"import main        median: {statistics.median(imports) * 1000:8.1f} ms   best: {min(imports) * 1000:8.1f} ms")
+    print(f"startup handlers   median: {statistics.median(startups) * 1000:8.1f} ms   best: {min(startups) * 1000:8.1f} ms")
+    print()
+
+    profile = format_profile(import_profile(), top)
+    print(profile)
+    if report:
+        with open(report, 'w') as file:
+            file.write(profile + "\n")
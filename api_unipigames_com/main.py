@@ -1,12 +1,22 @@
 # main.py
 
+import asyncio
 import multiprocessing
 import sys
 from src.utils.utils import logging, JSONResponse
 from src.dependencies import get_config, app, APIRouter, Request, status
 from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.cron import CronTrigger
-from src.db.database import update_pool_amount, cancel_old_pending_lotto_entries
+from src.db.database import create_schema, update_pool_amount, expire_stale_pending_transactions
+from src.utils.game_scheduler import game_scheduler
+from src.utils.confirmation_store import confirmation_store
+from src.utils.payment_stream import payment_stream
+from src.utils.reconciliation import payment_reconciler
+from src.utils.balance_history import run_balance_snapshots, run_balance_verification
+from src.utils.single_flight import single_flight_metrics
+from src.utils.cache import cache
+from src.utils.startup import file_lock, pi_network_warmup, leader_election, SCHEMA_LOCK_PATH
+from src.utils.health import health_checker
+from src.utils.live_updates import game_update_hub
 from src.utils.utils import load_config
 
 # Import the route files
@@ -33,7 +43,7 @@ app.include_router(api_router)
 @app.exception_handler(Exception)
 async def exception_handler(request: Request, exc: Exception):
     # Log the exception
-    logging.error(f"Unhandled exception: {str(exc)}")
+    logging.error("Unhandled exception: %s", exc)
 
     # Return an appropriate error response
     return JSONResponse(
@@ -41,10 +51,74 @@ async def exception_handler(request: Request, exc: Exception):
         content={"message": "An internal server error occurred"},
     )
 
+# Periodic jobs, only running in the leader worker
+scheduler = None
+
+@app.on_event("startup")
+async def start_background_workers():
+    if config.get('startup', {}).get('createSchema', True):
+        # Workers start together, one at a time creates whatever tables are missing
+        with file_lock(SCHEMA_LOCK_PATH):
+            create_schema()
+
+    confirmation_store.start()
+    game_update_hub.start(asyncio.get_running_loop())
+    # Horizon is connected in the background, the worker serves requests meanwhile
+    pi_network_warmup.start()
+    leader_election.start(start_singleton_jobs)
+
+def start_singleton_jobs():
+    global scheduler
+    # Games are closed by the leader, the other workers signal their edits through the shared cache tier.
+    # Draw handlers are registered with game_scheduler.register_draw_handler before this, see README
+    game_scheduler.start()
+    scheduler = start_scheduler()
+    if config.get('horizon_stream', {}).get('enabled', True):
+        payment_stream.start()
+
+@app.on_event("shutdown")
+async def stop_background_workers():
+    game_update_hub.stop()
+    pi_network_warmup.stop()
+    if leader_election.is_leader:
+        game_scheduler.stop()
+        if scheduler is not None:
+            scheduler.shutdown(wait=False)
+        payment_stream.stop()
+    leader_election.stop()
+    # Flush queued payment confirmations before the worker exits
+    confirmation_store.close()
+
 @app.get("/")
 async def read_root():
     return {"message": "Welcome to the Pi Lotto API"}
 
+@app.get("/healthz")
+async def liveness():
+    # Answered by the event loop alone, a worker that cannot reply here should be restarted
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readiness():
+    # Dependency probes are cached for a few seconds, see src/utils/health.py
+    ready, body = await health_checker.readiness(scheduler)
+    return JSONResponse(body, status_code=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE)
+
+@app.get("/metrics/single-flight")
+async def get_single_flight_metrics():
+    # Requests, upstream executions and the share of requests that reused an in-flight call, per use site
+    return single_flight_metrics()
+
+@app.get("/metrics/cache")
+async def get_cache_metrics():
+    # Hits served by this worker's local tier and by the shared tier, and misses that were rebuilt
+    return cache.stats
+
+@app.get("/metrics/reconciliation")
+async def get_reconciliation_metrics():
+    # Backlog of payments the last reconciliation sweep could not resolve
+    return payment_reconciler.backlog
+
 @app.get("/loaderio-28b24b7ab3f2743ac5e4b68dcdf851bf/")
 async def loaderio_verification():
     msg = 'loaderio-28b24b7ab3f2743ac5e4b68dcdf851bf'
@@ -56,8 +130,13 @@ async def loaderio_verification():
 def start_scheduler():
     scheduler = BackgroundScheduler()
     scheduler.add_job(update_pool_amount, 'interval', minutes=1, id='update_pool_amount')
-    scheduler.add_job(cancel_old_pending_lotto_entries, CronTrigger(hour=3, minute=0), id='cancel_lotto_transactions_daily') # Schedule to run once a day at 3 AM
+    scheduler.add_job(expire_stale_pending_transactions, 'interval', minutes=config.get('transactions', {}).get('expiry', {}).get('interval_minutes', 5), id='expire_stale_pending_transactions')
+    scheduler.add_job(payment_reconciler.sweep, 'interval', minutes=config.get('reconciliation', {}).get('intervalMinutes', 5), id='reconcile_payments')
+    history_config = config.get('balance_history', {})
+    scheduler.add_job(run_balance_snapshots, 'interval', minutes=history_config.get('snapshotIntervalMinutes', 15), id='balance_snapshots')
+    scheduler.add_job(run_balance_verification, 'interval', hours=history_config.get('verifyIntervalHours', 24), id='balance_verification')
     scheduler.start()
+    return scheduler
 
 def serve(use_gunicorn, n_workers, host, port):
     import uvicorn
@@ -73,8 +152,6 @@ def serve(use_gunicorn, n_workers, host, port):
         response = await call_next(request)
         return response
 
-    start_scheduler()
-
     if use_gunicorn:
         from gunicorn.app.wsgiapp import WSGIApplication
 
@@ -2,6 +2,8 @@ import json
 import requests
 from src.db.models import SignInResponse, SignInRequest, Session
 from src.utils.utils import JSONResponse
+from src.utils.token_cache import verified_token_cache
+from src.utils.rate_limit import rate_limit
 from src.utils.transactions import update_user_data, create_access_token, Annotated, logging, colorama
 from src.auth import DEV_DOCS_PASSWORD, SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, OAuth2PasswordRequestForm, JWTError, jwt
 from src.db.models import User, Session
@@ -11,7 +13,14 @@ from src.dependencies import get_db_session, get_config , Depends, Request, stat
 auth_router = APIRouter()
 
 
-@app.post("/signin", response_model=SignInResponse)
+def fetch_pi_user(access_token: str):
+    headers = {'Authorization': f'Bearer {access_token}'}
+    response = requests.get(f"{get_config()['api']['base_url']}/v2/me", headers=headers)
+    response.raise_for_status()
+    return response.json()
+
+
+@app.post("/signin", response_model=SignInResponse, dependencies=[Depends(rate_limit('signin'))])
 async def signin(request: SignInRequest, db: Session = Depends(get_db_session), config: dict = Depends(get_config)):
 
     """
@@ -39,15 +48,8 @@ async def signin(request: SignInRequest, db: Session = Depends(get_db_session),
         auth_result = data['authResult']
         access_token = auth_result['accessToken']
 
-        # Verify with the user's access token
-        headers = {'Authorization': f'Bearer {access_token}'}
-        response = requests.get(f"{config['api']['base_url']}/v2/me", headers=headers)
-        response.raise_for_status()
-        user_data = response.json()
-
-        # Check if the response status is 200
-        if response.status_code != 200:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Invalid authorization')
+        # Verify with the user's access token. Recently verified tokens are answered from the cache
+        user_data = await verified_token_cache.get_or_fetch(access_token, fetch_pi_user)
 
         # Check if response user data is not empty
         if user_data is None:
@@ -65,11 +67,11 @@ async def signin(request: SignInRequest, db: Session = Depends(get_db_session),
         refresh_token = create_access_token(data={"sub": user.username}, expires_delta=refresh_token_expires)
 
 
-        logging.info(colorama.Fore.GREEN + f"SIGNIN: User {user.username} signed in successfully")
+        logging.info(colorama.Fore.GREEN + "SIGNIN: User %s signed in successfully", user.username)
         return JSONResponse({'access_token': access_token, 'refresh_token': refresh_token})
 
     except KeyError as e:
-            logging.error(f"Missing key in request body: {str(e)}")
+            logging.error("Missing key in request body: %s", e)
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Missing key in request body: {str(e)}")
 
     except requests.exceptions.RequestException as err:
@@ -97,7 +99,7 @@ if get_config()['app']['debug'] == True:
 
             return {"error": "User not found"}
         except HTTPException as e:
-            logging.error(f"Error logging in: {str(e)}")
+            logging.error("Error logging in: %s", e)
             raise e
 
 @app.post("/refresh-token")
@@ -131,8 +133,8 @@ async def refresh_token(request: Request, db: Session = Depends(get_db_session),
         return {"access_token": access_token}
 
     except HTTPException as e:
-        logging.error(f"Error refreshing token: {str(e)}")
+        logging.error("Error refreshing token: %s", e)
         raise e
     except Exception as e:
-        logging.error(f"Error refreshing token: {str(e)}")
+        logging.error("Error refreshing token: %s", e)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to refresh token")
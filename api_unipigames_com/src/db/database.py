@@ -1,9 +1,12 @@
 # src/db/database.py
 
-from sqlalchemy import create_engine, event
+from sqlalchemy import create_engine, event, update
 from sqlalchemy.orm import sessionmaker
-from src.db.models import Base, Session, Ticket, Game, Transaction, after_insert_ticket, after_update_ticket, after_update_game_winner
-from src.utils.utils import load_config
+from src.db.models import Base, Session, Ticket, Game, Transaction, LottoStats, LEGACY_MONEY_ATTRIBUTES, mirror_legacy_money, after_insert_ticket, after_update_ticket, after_delete_ticket, after_update_game_winner, after_update_lotto_stats
+from src.utils.utils import load_config, logging
+from src.utils.audit_log import append_transaction_log, flush_transaction_logs, discard_transaction_logs
+from src.utils.response_cache import track_catalog_changes, track_catalog_statements, invalidate_on_commit, forget_catalog_changes
+from src.utils.live_updates import track_game_changes, publish_on_commit, forget_game_changes
 from sqlalchemy.sql import func
 import datetime
 
@@ -14,13 +17,36 @@ config = load_config()
 engine = create_engine(config['database']['uri'])
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-# Create all tables
-Base.metadata.create_all(bind=engine)
-
 # Attach the listeners to the Ticket and Game models
 event.listen(Ticket, 'after_insert', after_insert_ticket)
 event.listen(Ticket, 'after_update', after_update_ticket)
+event.listen(Ticket, 'after_delete', after_delete_ticket)
 event.listen(Game, 'after_update', after_update_game_winner)
+event.listen(LottoStats, 'after_update', after_update_lotto_stats)
+
+# Keep the legacy float money columns in step while workers still running the float code may read them
+for money_model in LEGACY_MONEY_ATTRIBUTES:
+    event.listen(money_model, 'before_insert', mirror_legacy_money)
+    event.listen(money_model, 'before_update', mirror_legacy_money)
+
+# Buffered transaction logs are written in a single batched insert as part of each commit
+event.listen(SessionLocal, 'before_commit', flush_transaction_logs)
+event.listen(SessionLocal, 'after_rollback', discard_transaction_logs)
+
+# Committed changes to games, game types and configs invalidate the cached public catalog responses
+event.listen(SessionLocal, 'after_flush', track_catalog_changes)
+event.listen(SessionLocal, 'do_orm_execute', track_catalog_statements)
+event.listen(SessionLocal, 'after_commit', invalidate_on_commit)
+event.listen(SessionLocal, 'after_rollback', forget_catalog_changes)
+
+# Committed ticket purchases and game changes are pushed to live update connections
+event.listen(SessionLocal, 'after_flush', track_game_changes)
+event.listen(SessionLocal, 'after_commit', publish_on_commit)
+event.listen(SessionLocal, 'after_rollback', forget_game_changes)
+
+def create_schema():
+    # Run by the startup handler rather than at import; alembic migrations change existing tables
+    Base.metadata.create_all(bind=engine)
 
 def get_db():
     db = SessionLocal()
@@ -51,21 +77,65 @@ def update_pool_amount():
     finally:
         session.close()
 
-def cancel_old_pending_lotto_entries():
-    session = SessionLocal()
-    try:
-        cutoff_time = datetime.datetime.now() - datetime.timedelta(hours=8)
+# Default time-to-live of pending transactions per transaction type, overridable in config.yml
+DEFAULT_PENDING_TTL_MINUTES = {
+    'lotto_entry': 480,
+    'deposit': 60,
+    'withdrawal': 60,
+}
 
-        # Update transactions that are 'lotto_entry', 'pending', and older than 8 hours
-        session.query(Transaction).filter(
-            Transaction.transaction_type == 'lotto_entry',
-            Transaction.status == 'pending',
-            Transaction.dateModified <= cutoff_time
-        ).update({"status": "cancelled"}, synchronize_session='fetch')
+def expire_stale_pending_transactions():
+    # Imported here, src.utils.transactions imports the app which imports this module
+    from src.utils.transactions import release_withdrawal_holds
 
-        session.commit()
-    except Exception as e:
-        session.rollback()
-        print(f"Error updating pending lotto transactions to cancelled: {e}")
-    finally:
-        session.close()
+    expiry_config = config.get('transactions', {}).get('expiry', {})
+    batch_size = expiry_config.get('batch_size', 500)
+    ttl_minutes = expiry_config.get('ttl_minutes', DEFAULT_PENDING_TTL_MINUTES)
+
+    for transaction_type, ttl in ttl_minutes.items():
+        cutoff_time = datetime.datetime.now() - datetime.timedelta(minutes=ttl)
+        expired = 0
+
+        # Work in bounded batches so every transaction stays short and only locks the rows it touches
+        while True:
+            session = SessionLocal()
+            try:
+                transaction_ids = [row.id for row in session.query(Transaction.id).filter(
+                    Transaction.transaction_type == transaction_type,
+                    Transaction.status == 'pending',
+                    Transaction.dateModified <= cutoff_time
+                ).order_by(Transaction.dateModified).limit(batch_size)]
+
+                if not transaction_ids:
+                    break
+
+                # Re-check the status so rows completed since the select are left alone
+                cancelled_ids = session.execute(
+                    update(Transaction)
+                    .where(Transaction.id.in_(transaction_ids), Transaction.status == 'pending')
+                    .values(status='cancelled')
+                    .returning(Transaction.id)
+                    .execution_options(synchronize_session=False)
+                ).scalars().all()
+
+                for transaction_id in cancelled_ids:
+                    append_transaction_log(session, transaction_id, f"Transaction expired after {ttl} minutes pending: {transaction_id}")
+
+                # A withdrawal left pending after its amount was held gets it back with the cancellation
+                if transaction_type == 'withdrawal' and cancelled_ids:
+                    release_withdrawal_holds(cancelled_ids, session)
+
+                session.commit()
+                expired += len(cancelled_ids)
+            except Exception as e:
+                session.rollback()
+                logging.error("Error expiring pending %s transactions: %s", transaction_type, e)
+                break
+            finally:
+                session.close()
+
+            if len(transaction_ids) < batch_size:
+                break
+
+        if expired:
+            logging.info("Expired %s pending %s transactions", expired, transaction_type)
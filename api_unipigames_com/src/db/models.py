@@ -1,9 +1,15 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, JSON, event
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, JSON, Index, event, update, insert, delete, select, inspect
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship, sessionmaker, Session
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.orm import relationship, sessionmaker, column_property, Session
 from sqlalchemy.sql import func
 from pydantic import BaseModel
+from typing import Optional
 import datetime
+from src.utils.money import Money, to_money
+from src.utils.ticket_numbers import ticket_mask, mask_numbers
 
 Base = declarative_base()
 
@@ -35,14 +41,48 @@ class SignInResponse(BaseModel):
     access_token: str
     refresh_token: str
 
+class GameResponse(BaseModel):
+    # Every field is optional, /api/games returns only those asked for with fields=
+    id: Optional[int] = None
+    name: Optional[str] = None
+    game_type: Optional[str] = None
+    pool_amount: Optional[float] = None
+    entry_fee: Optional[float] = None
+    end_time: Optional[datetime.datetime] = None
+    status: Optional[str] = None
+    winner_id: Optional[int] = None
+    dateCreated: Optional[datetime.datetime] = None
+    dateModified: Optional[datetime.datetime] = None
+    max_players: Optional[int] = None
+    game_config: Optional[dict] = None
+
+class GamesResponse(BaseModel):
+    games: list[GameResponse]
+    next_cursor: Optional[str] = None
+
+class TicketResponse(BaseModel):
+    ticket_id: int
+    game_id: int
+    game_name: str
+    numbers_played: str
+    power_number: int
+    date_purchased: datetime.datetime
+    won: bool
+    prize_claimed: bool
+
+class UserTicketsResponse(BaseModel):
+    tickets: list[TicketResponse]
+
 class Game(Base):
     __tablename__ = 'game'
 
     id = Column(Integer, primary_key=True)
     game_type_id = Column(Integer, ForeignKey('game_type.id'), nullable=False)
     name = Column(String(100), nullable=False)
-    pool_amount = Column(Float, nullable=False, default=0)
-    entry_fee = Column(Float, nullable=False, default=0)
+    pool_amount = Column('pool_amount_units', Money, nullable=True, default=0)
+    legacy_pool_amount = Column('pool_amount', Float, nullable=False, default=0)
+    entry_fee = Column('entry_fee_units', Money, nullable=True, default=0)
+    legacy_entry_fee = Column('entry_fee', Float, nullable=False, default=0)
     end_time = Column(DateTime, nullable=False)
     status = Column(String(20), nullable=False, default='active')
     winner_id = Column(Integer, ForeignKey('user.id'), nullable=True)
@@ -52,6 +92,13 @@ class Game(Base):
     user_games = relationship('UserGame', backref='game', lazy='dynamic')
     tickets = relationship('Ticket', back_populates='game')
 
+    __table_args__ = (
+        # /api/games pages through games by id or by end time, usually for one status or type
+        Index('ix_game_status_id', 'status', 'id'),
+        Index('ix_game_status_end_time', 'status', 'end_time', 'id'),
+        Index('ix_game_type_id', 'game_type_id', 'id'),
+    )
+
 class UserGame(Base):
     __tablename__ = 'user_game'
 
@@ -67,7 +114,9 @@ class User(Base):
     id = Column(Integer, primary_key=True)
     username = Column(String(100), unique=True, nullable=False)
     uid = Column(String(36), unique=True, nullable=False)
-    balance = Column(Float, default=0)
+    balance = Column('balance_units', Money, default=0)
+    legacy_balance = Column('balance', Float, default=0)
+    scopes_hash = Column(String(64), nullable=True)  # sha256 of the scopes last synced from Pi credentials
     active = Column(Boolean, default=True)
     dateCreated = Column(DateTime, default=func.current_timestamp())
     dateModified = Column(DateTime, default=func.current_timestamp(), onupdate=func.current_timestamp())
@@ -88,7 +137,8 @@ class Transaction(Base):
     id = Column(String(100), primary_key=True)
     user_id = Column(Integer, ForeignKey('user.id'), nullable=False)
     wallet_id = Column(Integer, ForeignKey('wallet.id'), nullable=True)
-    amount = Column(Float, nullable=False)
+    amount = Column('amount_units', Money, nullable=True)
+    legacy_amount = Column('amount', Float, nullable=False)
     transaction_type = Column(String(20), nullable=False)  # 'deposit' or 'withdrawal'
     memo = Column(String(100), nullable=False)
     status = Column(String(20), nullable=False)
@@ -97,6 +147,10 @@ class Transaction(Base):
     dateCreated = Column(DateTime, default=func.current_timestamp())
     dateModified = Column(DateTime, default=func.current_timestamp(), onupdate=func.current_timestamp())
 
+    __table_args__ = (
+        Index('ix_transaction_status_type_modified', 'status', 'transaction_type', 'dateModified'),
+    )
+
 class TransactionLog(Base):
     __tablename__ = 'transaction_log'
 
@@ -107,20 +161,48 @@ class TransactionLog(Base):
 
 class AccountTransaction(Base):
     __tablename__ = 'account_transaction'
+    __table_args__ = (
+        # Balance history rolls a user's ledger forward by id and selects statements by date
+        Index('ix_account_transaction_user_id_id', 'user_id', 'id'),
+        Index('ix_account_transaction_user_date', 'user_id', 'dateCreated'),
+    )
 
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('user.id'), nullable=False)
     transaction_type = Column(String(20), nullable=False)  # 'deposit', 'withdrawal', 'game_entry', etc.
-    amount = Column(Float, nullable=False)
+    amount = Column('amount_units', Money, nullable=True)
+    legacy_amount = Column('amount', Float, nullable=False)
     reference_id = Column(String(100), nullable=True)  # Reference to the associated transaction or game entry
     dateCreated = Column(DateTime, default=func.current_timestamp())
 
+class BalanceSnapshot(Base):
+    __tablename__ = 'balance_snapshot'
+    __table_args__ = (
+        Index('ix_balance_snapshot_user_taken_at', 'user_id', 'taken_at'),
+        Index('ix_balance_snapshot_user_entry', 'user_id', 'last_entry_id'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('user.id'), nullable=False)
+    balance = Column('balance_units', Money, nullable=False)  # Balance after every ledger entry up to last_entry_id
+    last_entry_id = Column(Integer, nullable=False, default=0)  # 0 marks the opening balance from before the ledger
+    taken_at = Column(DateTime, nullable=False)  # dateCreated of the newest ledger entry covered
+    dateCreated = Column(DateTime, default=func.current_timestamp())
+
+class StreamCursor(Base):
+    __tablename__ = 'stream_cursor'
+
+    name = Column(String(50), primary_key=True)
+    cursor = Column(String(100), nullable=False)  # Horizon paging_token of the last processed record
+    dateModified = Column(DateTime, default=func.current_timestamp(), onupdate=func.current_timestamp())
+
 class Payment(Base):
     __tablename__ = 'payment'
 
     id = Column(String(100), primary_key=True)
     user_id = Column(Integer, ForeignKey('user.id'), nullable=False)
-    amount = Column(Float, nullable=False)
+    amount = Column('amount_units', Money, nullable=True)
+    legacy_amount = Column('amount', Float, nullable=False)
     memo = Column(String(100), nullable=False)
     transaction_id = Column(String(100), nullable=True)
     status = Column(String(20), nullable=False)
@@ -132,11 +214,16 @@ class LottoStats(Base):
     user_id = Column(Integer, ForeignKey('user.id'), nullable=False)
     game_id = Column(String(100), nullable=False)
     numbers_played = Column(String(100), nullable=False)
-    win_amount = Column(Float, nullable=False)
+    # active_history keeps the previous amount available to the rollup listener
+    win_amount = column_property(Column('win_amount_units', Money, nullable=True), active_history=True)
+    legacy_win_amount = Column('win_amount', Float, nullable=False, default=0)
     prize_claimed = Column(Boolean, default=False)
 
 class UserScopes(Base):
     __tablename__ = 'user_scopes'
+    __table_args__ = (
+        Index('uq_user_scopes_user_scope', 'user_id', 'scope', unique=True),
+    )
 
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('user.id'), nullable=False)
@@ -173,6 +260,10 @@ class GameConfig(Base):
     dateCreated = Column(DateTime, default=func.current_timestamp())
     dateModified = Column(DateTime, default=func.current_timestamp(), onupdate=func.current_timestamp())
 
+    __table_args__ = (
+        Index('ix_game_config_game_id', 'game_id'),
+    )
+
 class Ticket(Base):
     __tablename__ = 'ticket'
 
@@ -181,26 +272,223 @@ class Ticket(Base):
     game_id = Column(Integer, ForeignKey('game.id'), nullable=False)
     transaction_id = Column(String(100), ForeignKey('transaction.id'), nullable=False)
     numbers_played = Column(String(100), nullable=False)
+    numbers_mask = Column(String(32), nullable=True)  # Canonical bitmask of numbers_played, see src/utils/ticket_numbers.py
     power_number = Column(Integer, nullable=False)
     date_purchased = Column(DateTime, default=func.current_timestamp())
     user = relationship('User', back_populates='tickets')
     game = relationship('Game', back_populates='tickets')
 
+    __table_args__ = (
+        Index('ix_ticket_game_user', 'game_id', 'user_id'),
+        # Exact combination lookups
+        Index('ix_ticket_game_numbers', 'game_id', 'numbers_mask', 'power_number'),
+    )
+
+class TicketNumber(Base):
+    __tablename__ = 'ticket_number'
+
+    # One row per main number of a ticket, for lookups of tickets containing some numbers
+    ticket_id = Column(Integer, ForeignKey('ticket.id'), primary_key=True)
+    number = Column(Integer, primary_key=True)
+    game_id = Column(Integer, ForeignKey('game.id'), nullable=False)
+
+    __table_args__ = (
+        Index('ix_ticket_number_game_number', 'game_id', 'number', 'ticket_id'),
+    )
+
+class UserLeaderboard(Base):
+    __tablename__ = 'user_leaderboard'
+
+    # Per-user totals maintained incrementally from ticket inserts and LottoStats settlements
+    user_id = Column(Integer, ForeignKey('user.id'), primary_key=True)
+    total_won = Column('total_won_units', Money, nullable=False, default=0)
+    biggest_win = Column('biggest_win_units', Money, nullable=False, default=0)
+    tickets_played = Column(Integer, nullable=False, default=0)
+    games_played = Column(Integer, nullable=False, default=0)
+    dateModified = Column(DateTime, default=func.current_timestamp(), onupdate=func.current_timestamp())
+
+    __table_args__ = (
+        Index('ix_user_leaderboard_total_won', 'total_won_units'),
+        Index('ix_user_leaderboard_biggest_win', 'biggest_win_units'),
+        Index('ix_user_leaderboard_tickets_played', 'tickets_played'),
+    )
+
+class GameStats(Base):
+    __tablename__ = 'game_stats'
+
+    # Per-game totals maintained incrementally from ticket inserts and LottoStats settlements
+    game_id = Column(Integer, ForeignKey('game.id'), primary_key=True)
+    tickets_sold = Column(Integer, nullable=False, default=0)
+    players = Column(Integer, nullable=False, default=0)
+    winners = Column(Integer, nullable=False, default=0)
+    total_won = Column('total_won_units', Money, nullable=False, default=0)
+    dateModified = Column(DateTime, default=func.current_timestamp(), onupdate=func.current_timestamp())
+
+class GameNumberCount(Base):
+    __tablename__ = 'game_number_count'
+
+    # How many tickets of a game were played with each main and power number, maintained incrementally from ticket writes
+    game_id = Column(Integer, ForeignKey('game.id'), primary_key=True)
+    kind = Column(String(10), primary_key=True)  # main | power
+    number = Column(Integer, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+def upsert_statement(dialect: str, table, index_elements: list, values):
+    """
+    INSERT into table that updates the row already holding the same index_elements instead.
+
+    values(added) returns the columns to set on a conflict, where added holds the columns of
+    the row that was to be inserted. MySQL resolves conflicts on any unique key, so there the
+    index_elements must be the only unique key an inserted row can clash on.
+    """
+    if dialect in ('postgresql', 'sqlite'):
+        statement = (postgresql_insert if dialect == 'postgresql' else sqlite_insert)(table)
+        return statement.on_conflict_do_update(index_elements=index_elements, set_=values(statement.excluded))
+    if dialect in ('mysql', 'mariadb'):
+        statement = mysql_insert(table)
+        return statement.on_duplicate_key_update(values(statement.inserted))
+    raise NotImplementedError(f'INSERT .. ON CONFLICT is not supported on the {dialect} dialect')
+
+def upsert_increment(connection, model, rows: list, counters):
+    """
+    Insert rows of model, adding the counters of any row whose primary key already exists to
+    the stored values instead. One statement, so writers racing to create the same row cannot
+    both insert it. Rows are keyed by attribute name.
+    """
+    table = model.__table__
+    columns = model.__mapper__.columns
+    rows = [{columns[name].name: value for name, value in row.items()} for row in rows]
+    counters = [columns[name].name for name in counters]
+
+    def values(added):
+        values = {name: table.c[name] + added[name] for name in counters}
+        if 'dateModified' in table.c:
+            values['dateModified'] = func.current_timestamp()
+        return values
+
+    connection.execute(upsert_statement(connection.dialect.name, table, list(table.primary_key.columns), values), rows)
+
+def increment_rollup(connection, model, key: dict, **deltas):
+    # Add the deltas to the rollup row, creating it on first use
+    upsert_increment(connection, model, [{**key, **deltas}], deltas)
+
+def count_numbers(connection, game_id: int, kind: str, numbers: list, delta: int):
+    if not numbers:
+        return
+    upsert_increment(connection, GameNumberCount, [
+        {'game_id': game_id, 'kind': kind, 'number': number, 'count': delta} for number in numbers
+    ], ('count',))
+
+def count_ticket_numbers(connection, game_id: int, numbers_mask, power_number, delta: int):
+    count_numbers(connection, game_id, 'main', mask_numbers(numbers_mask) if numbers_mask is not None else [], delta)
+    count_numbers(connection, game_id, 'power', [power_number] if power_number is not None else [], delta)
+
+def user_has_other_ticket(connection, ticket):
+    return connection.execute(
+        select(Ticket.id).where(
+            Ticket.game_id == ticket.game_id,
+            Ticket.user_id == ticket.user_id,
+            Ticket.id != ticket.id
+        ).limit(1)
+    ).first() is not None
+
+# Money attributes and the legacy float columns they are mirrored to until those are dropped
+LEGACY_MONEY_ATTRIBUTES = {
+    User: (('balance', 'legacy_balance'),),
+    Game: (('pool_amount', 'legacy_pool_amount'), ('entry_fee', 'legacy_entry_fee')),
+    Transaction: (('amount', 'legacy_amount'),),
+    AccountTransaction: (('amount', 'legacy_amount'),),
+    Payment: (('amount', 'legacy_amount'),),
+    LottoStats: (('win_amount', 'legacy_win_amount'),),
+}
+
+def mirror_legacy_money(mapper, connection, target):
+    for attribute, legacy_attribute in LEGACY_MONEY_ATTRIBUTES[type(target)]:
+        value = getattr(target, attribute)
+        setattr(target, legacy_attribute, float(value) if value is not None else 0)
+
+def index_ticket_numbers(connection, ticket):
+    numbers = mask_numbers(ticket.numbers_mask) if ticket.numbers_mask is not None else []
+    if numbers:
+        connection.execute(insert(TicketNumber), [{'ticket_id': ticket.id, 'game_id': ticket.game_id, 'number': number} for number in numbers])
+
+@event.listens_for(Ticket, 'before_insert')
+@event.listens_for(Ticket, 'before_update')
+def set_ticket_numbers_mask(mapper, connection, target):
+    target.numbers_mask = ticket_mask(target.numbers_played)
+
 @event.listens_for(Ticket, 'after_insert')
 def after_insert_ticket(mapper, connection, target):
     new_lotto_stats = LottoStats(
         user_id=target.user_id,
         game_id=target.game_id,
         numbers_played=target.numbers_played,
-        win_amount=0.0  # Initially set win_amount to 0.0
+        win_amount=0  # Initially set win_amount to 0
     )
     session = Session(bind=connection)
     session.add(new_lotto_stats)
     session.commit()
     session.close()
 
+    new_player = 0 if user_has_other_ticket(connection, target) else 1
+    increment_rollup(connection, GameStats, {'game_id': target.game_id}, tickets_sold=1, players=new_player)
+    increment_rollup(connection, UserLeaderboard, {'user_id': target.user_id}, tickets_played=1, games_played=new_player)
+    index_ticket_numbers(connection, target)
+    count_ticket_numbers(connection, target.game_id, target.numbers_mask, target.power_number, 1)
+
+@event.listens_for(Ticket, 'before_delete')
+def before_delete_ticket(mapper, connection, target):
+    # The number rows reference the ticket and go first
+    connection.execute(delete(TicketNumber).where(TicketNumber.ticket_id == target.id))
+
+@event.listens_for(Ticket, 'after_delete')
+def after_delete_ticket(mapper, connection, target):
+    lost_player = 0 if user_has_other_ticket(connection, target) else 1
+    increment_rollup(connection, GameStats, {'game_id': target.game_id}, tickets_sold=-1, players=-lost_player)
+    increment_rollup(connection, UserLeaderboard, {'user_id': target.user_id}, tickets_played=-1, games_played=-lost_player)
+    count_ticket_numbers(connection, target.game_id, target.numbers_mask, target.power_number, -1)
+
+# Fires only when win_amount is changed through the ORM. Nothing settles tickets yet: there is no
+# draw (see GameLifecycleScheduler), so total_won, winners and biggest_win stay at 0 until one sets
+# win_amount on the LottoStats objects of its winning tickets and commits the session
+@event.listens_for(LottoStats, 'after_update')
+def after_update_lotto_stats(mapper, connection, target):
+    history = inspect(target).attrs.win_amount.history
+    if not history.has_changes():
+        return
+
+    old_amount = to_money((history.deleted[0] if history.deleted else None) or 0)
+    new_amount = to_money(target.win_amount or 0)
+    delta = new_amount - old_amount
+    if delta == 0:
+        return
+
+    # Winners are counted once, when a ticket first settles with a prize
+    new_winner = 1 if not old_amount and new_amount > 0 else 0
+    increment_rollup(connection, GameStats, {'game_id': int(target.game_id)}, total_won=delta, winners=new_winner)
+    increment_rollup(connection, UserLeaderboard, {'user_id': target.user_id}, total_won=delta)
+
+    if new_amount > 0:
+        connection.execute(
+            update(UserLeaderboard)
+            .where(UserLeaderboard.user_id == target.user_id, UserLeaderboard.biggest_win < new_amount)
+            .values(biggest_win=new_amount)
+        )
+
 @event.listens_for(Ticket, 'after_update')
 def after_update_ticket(mapper, connection, target):
+    attrs = inspect(target).attrs
+    if attrs.numbers_played.history.has_changes():
+        connection.execute(delete(TicketNumber).where(TicketNumber.ticket_id == target.id))
+        index_ticket_numbers(connection, target)
+
+    if attrs.numbers_mask.history.has_changes() or attrs.power_number.history.has_changes():
+        # Move the ticket's counts from the numbers it was played with to the new ones
+        old_mask = attrs.numbers_mask.history.deleted[0] if attrs.numbers_mask.history.deleted else target.numbers_mask
+        old_power = attrs.power_number.history.deleted[0] if attrs.power_number.history.deleted else target.power_number
+        count_ticket_numbers(connection, target.game_id, old_mask, old_power, -1)
+        count_ticket_numbers(connection, target.game_id, target.numbers_mask, target.power_number, 1)
+
     session = Session(bind=connection)
     lotto_stats = session.query(LottoStats).filter_by(
         user_id=target.user_id,
@@ -1,7 +1,7 @@
 from fastapi import Depends, FastAPI, Request, status, HTTPException, APIRouter
 from sqlalchemy.orm import Session
 from src.db.database import SessionLocal
-from src.utils.utils import load_config, configure_logging
+from src.utils.utils import load_config, configure_logging, request_id_var, uuid, JSONResponse
 from src.pi_network.pi_python import PiNetwork
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -16,9 +16,12 @@ def get_config():
     return load_config()
 
 def get_pi_network():
+    # Horizon is connected in the background after startup, see src/utils/startup.py
+    if not pi_network.ready:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail='The system is currently under maintenance. Please try again later')
     return pi_network
 
-app = FastAPI()
+app = FastAPI(default_response_class=JSONResponse)
 
 # Configure CORS
 app.add_middleware(
@@ -29,9 +32,21 @@ app.add_middleware(
     allow_headers=["*"],  # You can specify the allowed headers or use "*" to allow all headers
 )
 
+# Tag every request with an id so its log lines can be correlated
+@app.middleware("http")
+async def assign_request_id(request: Request, call_next):
+    request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+    token = request_id_var.set(request_id)
+    try:
+        response = await call_next(request)
+    finally:
+        request_id_var.reset(token)
+    response.headers['X-Request-ID'] = request_id
+    return response
+
 config = get_config()
 configure_logging(config)
 
 pi_network = PiNetwork()
-pi_network.initialize(config['api']['base_url'], config['api']['server_api_key'], config['api']['app_wallet_seed'], config['api']['network'])
+pi_network.configure(config['api']['base_url'], config['api']['server_api_key'], config['api']['app_wallet_seed'], config['api']['network'])
 
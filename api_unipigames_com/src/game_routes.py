@@ -1,14 +1,37 @@
 # src/game_routes.py
 from src.db.models import Session
-from fastapi import Depends, Request, status
-from src.utils.utils import JSONResponse, uuid, requests, json, datetime
+from fastapi import Depends, Request, Query, status
+from fastapi.responses import StreamingResponse
+from src.utils.utils import JSONResponse, dumps_json, uuid, requests, json, datetime
 from src.utils.transactions import logging, colorama
-from src.db.models import User, Session, Game, GameType, GameConfig, LottoStats, Transaction, TransactionData, Ticket
+from src.db.models import User, Session, Game, GameType, GameConfig, LottoStats, Transaction, TransactionData, Ticket, UserLeaderboard, GameStats, GamesResponse
 from src.utils.transactions import create_transaction, get_current_user, create_account_transaction
+from src.utils.game_scheduler import game_scheduler
+from src.utils.response_cache import response_cache
+from src.utils.game_listing import list_games, parse_fields, SORT_ORDERS, DEFAULT_LIMIT
+from src.utils.live_updates import game_update_hub, HEARTBEAT_SECONDS
+from src.utils.ticket_numbers import parse_numbers
+from src.utils.combinations import count_combination
+from src.utils.number_heatmap import number_heatmap, game_number_ranges
+from src.utils.quick_pick import quick_pick
+from src.utils.money import to_money
+from src.utils.rate_limit import rate_limit
+from src.utils.single_flight import single_flight
+from src.utils.cache import cache
 from src.dependencies import get_db_session, get_config , get_pi_network, Depends, Request, status, app, APIRouter
 
 game_router = APIRouter()
 
+lotto_pool_flight = single_flight('route.lotto_pool')
+
+# Seconds the app wallet balance and the leaderboards are shared between workers before being read again
+cache_config = get_config().get('cache', {})
+LOTTO_POOL_TTL = cache_config.get('lottoPoolTtlSeconds', 5)
+LEADERBOARD_TTL = cache_config.get('leaderboardTtlSeconds', 10)
+
+# Most lines one quick-pick call generates
+QUICK_PICK_MAX_LINES = get_config().get('quick_pick', {}).get('maxLines', 10000)
+
 def validate_lotto_numbers(lotto_numbers, power_number, main_range, power_range):
     if len(lotto_numbers) != 5:
         return False
@@ -18,11 +41,15 @@ def validate_lotto_numbers(lotto_numbers, power_number, main_range, power_range)
         return False
     return True
 
-@app.get("/api/lotto-pool")
+@app.get("/api/lotto-pool", dependencies=[Depends(rate_limit('lotto_pool'))])
 async def get_lotto_pool(current_user: User = Depends(get_current_user), pi_network = Depends(get_pi_network)):
     try:
-        # get the current balance of the app wallet
-        balance = pi_network.get_balance()
+        # get the current balance of the app wallet, one worker looks it up and requests arriving together wait for it
+        balance = cache.get('wallet', 'balance')
+        if balance is None:
+            balance = await lotto_pool_flight.do_async('balance', pi_network.get_balance)
+            if balance is not None:
+                cache.set('wallet', 'balance', balance, LOTTO_POOL_TTL)
 
         # Check if the balance is not None, else return maintenance message
         if balance is None:
@@ -43,7 +70,7 @@ async def get_user_balance(current_user: User = Depends(get_current_user), db: S
 
     # if debug mode is enabled, return the balance as 1000
     if config['app']['debug'] == True:
-        logging.info(colorama.Fore.YELLOW + f"FETCH: Fetching user balance for user: {user.username} with balance: {user.balance}")
+        logging.info(colorama.Fore.YELLOW + "FETCH: Fetching user balance for user: %s with balance: %s", user.username, user.balance)
 
     return JSONResponse({'balance': user.balance}, status_code=status.HTTP_200_OK)
 
@@ -75,6 +102,10 @@ async def submit_ticket(request: Request, db: Session = Depends(get_db_session),
         if game is None:
             return JSONResponse({'error': 'Game not found'}, status_code=status.HTTP_404_NOT_FOUND)
 
+        # Tickets are no longer accepted once the game has reached its end_time
+        if game.status != 'active' or game.end_time <= datetime.now():
+            return JSONResponse({'error': 'This game is not active or has ended'}, status_code=status.HTTP_400_BAD_REQUEST)
+
         # Get game fees and number range from config
         game_configs = db.query(GameConfig).filter(GameConfig.game_id == game_id).all()
         config_data = {}
@@ -102,29 +133,29 @@ async def submit_ticket(request: Request, db: Session = Depends(get_db_session),
             # print('lotto_numbers:', lotto_numbers)
             # print('power_number:', power_number)
         except KeyError as e:
-            logging.error(f"Key error while fetching game details: {e}")
+            logging.error("Key error while fetching game details: %s", e)
             return JSONResponse({'error': 'Error fetching game details'}, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
         # Validate the ticket price
         if not entry_fee or not service_fee or not network_fee:
-            logging.error(f"Configuration data missing for the game: {game_id}")
+            logging.error("Configuration data missing for the game: %s", game_id)
             return JSONResponse({'error': 'Configuration data missing for the game'}, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
         # Check if user has sufficient balance
-        total_cost = entry_fee + service_fee + network_fee
+        total_cost = to_money(entry_fee) + to_money(service_fee) + to_money(network_fee)
         if user.balance < total_cost:
-            logging.error(f"Insufficient balance for user: {user.username}")
+            logging.error("Insufficient balance for user: %s", user.username)
             return JSONResponse({'error': 'Insufficient balance'}, status_code=status.HTTP_400_BAD_REQUEST)
 
         # Get the number of players in the game
         currentPlayers = db.query(LottoStats).filter(LottoStats.game_id == game_id).count()
         if int(currentPlayers) >= int(max_players):
-            logging.error(f"Game is full: {game_id}")
+            logging.error("Game is full: %s", game_id)
             return JSONResponse({'error': 'Game is full'}, status_code=status.HTTP_400_BAD_REQUEST)
 
         # Validate lotto numbers using dynamic range
         if not validate_lotto_numbers(lotto_numbers, power_number, main_number_range, power_number_range):
-            logging.error(f"Invalid lotto numbers: {lotto_numbers}")
+            logging.error("Invalid lotto numbers: %s", lotto_numbers)
             return JSONResponse({'error': 'Invalid lotto numbers'}, status_code=status.HTTP_400_BAD_REQUEST)
 
         # Save the ticket details
@@ -158,24 +189,24 @@ async def submit_ticket(request: Request, db: Session = Depends(get_db_session),
         return JSONResponse({'error': 'Failed to submit ticket'}, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-@app.put("/api/ticket-details/{game_id}")
+@app.put("/api/ticket-details/{game_id}", dependencies=[Depends(rate_limit('ticket_details'))])
 async def get_ticket_details(game_id: int, request: Request, db: Session = Depends(get_db_session), current_user: User = Depends(get_current_user), pi_network = Depends(get_pi_network)):
     try:
         # Get the current user
         user_id = current_user.uid
         user = db.query(User).filter(User.uid == user_id).first()
         if not user:
-            logging.error(f"User not found: {user_id}")
+            logging.error("User not found: %s", user_id)
             return JSONResponse({'error': 'User not found'}, status_code=status.HTTP_404_NOT_FOUND)
 
         # Get the game details
         game = db.query(Game).filter(Game.id == game_id).first()
         if not game:
-            logging.error(f"Game not found: {game_id}")
+            logging.error("Game not found: %s", game_id)
             return JSONResponse({'error': 'Game not found'}, status_code=status.HTTP_404_NOT_FOUND)
 
-        if game.status != 'active':
-            logging.warning(f"Game not active: {game_id}")
+        if game.status != 'active' or game.end_time <= datetime.now():
+            logging.warning("Game not active: %s", game_id)
             return JSONResponse({'error': 'This game is not active or has ended'}, status_code=status.HTTP_400_BAD_REQUEST)
 
         # Fetch the request data
@@ -185,18 +216,18 @@ async def get_ticket_details(game_id: int, request: Request, db: Session = Depen
 
         # Validate numbers
         if not isinstance(numbers, list) or len(numbers) != 5 or not all(isinstance(num, int) for num in numbers):
-            logging.error(f"Invalid lotto numbers: {numbers}")
+            logging.error("Invalid lotto numbers: %s", numbers)
             return JSONResponse({'error': 'Invalid lotto numbers'}, status_code=status.HTTP_400_BAD_REQUEST)
 
         if not isinstance(power, int):
-            logging.error(f"Invalid power number: {power}")
+            logging.error("Invalid power number: %s", power)
             return JSONResponse({'error': 'Invalid power number'}, status_code=status.HTTP_400_BAD_REQUEST)
 
         # Get game details
         try:
             game_configs = db.query(GameConfig).filter(GameConfig.game_id == game_id).all()
             if not game_configs:
-                logging.error(f"No game configurations found for game_id: {game_id}")
+                logging.error("No game configurations found for game_id: %s", game_id)
                 return JSONResponse({'error': 'Game configurations not found'}, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
             game_details = {config.config_key: config.config_value for config in game_configs}
@@ -206,19 +237,19 @@ async def get_ticket_details(game_id: int, request: Request, db: Session = Depen
             base_fee = int(pi_network.fee) / 10000000
 
             if entry_fee is None or service_fee is None:
-                logging.error(f"Missing fee details in game configurations for game_id: {game_id}")
+                logging.error("Missing fee details in game configurations for game_id: %s", game_id)
                 return JSONResponse({'error': 'Missing fee details in game configurations'}, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
         except requests.exceptions.RequestException as err:
-            logging.error(f"Failed to fetch ticket details for user: {user.username}. Error: {err}")
+            logging.error("Failed to fetch ticket details for user: %s. Error: %s", user.username, err)
             return JSONResponse({'error': 'Failed to fetch ticket details'}, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
         except KeyError as e:
-            logging.error(f"Key error while fetching game details: {e}")
+            logging.error("Key error while fetching game details: %s", e)
             return JSONResponse({'error': 'Error fetching game details'}, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
         # Calculate total cost
-        total_cost = float(entry_fee) + float(service_fee) + float(base_fee)
+        total_cost = to_money(entry_fee) + to_money(service_fee) + to_money(base_fee)
 
         # TicketID generation
         ticketID = str(uuid.uuid4())
@@ -250,16 +281,16 @@ async def get_ticket_details(game_id: int, request: Request, db: Session = Depen
             transactionData=ticket_details
         )
         if not transaction:
-            logging.error(f"Failed to create transaction: {ticketID}")
+            logging.error("Failed to create transaction: %s", ticketID)
             return JSONResponse({'error': 'Failed to create transaction'}, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
         return JSONResponse(ticket_details, status_code=status.HTTP_200_OK)
 
     except requests.exceptions.RequestException as err:
-        logging.error(f"Failed to fetch ticket details for user: {user.username}. Error: {err}")
+        logging.error("Failed to fetch ticket details for user: %s. Error: %s", user.username, err)
         return JSONResponse({'error': 'Failed to fetch ticket details'}, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
     except Exception as e:
-        logging.error(f"Unexpected error: {str(e)}")
+        logging.error("Unexpected error: %s", e)
         return JSONResponse({'error': 'An unexpected error occurred'}, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
@@ -311,13 +342,15 @@ async def create_game(request: Request, db: Session = Depends(get_db_session), c
     game = Game(
         game_type_id=game_type_id,
         name=name,
-        entry_fee=entry_fee,
+        entry_fee=to_money(entry_fee),
         max_players=max_players,
         end_time=end_time
     )
     db.add(game)
     db.commit()
 
+    game_scheduler.schedule(game.id, game.end_time)
+
     return JSONResponse({'message': 'Game created successfully'}, status_code=status.HTTP_201_CREATED)
 
 @app.put("/admin/update-game/{game_id}")
@@ -332,12 +365,17 @@ async def update_game(game_id: int, request: Request, db: Session = Depends(get_
 
     data = await request.json()
     game.name = data.get('name', game.name)
-    game.entry_fee = data.get('entry_fee', game.entry_fee)
+    game.entry_fee = to_money(data.get('entry_fee', game.entry_fee))
     game.max_players = data.get('max_players', game.max_players)
     game.end_time = datetime.fromisoformat(data.get('end_time', game.end_time.isoformat()))
     game.status = data.get('status', game.status)
     db.commit()
 
+    if game.status == 'active':
+        game_scheduler.schedule(game.id, game.end_time)
+    else:
+        game_scheduler.unschedule(game.id)
+
     return JSONResponse({'message': 'Game updated successfully'}, status_code=status.HTTP_200_OK)
 
 @app.post("/admin/create-game-config")
@@ -397,98 +435,252 @@ async def update_game_config(config_id: int, request: Request, db: Session = Dep
     return JSONResponse({'message': 'Game configuration updated successfully'}, status_code=status.HTTP_200_OK)
 
 @app.get("/game-types")
-async def get_game_types(db: Session = Depends(get_db_session)):
-    game_types = db.query(GameType).all()
-    result = []
-    for game_type in game_types:
-        result.append({
-            'id': game_type.id,
-            'name': game_type.name,
-            'description': game_type.description
-        })
-    return JSONResponse(result, status_code=status.HTTP_200_OK)
-
-@app.get("/api/games")
+async def get_game_types(request: Request, db: Session = Depends(get_db_session)):
+    def build():
+        game_types = db.query(GameType).all()
+        result = []
+        for game_type in game_types:
+            result.append({
+                'id': game_type.id,
+                'name': game_type.name,
+                'description': game_type.description
+            })
+        return result
+
+    return await response_cache.respond(request, build)
+
+@app.get("/api/games", response_model=GamesResponse)
 # Add current_user: User = Depends(get_current_user) if not debugging
-async def get_games(request: Request, db: Session = Depends(get_db_session)):
+async def get_games(request: Request, game_type: str = None, status_filter: str = Query(None, alias='status'), ends_after: str = None, ends_before: str = None,
+                    sort: str = 'id', cursor: str = None, limit: int = None, fields: str = None, db: Session = Depends(get_db_session)):
     try:
-        game_type_name = request.query_params.get('game_type')
-
-        if game_type_name:
-            game_type = db.query(GameType).filter(GameType.name == game_type_name).first()
-            if game_type:
-                games = db.query(Game).filter(Game.game_type_id == game_type.id).all()
-            else:
-                games = []
-        else:
-            games = db.query(Game).all()
-
-        game_data = []
-        for game in games:
-            game_type = db.get(GameType, game.game_type_id)
-
-            # Fetch game configurations
-            game_configs = db.query(GameConfig).filter(GameConfig.game_id == game.id).all()
-            config_data = {}
-            for config in game_configs:
-                config_data[config.config_key] = config.config_value
-
-            game_info = {
-                "id": game.id,
-                "name": game.name,
-                "game_type": game_type.name if game_type else None,
-                "pool_amount": game.pool_amount,
-                "entry_fee": game.entry_fee,
-                "end_time": game.end_time.isoformat() if game.end_time else None,
-                "status": game.status,
-                "winner_id": game.winner_id,
-                "dateCreated": game.dateCreated.isoformat() if game.dateCreated else None,
-                "dateModified": game.dateModified.isoformat() if game.dateModified else None,
-                "max_players": game.max_players,
-                "game_config": config_data
-            }
-            game_data.append(game_info)
+        selected_fields = parse_fields(fields)
+        ends_after_time = datetime.fromisoformat(ends_after) if ends_after else None
+        ends_before_time = datetime.fromisoformat(ends_before) if ends_before else None
+    except ValueError as err:
+        return JSONResponse({'error': str(err)}, status_code=status.HTTP_400_BAD_REQUEST)
+
+    if sort not in SORT_ORDERS:
+        return JSONResponse({'error': f"Invalid sort. Valid values are: {', '.join(SORT_ORDERS)}"}, status_code=status.HTTP_400_BAD_REQUEST)
+
+    # Without cursor or limit every game is returned unpaginated, as clients written before pagination expect
+    if cursor is not None and limit is None:
+        limit = DEFAULT_LIMIT
+    if limit is not None and (limit < 1 or limit > 200):
+        return JSONResponse({'error': 'limit must be between 1 and 200'}, status_code=status.HTTP_400_BAD_REQUEST)
 
-        return JSONResponse({"games": game_data}, status_code=status.HTTP_200_OK)
+    # No status means every status, as before the filter existed. Clients after open games pass status=active
+    statuses = [value.strip() for value in status_filter.split(',') if value.strip()] if status_filter else None
+
+    def build():
+        return list_games(db, selected_fields, statuses=statuses, game_type=game_type, ends_after=ends_after_time,
+                          ends_before=ends_before_time, sort=sort, cursor=cursor, limit=limit)
+
+    try:
+        return await response_cache.respond(request, build)
+
+    except ValueError as err:
+        return JSONResponse({'error': str(err)}, status_code=status.HTTP_400_BAD_REQUEST)
 
     except Exception as err:
         logging.error(err)
         return JSONResponse({'error': 'Failed to fetch games'}, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+@app.get("/api/games/live")
+async def live_game_updates(game_id: str = None):
+    try:
+        game_ids = [int(value) for value in game_id.split(',') if value.strip()] if game_id else None
+    except ValueError:
+        return JSONResponse({'error': 'game_id must be a comma separated list of game ids'}, status_code=status.HTTP_400_BAD_REQUEST)
+
+    subscriber = game_update_hub.subscribe(game_ids)
+    if subscriber is None:
+        return JSONResponse({'error': 'Too many live connections. Please poll /api/games instead'}, status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    async def events():
+        try:
+            yield b'retry: 5000\n\n'
+            snapshot = game_update_hub.snapshot(game_ids)
+            if snapshot:
+                yield b'event: snapshot\ndata: ' + dumps_json(snapshot) + b'\n\n'
+
+            while True:
+                updates = await subscriber.next(HEARTBEAT_SECONDS)
+                if updates is None:
+                    # Keeps proxies from closing an idle connection
+                    yield b': keep-alive\n\n'
+                else:
+                    yield b'event: update\ndata: ' + dumps_json(updates) + b'\n\n'
+        finally:
+            # Runs when the client disconnects and the response task is cancelled
+            game_update_hub.unsubscribe(subscriber)
+
+    return StreamingResponse(events(), media_type='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.get("/games/{game_id}")
-async def get_game_details(game_id: int, db: Session = Depends(get_db_session)):
+async def get_game_details(game_id: int, request: Request, db: Session = Depends(get_db_session)):
     if not game_id:
         return JSONResponse({'error': 'game_id is required'}, status_code=status.HTTP_400_BAD_REQUEST)
 
-    game = db.get(Game, game_id)
-    result = []
-
-    if game:
-        result = {
-            'id': game.id,
-            'game_type_id': game.game_type_id,
-            'name': game.name,
-            'entry_fee': game.entry_fee,
-            'max_players': game.max_players,
-            'end_time': game.end_time.isoformat(),
-            'status': game.status
-        }
+    def build():
+        game = db.get(Game, game_id)
+        result = []
+
+        if game:
+            result = {
+                'id': game.id,
+                'game_type_id': game.game_type_id,
+                'name': game.name,
+                'entry_fee': game.entry_fee,
+                'max_players': game.max_players,
+                'end_time': game.end_time,
+                'status': game.status
+            }
+        return result
 
-    return JSONResponse(result, status_code=status.HTTP_200_OK)
+    return await response_cache.respond(request, build)
 
 @app.get("/game-configs/{game_id}")
-async def get_game_configs(game_id: int, db: Session = Depends(get_db_session)):
+async def get_game_configs(game_id: int, request: Request, db: Session = Depends(get_db_session)):
     if not game_id:
         return JSONResponse({'error': 'game_id is required'}, status_code=status.HTTP_400_BAD_REQUEST)
 
-    game_configs = db.query(GameConfig).filter(GameConfig.game_id == game_id).all()
-    result = []
-    for game_config in game_configs:
-        result.append({
-            'id': game_config.id,
-            'game_id': game_config.game_id,
-            'game_type_id': game_config.game_type_id,
-            'config_key': game_config.config_key,
-            'config_value': game_config.config_value
+    def build():
+        game_configs = db.query(GameConfig).filter(GameConfig.game_id == game_id).all()
+        result = []
+        for game_config in game_configs:
+            result.append({
+                'id': game_config.id,
+                'game_id': game_config.game_id,
+                'game_type_id': game_config.game_type_id,
+                'config_key': game_config.config_key,
+                'config_value': game_config.config_value
+            })
+        return result
+
+    return await response_cache.respond(request, build)
+
+# Leaderboard metrics and the rollup column each one is ranked by
+LEADERBOARD_METRICS = {
+    'total_won': UserLeaderboard.total_won,
+    'biggest_win': UserLeaderboard.biggest_win,
+    'tickets_played': UserLeaderboard.tickets_played,
+}
+
+def build_leaderboard(column, limit: int, db: Session):
+    # Walks the metric index from the top, so the cost does not grow with ticket history
+    rows = db.query(UserLeaderboard, User.username).\
+        join(User, User.id == UserLeaderboard.user_id).\
+        filter(column > 0).\
+        order_by(column.desc()).\
+        limit(limit).all()
+
+    leaderboard = []
+    for rank, (entry, username) in enumerate(rows, start=1):
+        leaderboard.append({
+            'rank': rank,
+            'username': username,
+            'total_won': entry.total_won,
+            'biggest_win': entry.biggest_win,
+            'tickets_played': entry.tickets_played,
+            'games_played': entry.games_played
         })
-    return JSONResponse(result, status_code=status.HTTP_200_OK)
+    return leaderboard
+
+@app.get("/api/leaderboard")
+async def get_leaderboard(metric: str = 'total_won', limit: int = 10, db: Session = Depends(get_db_session)):
+    column = LEADERBOARD_METRICS.get(metric)
+    if column is None:
+        return JSONResponse({'error': f"Invalid metric. Valid metrics are: {', '.join(LEADERBOARD_METRICS)}"}, status_code=status.HTTP_400_BAD_REQUEST)
+
+    if limit < 1 or limit > 100:
+        return JSONResponse({'error': 'limit must be between 1 and 100'}, status_code=status.HTTP_400_BAD_REQUEST)
+
+    cache_key = f"{metric}:{limit}"
+    leaderboard = cache.get('leaderboard', cache_key)
+    if leaderboard is None:
+        leaderboard = build_leaderboard(column, limit, db)
+        cache.set('leaderboard', cache_key, leaderboard, LEADERBOARD_TTL)
+
+    return JSONResponse({'metric': metric, 'leaderboard': leaderboard}, status_code=status.HTTP_200_OK)
+
+@app.get("/api/games/{game_id}/combinations")
+async def get_combination_count(game_id: int, numbers: str, power: int = None, match: str = 'exact', db: Session = Depends(get_db_session)):
+    if match not in ('exact', 'partial'):
+        return JSONResponse({'error': 'match must be exact or partial'}, status_code=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        parsed_numbers = parse_numbers(numbers)
+    except ValueError as err:
+        return JSONResponse({'error': str(err)}, status_code=status.HTTP_400_BAD_REQUEST)
+
+    if not parsed_numbers:
+        return JSONResponse({'error': 'numbers is required'}, status_code=status.HTTP_400_BAD_REQUEST)
+
+    if db.get(Game, game_id) is None:
+        return JSONResponse({'error': 'Game not found'}, status_code=status.HTTP_404_NOT_FOUND)
+
+    # How many tickets of the game were played with these numbers, answered from the number indexes
+    tickets = count_combination(db, game_id, parsed_numbers, power_number=power, partial=match == 'partial')
+
+    return JSONResponse({
+        'game_id': game_id,
+        'numbers': parsed_numbers,
+        'power_number': power,
+        'match': match,
+        'tickets': tickets
+    }, status_code=status.HTTP_200_OK)
+
+@app.get("/api/games/{game_id}/numbers")
+async def get_number_heatmap(game_id: int, db: Session = Depends(get_db_session)):
+    # Counts of every main and power number played in the game, read from the rollup rather than the tickets
+    heatmap = number_heatmap.get(db, game_id)
+    if heatmap is None:
+        return JSONResponse({'error': 'Game not found'}, status_code=status.HTTP_404_NOT_FOUND)
+
+    return JSONResponse(number_heatmap.to_json(game_id, heatmap), status_code=status.HTTP_200_OK)
+
+@app.get("/api/games/{game_id}/quick-pick", dependencies=[Depends(rate_limit('quick_pick'))])
+async def get_quick_pick(game_id: int, lines: int = 1, current_user: User = Depends(get_current_user), db: Session = Depends(get_db_session)):
+    if lines < 1 or lines > QUICK_PICK_MAX_LINES:
+        return JSONResponse({'error': f'lines must be between 1 and {QUICK_PICK_MAX_LINES}'}, status_code=status.HTTP_400_BAD_REQUEST)
+
+    game = db.get(Game, game_id)
+    if game is None:
+        return JSONResponse({'error': 'Game not found'}, status_code=status.HTTP_404_NOT_FOUND)
+    if game.status != 'active' or game.end_time <= datetime.now():
+        return JSONResponse({'error': 'This game is not active or has ended'}, status_code=status.HTTP_400_BAD_REQUEST)
+
+    ranges = game_number_ranges(db, game_id)
+    if 'main' not in ranges or 'power' not in ranges:
+        logging.error("Number range missing for the game: %s", game_id)
+        return JSONResponse({'error': 'Configuration data missing for the game'}, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    try:
+        main_numbers, power_numbers = quick_pick(lines, ranges['main'], ranges['power'])
+    except ValueError as err:
+        logging.error("Quick pick failed for the game: %s: %s", game_id, err)
+        return JSONResponse({'error': 'Configuration data invalid for the game'}, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    # Lines are in the shape submit-ticket takes its numbers in
+    picks = [{'lotto_numbers': numbers, 'power_number': power} for numbers, power in zip(main_numbers.tolist(), power_numbers.tolist())]
+    return JSONResponse({'game_id': game_id, 'lines': picks}, status_code=status.HTTP_200_OK, headers={'Cache-Control': 'no-store'})
+
+@app.get("/api/games/{game_id}/stats")
+async def get_game_stats(game_id: int, db: Session = Depends(get_db_session)):
+    game = db.get(Game, game_id)
+    if not game:
+        return JSONResponse({'error': 'Game not found'}, status_code=status.HTTP_404_NOT_FOUND)
+
+    stats = db.get(GameStats, game_id)
+
+    return JSONResponse({
+        'game_id': game.id,
+        'status': game.status,
+        'pool_amount': game.pool_amount,
+        'max_players': game.max_players,
+        'tickets_sold': stats.tickets_sold if stats else 0,
+        'players': stats.players if stats else 0,
+        'winners': stats.winners if stats else 0,
+        'total_won': stats.total_won if stats else 0
+    }, status_code=status.HTTP_200_OK)
@@ -2,19 +2,24 @@
 #src/payment_routes.py
 
 from src.db.models import Session
-from src.utils.utils import JSONResponse, uuid, logging, colorama, requests, json
+from src.utils.utils import JSONResponse, uuid, logging, requests, json
 from src.db.models import User, Session, Transaction, TransactionData, UserScopes
-from src.utils.transactions import create_transaction, get_current_user, complete_transaction
+from src.utils.transactions import create_transaction, get_current_user, complete_transaction, hold_withdrawal, cancel_withdrawal
+from src.utils.confirmation_store import confirmation_store
+from src.utils.money import to_money
+from src.utils.single_flight import single_flight
 from src.dependencies import get_db_session, get_config , get_pi_network, Depends, Request, status, app, APIRouter
 
 payment_router = APIRouter()
 
+get_payment_flight = single_flight('route.get_payment')
+
 @app.post("/create_deposit")
 async def create_deposit(request: Request, db: Session = Depends(get_db_session), current_user: User = Depends(get_current_user), config: dict = Depends(get_config)):
     try:
         user_id = current_user.uid
         data = await request.json()
-        amount = data["amount"]
+        amount = to_money(data["amount"])
 
         # Check if the user exists
         user = db.query(User).filter(User.uid == user_id).first()
@@ -41,12 +46,9 @@ async def create_deposit(request: Request, db: Session = Depends(get_db_session)
         if config['app']['debug'] == True:
             metadata["test"] = True
 
-        # Make sure the amount is in the correct format and a float
-        amount = float(amount)
-
         payment_data = {
             "payment": {
-                "amount": amount,
+                "amount": float(amount),
                 "memo": memo,
                 "metadata": metadata,
                 "uid": user_id
@@ -54,13 +56,13 @@ async def create_deposit(request: Request, db: Session = Depends(get_db_session)
         }
 
         # Create a transaction record
-        transaction = create_transaction(user_id=user.id, ref_id=None, wallet_id=None, amount=float(amount), transaction_type='deposit', memo=str(memo), status='pending', id=deposit_id, transactionData=payment_data, db=db)
+        transaction = create_transaction(user_id=user.id, ref_id=None, wallet_id=None, amount=amount, transaction_type='deposit', memo=str(memo), status='pending', id=deposit_id, transactionData=payment_data, db=db)
 
         if transaction is None:
-            logging.error(colorama.Fore.RED + f"ERROR: Failed to create transaction for user: {user.username} in the amount of {amount}. Deposit ID: {deposit_id}")
+            logging.error("ERROR: Failed to create transaction for user: %s in the amount of %s. Deposit ID: %s", user.username, amount, deposit_id)
             return JSONResponse({'error': 'Failed to create transaction'}, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        logging.info(colorama.Fore.GREEN + f"DEPOSIT: Deposit started for user : {user.username} in the amount of {amount}. Deposit ID: {deposit_id}")
+        logging.info("DEPOSIT: Deposit started for user : %s in the amount of %s. Deposit ID: %s", user.username, amount, deposit_id)
         return JSONResponse(payment_data)
 
     except requests.exceptions.RequestException as err:
@@ -72,14 +74,14 @@ async def create_withdrawal(request: Request, db: Session = Depends(get_db_sessi
     try:
         user_id = current_user.uid
         data = await request.json()
-        trans_fee = 0.01  # Fetch from db or api
-        amount = float(data["amount"]) + trans_fee
+        trans_fee = to_money('0.01')  # Fetch from db or api
+        amount = to_money(data["amount"]) + trans_fee
 
         # Check if the user exists
         user = db.query(User).filter(User.uid == user_id).first()
         if user is None:
             if config['app']['debug'] == True:
-                logging.error(colorama.Fore.RED + f"ERROR: User not found. Unable to create withdrawal for user: {user_id}")
+                logging.error("ERROR: User not found. Unable to create withdrawal for user: %s", user_id)
             return JSONResponse({'error': 'User not found. Unable to create withdrawal'}, status_code=status.HTTP_404_NOT_FOUND)
 
         # Check if the amount is a positive number
@@ -98,12 +100,12 @@ async def create_withdrawal(request: Request, db: Session = Depends(get_db_sessi
         app_wallet_balance = pi_network.get_balance()
 
         if app_wallet_balance is None:
-            logging.error(colorama.Fore.RED + f"PAYMENT ERROR: Failed to get app wallet balance. Unable to create withdrawal for user: {user.username}")
+            logging.error("PAYMENT ERROR: Failed to get app wallet balance. Unable to create withdrawal for user: %s", user.username)
             app_wallet_balance = 0
 
         # Check if the app wallet has enough balance to process the withdrawal
         if app_wallet_balance < amount:
-            logging.error(colorama.Fore.RED + f"PAYMENT ERROR: **Insufficient balance in app wallet. Unable to create withdrawal for user: {user.username} in the amount of {amount}**")
+            logging.error("PAYMENT ERROR: **Insufficient balance in app wallet. Unable to create withdrawal for user: %s in the amount of %s**", user.username, amount)
             return JSONResponse({'error': 'Server is currently under maintenance. Please try again later'}, status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
 
         withdrawal_id = str(uuid.uuid4())
@@ -124,7 +126,7 @@ async def create_withdrawal(request: Request, db: Session = Depends(get_db_sessi
 
         payment_data = {
             "payment": {
-                "amount": amount,
+                "amount": float(amount),
                 "memo": memo,
                 "metadata": metadata,
                 "uid": user_id
@@ -132,11 +134,11 @@ async def create_withdrawal(request: Request, db: Session = Depends(get_db_sessi
         }
 
         # Create a transaction record
-        transaction = create_transaction(user_id=user.id, ref_id=None, wallet_id=None, amount=float(amount), transaction_type='withdrawal', memo=str(memo), status='pending', id=withdrawal_id, transactionData=payment_data, db=db)
+        transaction = create_transaction(user_id=user.id, ref_id=None, wallet_id=None, amount=amount, transaction_type='withdrawal', memo=str(memo), status='pending', id=withdrawal_id, transactionData=payment_data, db=db)
 
         if transaction is None:
             if config['app']['debug'] == True:
-                logging.error(colorama.Fore.RED + f"ERROR: Failed to create transaction for user: {user.username} in the amount of {amount}. Payment ID: {withdrawal_id}")
+                logging.error("ERROR: Failed to create transaction for user: %s in the amount of %s. Payment ID: %s", user.username, amount, withdrawal_id)
             return JSONResponse({'error': 'Failed to create transaction'}, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
         # Get transaction from db using withdrawal_id in pending status to not overpay
@@ -144,43 +146,55 @@ async def create_withdrawal(request: Request, db: Session = Depends(get_db_sessi
 
         if payment is None:
             if config['app']['debug'] == True:
-                logging.error(colorama.Fore.RED + f"ERROR: Failed to create withdrawal for user: {user.username} in the amount of {amount}. Payment ID: {withdrawal_id}. Payment not found or already completed")
+                logging.error("ERROR: Failed to create withdrawal for user: %s in the amount of %s. Payment ID: %s. Payment not found or already completed", user.username, amount, withdrawal_id)
             return JSONResponse({'error': 'Failed to create withdrawal. Server error. Please try again later or contact support for assistance'}, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+        # Take the amount from the balance before anything is paid out. The balance check above is
+        # a plain read, this conditional debit is the one concurrent withdrawals cannot both pass
+        if not hold_withdrawal(payment, db):
+            db.rollback()
+            cancel_withdrawal(withdrawal_id, 'insufficient balance', db)
+            return JSONResponse({'error': 'Insufficient balance'}, status_code=status.HTTP_400_BAD_REQUEST)
+        db.commit()
+
         payment_id = pi_network.create_payment(payment_data['payment'])
 
-        if payment_id is None:
-            logging.error(colorama.Fore.RED + f"ERROR: Failed to create withdrawal for user: {user.username} in the amount of {amount}. Payment ID: {withdrawal_id}.")
+        if not payment_id:
+            logging.error("ERROR: Failed to create withdrawal for user: %s in the amount of %s. Payment ID: %s.", user.username, amount, withdrawal_id)
+            cancel_withdrawal(withdrawal_id, 'Pi payment could not be created', db)
             return JSONResponse({'error': 'Failed to create withdrawal. Server error. Please try again later or contact support for assistance'}, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        logging.info(colorama.Fore.GREEN + f"WITHDRAWAL: Withdrawal started for user : {user.username} in the amount of {amount}. Payment ID: {withdrawal_id}")
+        logging.info("WITHDRAWAL: Withdrawal started for user : %s in the amount of %s. Payment ID: %s", user.username, amount, withdrawal_id)
 
         # Update the transaction status to pending
         payment.status = 'approved'
-        payment.ref_id = payment_id
+        payment.reference_id = payment_id
         db.commit()
 
-        # Approve the transaction
+        # Approve the transaction. If submitting raises, the payment may or may not be on chain: the
+        # amount stays held and the reconciliation job completes or cancels the withdrawal
         txid = pi_network.submit_payment(payment_id, False)
 
-        # if response status is not 200, return an error
-        if txid is None:
-            logging.error(colorama.Fore.RED + f"ERROR: Approve payment failed. Failed to approve payment. Payment ID: {withdrawal_id}.")
+        # Nothing was submitted, cancel the Pi payment and give the amount back
+        if not txid:
+            logging.error("ERROR: Approve payment failed. Failed to approve payment. Payment ID: %s.", withdrawal_id)
+            pi_network.cancel_payment(payment_id)
+            cancel_withdrawal(withdrawal_id, 'Pi payment could not be submitted', db)
             return JSONResponse({'error': 'Failed to approve payment'}, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
         # Complete the transaction
         paymentData = pi_network.complete_payment(payment_id, txid)
 
         if paymentData is None:
-            logging.error(colorama.Fore.RED + f"ERROR: Failed to complete transaction for user: {user.username} in the amount of {amount}. Payment ID: {withdrawal_id}")
+            logging.error("ERROR: Failed to complete transaction for user: %s in the amount of %s. Payment ID: %s", user.username, amount, withdrawal_id)
             return JSONResponse({'error': 'Failed to complete transaction'}, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
         if not complete_transaction(payment.id, txid, db):
             if config['app']['debug'] == True:
-                logging.error(colorama.Fore.RED + f"ERROR: Failed to complete transaction for user: {user.username} in the amount of {amount}. Payment ID: {withdrawal_id}")
+                logging.error("ERROR: Failed to complete transaction for user: %s in the amount of %s. Payment ID: %s", user.username, amount, withdrawal_id)
             return JSONResponse({'error': 'Failed to complete transaction'}, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        logging.info(colorama.Fore.GREEN + f"APPROVE: Withdrawal approved successfully for user: {user.username} with amount: {amount}. Payment ID: {withdrawal_id}")
+        logging.info("APPROVE: Withdrawal approved successfully for user: %s with amount: %s. Payment ID: %s", user.username, amount, withdrawal_id)
 
         # Get new user balance
         user = db.query(User).filter(User.uid == user_id).first()
@@ -199,7 +213,7 @@ async def approve_payment(payment_id: str, request: Request, db: Session = Depen
         user = db.query(User).filter(User.uid == user_id).first()
 
         if user is None:
-            logging.error(colorama.Fore.RED + f"ERROR: Approve payment failed. User not found")
+            logging.error("ERROR: Approve payment failed. User not found")
             return JSONResponse({'error': 'User not found'}, status_code=status.HTTP_404_NOT_FOUND)
 
         user_scope = db.query(UserScopes).filter(UserScopes.user_id == user.id, UserScopes.scope == 'payments').first()
@@ -216,7 +230,7 @@ async def approve_payment(payment_id: str, request: Request, db: Session = Depen
         # if deposit_id is not provided, return an error
         if req_deposit_id is None:
             if config['app']['debug'] == True:
-                logging.error(colorama.Fore.RED + f"ERROR: Approve payment failed. Deposit ID not provided")
+                logging.error("ERROR: Approve payment failed. Deposit ID not provided")
             return JSONResponse({'error': 'Deposit ID is required'}, status_code=status.HTTP_400_BAD_REQUEST)
 
         # Get Transaction from db using deposit_id
@@ -225,7 +239,7 @@ async def approve_payment(payment_id: str, request: Request, db: Session = Depen
         # If payment is not found, return an error
         if payment is None:
             if config['app']['debug'] == True:
-                logging.error(colorama.Fore.RED + f"ERROR: Approve payment failed. Payment not found for user: {user.username}. Payment ID: {req_deposit_id}")
+                logging.error("ERROR: Approve payment failed. Payment not found for user: %s. Payment ID: %s", user.username, req_deposit_id)
             return JSONResponse({'error': 'Invalid payment request. Please try again or contact support'}, status_code=status.HTTP_400_BAD_REQUEST)
 
         # Get transaction Data from db using deposit_id
@@ -233,14 +247,14 @@ async def approve_payment(payment_id: str, request: Request, db: Session = Depen
 
         if db_data is None:
             if config['app']['debug'] == True:
-                logging.error(colorama.Fore.RED + f"ERROR: Approve payment failed. Transaction data not found for user: {user.username}. Payment ID: {req_deposit_id}")
+                logging.error("ERROR: Approve payment failed. Transaction data not found for user: %s. Payment ID: %s", user.username, req_deposit_id)
             return JSONResponse({'error': 'Invalid payment request. Please try again or contact support'}, status_code=status.HTTP_400_BAD_REQUEST)
 
         data = db_data.data
 
         if data is None:
             if config['app']['debug'] == True:
-                logging.error(colorama.Fore.RED + f"ERROR: Approve payment failed. Transaction data not found for user: {user.username}. Payment ID: {req_deposit_id}")
+                logging.error("ERROR: Approve payment failed. Transaction data not found for user: %s. Payment ID: %s", user.username, req_deposit_id)
             return JSONResponse({'error': 'Invalid payment request. Please try again or contact support'}, status_code=status.HTTP_400_BAD_REQUEST)
 
         pl_cost = data['payment']['amount']
@@ -249,7 +263,7 @@ async def approve_payment(payment_id: str, request: Request, db: Session = Depen
         if pl_cost is None or pl_cost <= 0:
             return JSONResponse({'error': 'Invalid amount'}, status_code=status.HTTP_400_BAD_REQUEST)
 
-        logging.info(colorama.Fore.GREEN + f"APPROVE: Creating a new payment for user: {user.username} in the amount of {pl_cost}. Payment ID: {req_deposit_id}")
+        logging.info("APPROVE: Creating a new payment for user: %s in the amount of %s. Payment ID: %s", user.username, pl_cost, req_deposit_id)
 
         # approveStatus = pi_network.get_payment(payment_id)
         headers = {
@@ -264,15 +278,15 @@ async def approve_payment(payment_id: str, request: Request, db: Session = Depen
 
         # if response status is not 200, return an error
         if response.status_code != 200:
-            logging.error(colorama.Fore.RED + f"ERROR: Approve payment failed. Failed to approve payment. Payment ID: {payment_id}. Response: {response.content}")
+            logging.error("ERROR: Approve payment failed. Failed to approve payment. Payment ID: %s. Response: %s", payment_id, response.content)
             return JSONResponse({'error': 'Failed to approve payment'}, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
         # Update the transaction status to Approved
         payment.status = 'approved'
-        payment.ref_id = payment_id
+        payment.reference_id = payment_id
         db.commit()
 
-        logging.info(colorama.Fore.GREEN + f"APPROVE: Payment approved successfully for user: {user.username}. Payment ID: {payment_id}")
+        logging.info("APPROVE: Payment approved successfully for user: %s. Payment ID: %s", user.username, payment_id)
         return JSONResponse(response.json())
     except Exception as err:
         logging.error(err)
@@ -305,7 +319,7 @@ async def complete_payment(payment_id: str, request: Request, db: Session = Depe
 
         if payment is None:
             if config['app']['debug'] == True:
-                logging.error(colorama.Fore.RED + f"ERROR: Complete payment failed. Payment not found or was not approved for user: {user.username}. Payment ID: {req_deposit_id}")
+                logging.error("ERROR: Complete payment failed. Payment not found or was not approved for user: %s. Payment ID: %s", user.username, req_deposit_id)
             return JSONResponse({'error': 'Payment not found or already completed'}, status_code=status.HTTP_404_NOT_FOUND)
 
         # Get transaction Data from db using deposit_id
@@ -313,7 +327,7 @@ async def complete_payment(payment_id: str, request: Request, db: Session = Depe
 
         if data is None:
             if config['app']['debug'] == True:
-                logging.error(colorama.Fore.RED + f"ERROR: Approve payment failed. Transaction data not found for user: {user.username}. Payment ID: {req_deposit_id}")
+                logging.error("ERROR: Approve payment failed. Transaction data not found for user: %s. Payment ID: %s", user.username, req_deposit_id)
             return JSONResponse({'error': 'Invalid payment request. Please try again or contact support'}, status_code=status.HTTP_400_BAD_REQUEST)
 
         # Check if the payment ID and transaction ID are provided
@@ -328,9 +342,8 @@ async def complete_payment(payment_id: str, request: Request, db: Session = Depe
         }
         response = requests.post(f"{config['api']['base_url']}/v2/payments/{payment_id}/complete", json={"txid": txid}, headers=headers)
 
-        # Save contents to json file locally using payment_id as filename ({payment_id}_confirmed.json) in path resources/confirmations/
-        with open(f"resources/confirmations/{req_deposit_id}_confirmed.json", "w") as f:
-            json.dump(response.json(), f)
+        # Keep a copy of the confirmation in the confirmation store
+        await confirmation_store.put_async(req_deposit_id, response.json())
 
         if response.status_code != 200:
             return JSONResponse({'error': 'Failed to complete payment'}, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -341,10 +354,10 @@ async def complete_payment(payment_id: str, request: Request, db: Session = Depe
 
         db.commit()
 
-        logging.info(colorama.Fore.GREEN + f"COMPLETE: Payment completed successfully for user: {user.username}. Payment ID: {req_deposit_id}")
+        logging.info("COMPLETE: Payment completed successfully for user: %s. Payment ID: %s", user.username, req_deposit_id)
         return JSONResponse({'message': 'Payment completed successfully'}, status_code=status.HTTP_200_OK)
     except Exception as err:
-        logging.error(colorama.Fore.RED + f"ERROR: Complete payment failed. {str(err)}")
+        logging.error("ERROR: Complete payment failed. %s", err)
         return JSONResponse({'error': 'Failed to complete payment'}, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @app.post("/incomplete/{payment_id}")
@@ -357,7 +370,7 @@ async def handle_incomplete_payment(payment_id: str, request: Request, db: Sessi
     user_id = data['payment']['user_uid'] if 'user_uid' in data['payment'] else None
     txid = None
 
-    logging.info(colorama.Fore.LIGHTRED_EX + f"INCOMPLETE: Incomplete payment received for user: {user_id}. Payment ID: {payment_id}. Amount: {amount}")
+    logging.info("INCOMPLETE: Incomplete payment received for user: %s. Payment ID: %s. Amount: %s", user_id, payment_id, amount)
 
     try:
         trans_type = data['payment']['metadata']['transType']
@@ -379,13 +392,13 @@ async def handle_incomplete_payment(payment_id: str, request: Request, db: Sessi
     # if payment is not found, return an error
     if payment is None:
         if config['app']['debug'] == True:
-            logging.error(colorama.Fore.RED + f"ERROR: Incomplete payment not found for user: {user_id}. Payment ID: {deposit_id}")
+            logging.error("ERROR: Incomplete payment not found for user: %s. Payment ID: %s", user_id, deposit_id)
         return JSONResponse({'error': 'Payment not found. Please contact support for assistance. Payment ID: {deposit_id}'}, status_code=status.HTTP_404_NOT_FOUND)
 
     # Check if payment status is not approved, return an error, else approve the payment
     if payment.status != 'approved':
         if config['app']['debug'] == True:
-            logging.error(colorama.Fore.RED + f"ERROR: Incomplete payment not approved for user: {user_id}. Payment ID: {deposit_id}")
+            logging.error("ERROR: Incomplete payment not approved for user: %s. Payment ID: %s", user_id, deposit_id)
         return JSONResponse({'error': 'Payment not approved or already completed. Please contact support for assistance. Payment ID: {deposit_id}'}, status_code=status.HTTP_400_BAD_REQUEST)
 
     # Update the transaction status to pending
@@ -394,18 +407,17 @@ async def handle_incomplete_payment(payment_id: str, request: Request, db: Sessi
         "Content-Type": "application/json"
     }
 
-    logging.info(colorama.Fore.LIGHTRED_EX + f"INCOMPLETE: Payment already approved for user: {user_id} in database. Payment ID: {deposit_id}. Submitting to server")
+    logging.info("INCOMPLETE: Payment already approved for user: %s in database. Payment ID: %s. Submitting to server", user_id, deposit_id)
 
     response = requests.post(f"{config['api']['base_url']}/v2/payments/{payment_id}/complete", json={"txid": txid}, headers=headers)
 
-    # Save contents to json file locally using payment_id as filename
-    with open(f"resources/confirmations/{payment_id}_confirmed.json", "w") as f:
-        json.dump(response.json(), f)
+    # Keep a copy of the confirmation in the confirmation store
+    await confirmation_store.put_async(payment_id, response.json())
 
     if response.status_code != 200:
         if config['app']['debug'] == True:
-            logging.error(colorama.Fore.RED + f"ERROR: Failed to complete payment for user: {user_id}. Payment ID: {deposit_id}")
-            logging.error(colorama.Fore.RED + f"ERROR: Response: {response.content}")
+            logging.error("ERROR: Failed to complete payment for user: %s. Payment ID: %s", user_id, deposit_id)
+            logging.error("ERROR: Response: %s", response.content)
         # Need to alert admins of manual intervention
         return JSONResponse({'error': 'Failed to complete payment'}, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -416,26 +428,25 @@ async def handle_incomplete_payment(payment_id: str, request: Request, db: Sessi
             "Content-Type": "application/json"
         }
 
-        logging.info(colorama.Fore.LIGHTRED_EX + f"INCOMPLETE: Payment approved for user: {user_id}. Payment ID: {deposit_id}. Submitting to server")
+        logging.info("INCOMPLETE: Payment approved for user: %s. Payment ID: %s. Submitting to server", user_id, deposit_id)
         response = requests.post(f"{config['api']['base_url']}/v2/payments/{payment_id}/complete", json={"txid": txid}, headers=headers)
 
-        # Save contents to json file locally using payment_id as filename
-        with open(f"resources/confirmations/{deposit_id}_confirmed.json", "w") as f:
-            json.dump(response.json(), f)
+        # Keep a copy of the confirmation in the confirmation store
+        await confirmation_store.put_async(deposit_id, response.json())
 
         if response.status_code != 200:
             if config['app']['debug'] == True:
-                logging.error(colorama.Fore.RED + f"ERROR: Failed to complete payment for user: {user_id}. Payment ID: {deposit_id}")
-                logging.error(colorama.Fore.RED + f"ERROR: Response: {response.content}")
+                logging.error("ERROR: Failed to complete payment for user: %s. Payment ID: %s", user_id, deposit_id)
+                logging.error("ERROR: Response: %s", response.content)
             return JSONResponse({'error': 'Failed to complete payment'}, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
         # Complete the transaction
         if not complete_transaction(payment.id, txid, db):
             if config['app']['debug'] == True:
-                logging.error(colorama.Fore.RED + f"ERROR: Failed to complete transaction for user: {user_id}. Payment ID: {deposit_id}")
+                logging.error("ERROR: Failed to complete transaction for user: %s. Payment ID: %s", user_id, deposit_id)
             return JSONResponse({'error': 'Failed to complete transaction'}, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-    logging.info(colorama.Fore.LIGHTRED_EX + f"INCOMPLETE: Incomplete payment completed for user: {user_id}. Payment ID: {deposit_id}. Amount: {amount}")
+    logging.info("INCOMPLETE: Incomplete payment completed for user: %s. Payment ID: %s. Amount: %s", user_id, deposit_id, amount)
     # Return success message
     return JSONResponse({'message': 'Payment completed successfully'}, status_code=status.HTTP_200_OK)
 
@@ -459,11 +470,15 @@ async def create_payment(request: Request, current_user: User = Depends(get_curr
 
 @app.get("/get_payment/{payment_id}")
 async def get_payment(payment_id: str, current_user: User = Depends(get_current_user), config: dict = Depends(get_config)):
-    headers = {
-        "Authorization": f"Key {config['api']['server_api_key']}"
-    }
-    response = requests.get(f"{config['api']['base_url']}/v2/payments/{payment_id}", headers=headers)
-    return JSONResponse(response.json())
+    def fetch_payment():
+        headers = {
+            "Authorization": f"Key {config['api']['server_api_key']}"
+        }
+        response = requests.get(f"{config['api']['base_url']}/v2/payments/{payment_id}", headers=headers)
+        return response.json()
+
+    # Clients polling the same payment share one Pi Platform call
+    return JSONResponse(await get_payment_flight.do_async(payment_id, fetch_payment))
 
 @app.post("/cancel_payment/{payment_id}")
 async def cancel_payment(payment_id: str, current_user: User = Depends(get_current_user), config: dict = Depends(get_config)):
@@ -6,6 +6,9 @@ For more information visit https://github.com/pi-apps/pi-python
 import requests
 import json
 import stellar_sdk as s_sdk
+from src.utils.single_flight import single_flight
+
+balance_flight = single_flight('horizon.balance')
 
 class PiNetwork:
 
@@ -19,24 +22,46 @@ class PiNetwork:
     server = ""
     keypair = ""
     fee = ""
+    cached_balance = None
+    balance_streaming = False
+    ready = False
 
     def initialize(self, base_url, api_key, wallet_private_key, network):
         try:
-            if not self.validate_private_seed_format(wallet_private_key):
-                print("No valid private seed!")
-            self.api_key = api_key
-            self.load_account(wallet_private_key, network)
-            self.base_url = base_url
-            self.open_payments = {}
-            self.network = network
-            self.fee = self.server.fetch_base_fee()
-            #self.fee = fee
+            self.configure(base_url, api_key, wallet_private_key, network)
+            self.connect()
             if __debug__:
                 print("Initialized PiNetwork")
+            return True
         except:
             return False
 
+    def configure(self, base_url, api_key, wallet_private_key, network):
+        # No network calls here, the Horizon account and base fee are loaded by connect()
+        self.api_key = api_key
+        self.base_url = base_url
+        self.open_payments = {}
+        self.network = network
+        self.server = s_sdk.Server(self.horizon_url(network))
+        if not self.validate_private_seed_format(wallet_private_key):
+            print("No valid private seed!")
+            return
+        self.keypair = s_sdk.Keypair.from_secret(wallet_private_key)
+
+    def connect(self):
+        self.account = self.server.load_account(self.keypair.public_key)
+        self.fee = self.server.fetch_base_fee()
+        self.ready = True
+
     def get_balance(self):
+        # While the Horizon payment stream is connected it keeps cached_balance current
+        if self.balance_streaming and self.cached_balance is not None:
+            return self.cached_balance
+
+        # Concurrent callers share one Horizon account lookup
+        return balance_flight.do('app_wallet', self.fetch_balance)
+
+    def fetch_balance(self):
         try:
             balances = self.server.accounts().account_id(self.keypair.public_key).call()["balances"]
             balance_found = False
@@ -51,7 +76,7 @@ class PiNetwork:
     def get_payment(self, payment_id):
         url = self.base_url + "/v2/payments/" + payment_id
         re = requests.get(url,headers=self.get_http_headers())
-        self.handle_http_response(re)
+        return self.handle_http_response(re)
 
     def create_payment(self, payment_data):
         try:
@@ -158,6 +183,9 @@ class PiNetwork:
         re = requests.post(url,data=obj,json=obj,headers=self.get_http_headers())
         self.handle_http_response(re)
 
+        if re.status_code == 200:
+            return True
+
     def get_incomplete_server_payments(self):
         url = self.base_url + "/v2/payments/incomplete_server_payments"
         re = requests.get(url,headers=self.get_http_headers())
@@ -186,16 +214,14 @@ class PiNetwork:
         self.client = self.server
         pass
 
-    def load_account(self, private_seed, network):
-        self.keypair = s_sdk.Keypair.from_secret(private_seed)
+    def horizon_url(self, network):
         if network == "Pi Network":
-            host = "api.mainnet.minepi.com"
-            horizon = "https://api.mainnet.minepi.com"
-        else:
-            host = "api.testnet.minepi.com"
-            horizon = "https://api.testnet.minepi.com"
+            return "https://api.mainnet.minepi.com"
+        return "https://api.testnet.minepi.com"
 
-        self.server = s_sdk.Server(horizon)
+    def load_account(self, private_seed, network):
+        self.keypair = s_sdk.Keypair.from_secret(private_seed)
+        self.server = s_sdk.Server(self.horizon_url(network))
         self.account = self.server.load_account(self.keypair.public_key)
 
 
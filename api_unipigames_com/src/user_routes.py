@@ -1,15 +1,17 @@
 # src/user_routes.py
+from datetime import datetime, timedelta
 from src.db.models import Session
 from fastapi import Depends, status, APIRouter
 from src.utils.utils import JSONResponse
 from src.utils.transactions import logging
-from src.db.models import User, Game, Ticket, LottoStats, GameConfig
+from src.db.models import User, Game, Ticket, LottoStats, GameConfig, UserTicketsResponse
 from src.utils.transactions import get_current_user
+from src.utils.balance_history import balance_at, get_statement
 from src.dependencies import get_db_session
 
 user_router = APIRouter()
 
-@user_router.get("/user-tickets")
+@user_router.get("/user-tickets", response_model=UserTicketsResponse)
 async def get_user_tickets(current_user: User = Depends(get_current_user), db: Session = Depends(get_db_session)):
     user = db.query(User).filter(User.uid == current_user.uid).first()
     if not user:
@@ -35,10 +37,38 @@ async def get_user_tickets(current_user: User = Depends(get_current_user), db: S
             'game_name': game.name,
             'numbers_played': ticket.numbers_played,
             'power_number': ticket.power_number,
-            'date_purchased': ticket.date_purchased.isoformat(),
+            'date_purchased': ticket.date_purchased,
             'won': won,
             'prize_claimed': prize_claimed
         }
         ticket_data.append(ticket_info)
 
     return JSONResponse({'tickets': ticket_data}, status_code=status.HTTP_200_OK)
+
+@user_router.get("/balance-history")
+async def get_balance_at(at: str, current_user: User = Depends(get_current_user), db: Session = Depends(get_db_session)):
+    try:
+        at_time = datetime.fromisoformat(at)
+    except ValueError:
+        return JSONResponse({'error': 'Invalid date format. Valid format is YYYY-MM-DDTHH:MM:SS'}, status_code=status.HTTP_400_BAD_REQUEST)
+
+    balance = balance_at(db, current_user.id, at_time)
+    return JSONResponse({'at': at_time, 'balance': balance}, status_code=status.HTTP_200_OK)
+
+@user_router.get("/statement")
+async def get_user_statement(start: str = None, end: str = None, cursor: int = None, limit: int = 50, current_user: User = Depends(get_current_user), db: Session = Depends(get_db_session)):
+    try:
+        end_time = datetime.fromisoformat(end) if end else datetime.now()
+        start_time = datetime.fromisoformat(start) if start else end_time - timedelta(days=30)
+    except ValueError:
+        return JSONResponse({'error': 'Invalid date format. Valid format is YYYY-MM-DDTHH:MM:SS'}, status_code=status.HTTP_400_BAD_REQUEST)
+
+    if start_time >= end_time:
+        return JSONResponse({'error': 'start must be before end'}, status_code=status.HTTP_400_BAD_REQUEST)
+
+    if limit < 1 or limit > 200:
+        return JSONResponse({'error': 'limit must be between 1 and 200'}, status_code=status.HTTP_400_BAD_REQUEST)
+
+    statement = get_statement(db, current_user.id, start_time, end_time, after_id=cursor, limit=limit)
+    statement.update({'start': start_time, 'end': end_time})
+    return JSONResponse(statement, status_code=status.HTTP_200_OK)
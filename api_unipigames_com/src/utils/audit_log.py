@@ -0,0 +1,22 @@
+# src/utils/audit_log.py
+from sqlalchemy import insert
+from src.db.models import TransactionLog
+
+# Key under Session.info that holds the log entries waiting for the next commit
+PENDING_LOGS_KEY = 'pending_transaction_logs'
+
+def append_transaction_log(db, transaction_id: str, log_message: str):
+    # Buffer the entry on the session. It is written by the session's next commit, in the same transaction
+    db.info.setdefault(PENDING_LOGS_KEY, []).append({'transaction_id': transaction_id, 'log_message': log_message})
+
+def flush_transaction_logs(session):
+    entries = session.info.pop(PENDING_LOGS_KEY, None)
+    if not entries:
+        return
+
+    # The referenced transactions have to exist before their log rows
+    session.flush()
+    session.execute(insert(TransactionLog), entries)
+
+def discard_transaction_logs(session):
+    session.info.pop(PENDING_LOGS_KEY, None)
@@ -0,0 +1,235 @@
+# src/utils/balance_history.py
+import sys
+from decimal import Decimal
+from datetime import datetime, timedelta
+from sqlalchemy import case, func, insert
+from src.db.database import SessionLocal
+from src.db.models import Session, User, AccountTransaction, BalanceSnapshot
+from src.utils.money import to_money
+from src.utils.transactions import DEBIT_TRANSACTION_TYPES
+from src.utils.utils import load_config, logging
+
+# Ledger amounts are stored unsigned, debits count against the balance
+SIGNED_AMOUNT = case(
+    (AccountTransaction.transaction_type.in_(DEBIT_TRANSACTION_TYPES), -AccountTransaction.amount),
+    else_=AccountTransaction.amount
+)
+
+
+def signed_amount(entry) -> Decimal:
+    return -entry.amount if entry.transaction_type in DEBIT_TRANSACTION_TYPES else entry.amount
+
+def _roll_forward(db: Session, user_id: int, snapshot, *until) -> Decimal:
+    # Start from the snapshot and add only the ledger entries written after it
+    balance, last_entry_id = (snapshot.balance, snapshot.last_entry_id) if snapshot else (to_money(0), 0)
+    delta = db.query(func.sum(SIGNED_AMOUNT)).filter(
+        AccountTransaction.user_id == user_id,
+        AccountTransaction.id > last_entry_id,
+        *until
+    ).scalar()
+    return balance + to_money(delta or 0)
+
+def balance_at(db: Session, user_id: int, at: datetime) -> Decimal:
+    """Balance just before `at`: the nearest earlier snapshot plus the ledger entries since."""
+    snapshot = db.query(BalanceSnapshot).filter(
+        BalanceSnapshot.user_id == user_id,
+        BalanceSnapshot.taken_at < at
+    ).order_by(BalanceSnapshot.taken_at.desc(), BalanceSnapshot.last_entry_id.desc()).first()
+    return _roll_forward(db, user_id, snapshot, AccountTransaction.dateCreated < at)
+
+def balance_after_entry(db: Session, user_id: int, entry_id: int) -> Decimal:
+    """Balance right after the ledger entry `entry_id` was applied."""
+    snapshot = db.query(BalanceSnapshot).filter(
+        BalanceSnapshot.user_id == user_id,
+        BalanceSnapshot.last_entry_id <= entry_id
+    ).order_by(BalanceSnapshot.last_entry_id.desc()).first()
+    return _roll_forward(db, user_id, snapshot, AccountTransaction.id <= entry_id)
+
+def get_statement(db: Session, user_id: int, start: datetime, end: datetime, after_id: int = None, limit: int = 50):
+    """
+    One page of the user's ledger between start and end, with the running balance.
+
+    Pages are keyed by the last entry id of the previous page, so every page costs one
+    snapshot lookup and one indexed range scan however far into the history it is.
+    """
+    query = db.query(AccountTransaction).filter(
+        AccountTransaction.user_id == user_id,
+        AccountTransaction.dateCreated >= start,
+        AccountTransaction.dateCreated < end
+    )
+    if after_id is not None:
+        query = query.filter(AccountTransaction.id > after_id)
+        balance = balance_after_entry(db, user_id, after_id)
+    else:
+        balance = balance_at(db, user_id, start)
+
+    entries = query.order_by(AccountTransaction.id).limit(limit + 1).all()
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    opening_balance = balance
+    lines = []
+    for entry in entries:
+        balance += signed_amount(entry)
+        lines.append({
+            'id': entry.id,
+            'transaction_type': entry.transaction_type,
+            'amount': signed_amount(entry),
+            'reference_id': entry.reference_id,
+            'date': entry.dateCreated,
+            'balance': balance
+        })
+
+    return {
+        'opening_balance': opening_balance,
+        'closing_balance': balance,
+        'entries': lines,
+        'next_cursor': entries[-1].id if has_more else None
+    }
+
+def take_balance_snapshots(settle_seconds: int = 60):
+    """
+    Write a snapshot for every user with ledger entries since the last run.
+
+    Entries younger than settle_seconds are left for the next run, so an entry whose id was
+    taken by a transaction that had not committed yet is not skipped by the id watermark.
+    """
+    session = SessionLocal()
+    try:
+        watermark = session.query(func.max(BalanceSnapshot.last_entry_id)).scalar() or 0
+        cut = session.query(func.max(AccountTransaction.id)).filter(
+            AccountTransaction.id > watermark,
+            AccountTransaction.dateCreated < datetime.now() - timedelta(seconds=settle_seconds)
+        ).scalar()
+        if cut is None:
+            return 0
+
+        changes = session.query(
+            AccountTransaction.user_id,
+            func.sum(SIGNED_AMOUNT),
+            func.max(AccountTransaction.dateCreated)
+        ).filter(
+            AccountTransaction.id > watermark,
+            AccountTransaction.id <= cut
+        ).group_by(AccountTransaction.user_id).all()
+
+        # Latest snapshot of every user involved, newer snapshots always have higher ids
+        latest_ids = session.query(func.max(BalanceSnapshot.id)).filter(
+            BalanceSnapshot.user_id.in_([user_id for user_id, _, _ in changes])
+        ).group_by(BalanceSnapshot.user_id)
+        previous = {
+            snapshot.user_id: snapshot.balance
+            for snapshot in session.query(BalanceSnapshot).filter(BalanceSnapshot.id.in_(latest_ids))
+        }
+
+        session.execute(insert(BalanceSnapshot), [
+            {
+                'user_id': user_id,
+                'balance': previous.get(user_id, to_money(0)) + to_money(delta or 0),
+                'last_entry_id': cut,
+                'taken_at': taken_at
+            }
+            for user_id, delta, taken_at in changes
+        ])
+        session.commit()
+
+        logging.info("BALANCE: Snapshot %s balances up to ledger entry %s", len(changes), cut)
+        return len(changes)
+    except Exception as e:
+        session.rollback()
+        logging.error("Error taking balance snapshots: %s", e)
+        return 0
+    finally:
+        session.close()
+
+def verify_balance_snapshots(repair: bool = False, batch_size: int = 200):
+    """
+    Rebuild every user's snapshots from the ledger and report where they drift.
+
+    A snapshot that differs from the replayed ledger is logged, and corrected when repair is
+    set. A user balance that differs from the ledger total means a balance change was made
+    without its ledger entry; it is logged but never changed here.
+    """
+    result = {'users': 0, 'snapshots_drifted': 0, 'balances_drifted': 0}
+    last_user_id = 0
+
+    while True:
+        session = SessionLocal()
+        try:
+            users = session.query(User.id, User.balance).filter(User.id > last_user_id).order_by(User.id).limit(batch_size).all()
+            if not users:
+                break
+
+            for user_id, user_balance in users:
+                snapshots = session.query(BalanceSnapshot).filter(
+                    BalanceSnapshot.user_id == user_id
+                ).order_by(BalanceSnapshot.last_entry_id, BalanceSnapshot.id).all()
+
+                # The opening snapshot holds the balance from before the ledger existed and is taken as given
+                expected = to_money(0)
+                if snapshots and snapshots[0].last_entry_id == 0:
+                    expected = snapshots.pop(0).balance
+
+                entries = session.query(AccountTransaction.id, SIGNED_AMOUNT).filter(
+                    AccountTransaction.user_id == user_id
+                ).order_by(AccountTransaction.id).yield_per(1000)
+
+                pending = iter(snapshots)
+                snapshot = next(pending, None)
+                for entry_id, amount in entries:
+                    while snapshot is not None and snapshot.last_entry_id < entry_id:
+                        _check_snapshot(snapshot, expected, repair, result)
+                        snapshot = next(pending, None)
+                    expected += to_money(amount)
+
+                while snapshot is not None:
+                    _check_snapshot(snapshot, expected, repair, result)
+                    snapshot = next(pending, None)
+
+                if to_money(user_balance or 0) != expected:
+                    result['balances_drifted'] += 1
+                    logging.warning("BALANCE: User %s balance %s does not match ledger total %s", user_id, user_balance, expected)
+
+            if repair:
+                session.commit()
+            result['users'] += len(users)
+            last_user_id = users[-1][0]
+        except Exception as e:
+            session.rollback()
+            logging.error("Error verifying balance snapshots: %s", e)
+            break
+        finally:
+            session.close()
+
+    logging.info("BALANCE: Verified %s users. %s snapshots and %s balances drifted", result['users'], result['snapshots_drifted'], result['balances_drifted'])
+    return result
+
+def _check_snapshot(snapshot, expected: Decimal, repair: bool, result: dict):
+    if snapshot.balance == expected:
+        return
+
+    result['snapshots_drifted'] += 1
+    logging.warning("BALANCE: Snapshot %s of user %s is %s, the ledger gives %s", snapshot.id, snapshot.user_id, snapshot.balance, expected)
+    if repair:
+        snapshot.balance = expected
+
+
+history_config = load_config().get('balance_history', {})
+
+def run_balance_snapshots():
+    take_balance_snapshots(history_config.get('settleSeconds', 60))
+
+def run_balance_verification():
+    verify_balance_snapshots(repair=history_config.get('repairDrift', False))
+
+
+if __name__ == "__main__":
+    # Usage: python -m src.utils.balance_history snapshot|verify [--repair]
+    if len(sys.argv) < 2 or sys.argv[1] not in ('snapshot', 'verify'):
+        print("Usage: python -m src.utils.balance_history snapshot|verify [--repair]")
+        sys.exit(1)
+
+    if sys.argv[1] == 'snapshot':
+        print(f"Snapshot {take_balance_snapshots(history_config.get('settleSeconds', 60))} balances")
+    else:
+        print(verify_balance_snapshots(repair='--repair' in sys.argv))
@@ -0,0 +1,266 @@
+# src/utils/cache.py
+import os
+import stat
+import time
+import orjson
+import sqlite3
+import threading
+from collections import OrderedDict
+from src.utils.utils import dumps_json, load_config, logging
+
+
+class LocalTier:
+    """Per-process LRU of (expires, value) with a bounded number of entries."""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, value, expires: float):
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SqliteSharedTier:
+    """
+    Cache tier shared by every worker on the host, kept in an SQLite file.
+
+    Put on a tmpfs such as /dev/shm it is a shared-memory store; anything offering get, set,
+    the namespace version counters and the event log can stand in for it, e.g. a local
+    key-value server. Size is bounded by max_bytes: expired entries go first, then those
+    closest to expiry. The event log relays short-lived messages between workers.
+
+    Whoever can write the file decides what every worker reads from it, e.g. which Pi tokens
+    count as verified. It is created 0600 in a directory no other user can write to, and an
+    existing file or directory owned by another user or open to others is refused with
+    PermissionError.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 64 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._writes = 0
+
+        directory = os.path.dirname(path) or '.'
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        check_private(directory, 0o022)
+        # O_NOFOLLOW: a symlink planted at the path is not followed
+        os.close(os.open(path, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW, 0o600))
+        check_private(path, 0o077)
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            # A cache can lose its last writes on a crash, it is never the source of truth
+            connection.execute('PRAGMA synchronous=OFF')
+            connection.execute('CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL NOT NULL)')
+            connection.execute('CREATE INDEX IF NOT EXISTS ix_entries_expires ON entries (expires)')
+            connection.execute('CREATE TABLE IF NOT EXISTS versions (namespace TEXT PRIMARY KEY, version INTEGER NOT NULL)')
+            connection.execute('CREATE TABLE IF NOT EXISTS events (id INTEGER PRIMARY KEY AUTOINCREMENT, channel TEXT NOT NULL, payload BLOB NOT NULL, created REAL NOT NULL)')
+            self._local.connection = connection
+        return connection
+
+    def get(self, key: str):
+        row = self._connection().execute('SELECT value, expires FROM entries WHERE key = ? AND expires > ?', (key, time.time())).fetchone()
+        return None if row is None else (row[1], row[0])
+
+    def set(self, key: str, value: bytes, expires: float):
+        connection = self._connection()
+        connection.execute('INSERT OR REPLACE INTO entries (key, value, expires) VALUES (?, ?, ?)', (key, value, expires))
+
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self._evict(connection)
+
+    def _evict(self, connection):
+        connection.execute('DELETE FROM entries WHERE expires <= ?', (time.time(),))
+        size, count = connection.execute('SELECT COALESCE(SUM(LENGTH(value)), 0), COUNT(*) FROM entries').fetchone()
+        if size > self.max_bytes:
+            # Drop the entries closest to expiry until a quarter of the budget is free again
+            excess = int(count * (size - self.max_bytes * 0.75) / size) + 1
+            connection.execute('DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY expires LIMIT ?)', (excess,))
+
+    def version(self, namespace: str) -> int:
+        row = self._connection().execute('SELECT version FROM versions WHERE namespace = ?', (namespace,)).fetchone()
+        return row[0] if row is not None else 0
+
+    def append_event(self, channel: str, payload: bytes, retention: float = 60):
+        """Add a message for the other workers to read with read_events. Messages older than retention seconds are dropped."""
+        connection = self._connection()
+        connection.execute('INSERT INTO events (channel, payload, created) VALUES (?, ?, ?)', (channel, payload, time.time()))
+
+        self._writes += 1
+        if self._writes % 100 == 0:
+            connection.execute('DELETE FROM events WHERE created < ?', (time.time() - retention,))
+
+    def read_events(self, channel: str, after_id: int, limit: int = 1000):
+        return self._connection().execute(
+            'SELECT id, payload FROM events WHERE id > ? AND channel = ? ORDER BY id LIMIT ?',
+            (after_id, channel, limit)
+        ).fetchall()
+
+    def last_event_id(self) -> int:
+        row = self._connection().execute('SELECT MAX(id) FROM events').fetchone()
+        return row[0] or 0
+
+    def bump(self, namespace: str) -> int:
+        connection = self._connection()
+        connection.execute(
+            'INSERT INTO versions (namespace, version) VALUES (?, 1) '
+            'ON CONFLICT (namespace) DO UPDATE SET version = version + 1',
+            (namespace,)
+        )
+        return self.version(namespace)
+
+
+class TwoTierCache:
+    """
+    Per-process LRU in front of a tier shared by all gunicorn workers.
+
+    Keys live in namespaces. Each namespace has a version number kept in the shared tier and
+    stored keys include it, so invalidate() is a single counter bump that every worker
+    notices within version_check seconds, after which the old entries are simply never read
+    again and age out. A miss in the local tier is filled from the shared tier, so a value
+    built by one worker is not rebuilt by the others.
+
+    The shared tier holds JSON. Values that are not plain JSON are stored through an encode
+    function and rebuilt on a shared hit with the matching decode function.
+    """
+
+    def __init__(self, shared=None, local_max_entries: int = 1024, version_check: float = 1.0):
+        self.local = LocalTier(local_max_entries)
+        self.shared = shared
+        self.version_check = version_check
+        self._versions = {}
+        self._lock = threading.Lock()
+        self.stats = {'local_hits': 0, 'shared_hits': 0, 'misses': 0, 'shared_errors': 0}
+
+    def version(self, namespace: str) -> int:
+        now = time.monotonic()
+        with self._lock:
+            cached = self._versions.get(namespace)
+            if cached is not None and (self.shared is None or now - cached[1] < self.version_check):
+                return cached[0]
+
+        version = cached[0] if cached is not None else 0
+        if self.shared is not None:
+            try:
+                version = self.shared.version(namespace)
+            except Exception as e:
+                self._shared_error(e)
+
+        with self._lock:
+            self._versions[namespace] = (version, now)
+        return version
+
+    def invalidate(self, namespace: str):
+        version = self.version(namespace) + 1
+        if self.shared is not None:
+            try:
+                version = self.shared.bump(namespace)
+            except Exception as e:
+                self._shared_error(e)
+
+        with self._lock:
+            self._versions[namespace] = (version, time.monotonic())
+
+    def get(self, namespace: str, key: str, decode=None):
+        full_key = f"{namespace}:{self.version(namespace)}:{key}"
+
+        entry = self.local.get(full_key)
+        if entry is not None:
+            self.stats['local_hits'] += 1
+            return entry[1]
+
+        if self.shared is not None:
+            try:
+                entry = self.shared.get(full_key)
+            except Exception as e:
+                self._shared_error(e)
+                entry = None
+
+            if entry is not None:
+                expires, data = entry
+                value = orjson.loads(data)
+                if decode is not None:
+                    value = decode(value)
+                self.local.set(full_key, value, expires)
+                self.stats['shared_hits'] += 1
+                return value
+
+        self.stats['misses'] += 1
+        return None
+
+    def set(self, namespace: str, key: str, value, ttl: float, version: int = None, encode=None):
+        """Store value for ttl seconds. Pass the version read before building it, so a value built from data invalidated meanwhile is stored under the old version."""
+        if version is None:
+            version = self.version(namespace)
+        full_key = f"{namespace}:{version}:{key}"
+        expires = time.time() + ttl
+
+        self.local.set(full_key, value, expires)
+        if self.shared is not None:
+            try:
+                self.shared.set(full_key, dumps_json(encode(value) if encode is not None else value), expires)
+            except Exception as e:
+                self._shared_error(e)
+
+    def _shared_error(self, error):
+        # Without the shared tier every worker just falls back to its local tier
+        self.stats['shared_errors'] += 1
+        logging.error("CACHE: Shared tier error: %s", error)
+
+
+def check_private(path: str, forbidden_mode: int):
+    """Raise PermissionError unless path is no symlink, is owned by this user and has none of the forbidden_mode bits."""
+    info = os.lstat(path)
+    if stat.S_ISLNK(info.st_mode):
+        raise PermissionError(f'{path} is a symlink')
+    if info.st_uid != os.getuid():
+        raise PermissionError(f'{path} is owned by another user')
+    if info.st_mode & forbidden_mode:
+        raise PermissionError(f'{path} is open to other users (mode {oct(stat.S_IMODE(info.st_mode))})')
+
+def default_shared_path() -> str:
+    # A directory of this user's own on the tmpfs, never a shared name other users could create first
+    if os.path.isdir('/dev/shm'):
+        return f'/dev/shm/pilotto-cache-{os.getuid()}/cache.sqlite3'
+    return 'resources/cache/cache.sqlite3'
+
+
+cache_config = load_config().get('cache', {})
+
+shared_tier = None
+if cache_config.get('backend', 'sqlite') == 'sqlite':
+    try:
+        shared_tier = SqliteSharedTier(cache_config.get('path') or default_shared_path(), max_bytes=cache_config.get('sharedMaxBytes', 64 * 1024 * 1024))
+    except OSError as e:
+        logging.error("CACHE: Shared tier disabled, every worker caches on its own: %s", e)
+
+cache = TwoTierCache(
+    shared_tier,
+    local_max_entries=cache_config.get('localMaxEntries', 1024),
+    version_check=cache_config.get('versionCheckSeconds', 1.0)
+)
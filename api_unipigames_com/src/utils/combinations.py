@@ -0,0 +1,32 @@
+# src/utils/combinations.py
+from sqlalchemy import func
+from src.db.models import Session, Ticket, TicketNumber
+from src.utils.ticket_numbers import numbers_mask
+
+
+def exact_combination_query(db: Session, game_id: int, numbers: list, power_number: int = None):
+    """Ids of the game's tickets played with exactly these main numbers, in any order. One ix_ticket_game_numbers lookup."""
+    query = db.query(Ticket.id).filter(Ticket.game_id == game_id, Ticket.numbers_mask == numbers_mask(numbers))
+    if power_number is not None:
+        query = query.filter(Ticket.power_number == power_number)
+    return query
+
+def partial_combination_query(db: Session, game_id: int, numbers: list, power_number: int = None):
+    """
+    Ids of the game's tickets whose main numbers include all of these.
+
+    Reads one ix_ticket_number_game_number range per number and keeps the tickets found in
+    every range; tickets are only read when the power number is also filtered on.
+    """
+    query = db.query(TicketNumber.ticket_id).filter(
+        TicketNumber.game_id == game_id,
+        TicketNumber.number.in_(numbers)
+    ).group_by(TicketNumber.ticket_id).having(func.count() == len(numbers))
+
+    if power_number is not None:
+        query = query.join(Ticket, Ticket.id == TicketNumber.ticket_id).filter(Ticket.power_number == power_number)
+    return query
+
+def count_combination(db: Session, game_id: int, numbers: list, power_number: int = None, partial: bool = False) -> int:
+    query = (partial_combination_query if partial else exact_combination_query)(db, game_id, numbers, power_number)
+    return db.query(func.count()).select_from(query.subquery()).scalar()
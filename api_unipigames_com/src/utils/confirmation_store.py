@@ -0,0 +1,262 @@
+# src/utils/confirmation_store.py
+import os
+import sys
+import glob
+import json
+import time
+import zlib
+import queue
+import struct
+import sqlite3
+import threading
+from contextlib import closing
+from starlette.concurrency import run_in_threadpool
+from src.utils.utils import load_config, logging
+
+# Record header: payment id length, compressed payload length
+RECORD_HEADER = struct.Struct('>HI')
+
+
+class ConfirmationStore:
+    """
+    Append-only store for Pi payment confirmation payloads.
+
+    Payloads are zlib-compressed and appended to segment files that rotate once they reach
+    segment_max_bytes. An SQLite index maps each payment id to (segment, offset, length) so a
+    confirmation is a single seek and read. Writes are queued and performed in batches by a
+    background thread, with one fsync per batch. Every process writes its own segment files,
+    so gunicorn workers never append to the same file.
+
+    When the queue is full, put() waits up to put_timeout seconds for room before writing
+    inline, and put_async() does its waiting and writing in the threadpool, so the event loop
+    never blocks on the disk. A batch that fails to write is retried with backoff until it is
+    stored, keeping later confirmations queued behind it.
+    """
+
+    def __init__(self, directory: str, segment_max_bytes: int = 64 * 1024 * 1024, queue_size: int = 10000,
+                 put_timeout: float = 5, retry_max_seconds: float = 30):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.put_timeout = put_timeout
+        self.retry_max_seconds = retry_max_seconds
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._closing = False
+        self._write_lock = threading.Lock()
+        self._thread = None
+        self._segment = None
+        self._segment_name = None
+        self._index_ready = False
+
+    def start(self):
+        if self._thread is not None:
+            return
+
+        self._thread = threading.Thread(target=self._run, name='confirmation-store', daemon=True)
+        self._thread.start()
+
+    def close(self):
+        if self._thread is not None:
+            self._closing = True
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+        with self._write_lock:
+            if self._segment is not None:
+                self._segment.close()
+                self._segment = None
+
+    def put(self, payment_id: str, payload):
+        """Queue a confirmation for writing. Blocks while the queue is full, not for use on the event loop."""
+        if self._thread is None:
+            self.write_batch([(payment_id, payload)])
+            return
+
+        try:
+            self._queue.put((payment_id, payload), timeout=self.put_timeout)
+        except queue.Full:
+            # The writer is stuck, keep the confirmation rather than dropping it
+            logging.warning("Confirmation queue full for %ss. Writing payment %s inline", self.put_timeout, payment_id)
+            self.write_batch([(payment_id, payload)])
+
+    async def put_async(self, payment_id: str, payload):
+        """put() for the event loop. Only waiting for room and inline writes leave the loop."""
+        if self._thread is not None:
+            try:
+                self._queue.put_nowait((payment_id, payload))
+                return
+            except queue.Full:
+                pass
+        await run_in_threadpool(self.put, payment_id, payload)
+
+    def get(self, payment_id: str):
+        with closing(self._connect()) as index:
+            row = index.execute(
+                'SELECT segment, offset, length FROM confirmations WHERE payment_id = ? ORDER BY rowid DESC LIMIT 1',
+                (payment_id,)
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        segment, offset, length = row
+        with open(os.path.join(self.directory, segment), 'rb') as f:
+            f.seek(offset)
+            record = f.read(length)
+
+        id_length, data_length = RECORD_HEADER.unpack_from(record)
+        data = record[RECORD_HEADER.size + id_length:RECORD_HEADER.size + id_length + data_length]
+        return json.loads(zlib.decompress(data))
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            batch = []
+            stop = item is None
+            if not stop:
+                batch.append(item)
+
+            # Drain whatever else is waiting so it shares one write and one fsync
+            while not stop and len(batch) < 500:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                else:
+                    batch.append(item)
+
+            if batch:
+                self._write_with_retry(batch)
+
+            if stop:
+                return
+
+    def _write_with_retry(self, batch):
+        delay = 1
+        while True:
+            try:
+                self.write_batch(batch)
+                return
+            except Exception as e:
+                if self._closing:
+                    # Shutting down, one more failure and the worker exits without them
+                    logging.error("Failed to write payment confirmations %s: %s", ', '.join(payment_id for payment_id, _ in batch), e)
+                    return
+                logging.error("Failed to write %s payment confirmations: %s. Retrying in %ss", len(batch), e, delay)
+                time.sleep(delay)
+                delay = min(delay * 2, self.retry_max_seconds)
+
+    def write_batch(self, batch):
+        with self._write_lock:
+            entries = []
+            try:
+                for payment_id, payload in batch:
+                    segment = self._current_segment()
+                    pid = payment_id.encode('utf-8')
+                    data = zlib.compress(json.dumps(payload, separators=(',', ':')).encode('utf-8'))
+                    record = RECORD_HEADER.pack(len(pid), len(data)) + pid + data
+
+                    offset = segment.tell()
+                    segment.write(record)
+                    entries.append((payment_id, self._segment_name, offset, len(record), time.time()))
+
+                self._segment.flush()
+                os.fsync(self._segment.fileno())
+            except Exception:
+                # The end of a partly written segment is unknown, a retry starts a new one
+                self._discard_segment()
+                raise
+
+            with closing(self._connect()) as index, index:
+                index.executemany(
+                    'INSERT INTO confirmations (payment_id, segment, offset, length, created) VALUES (?, ?, ?, ?, ?)',
+                    entries
+                )
+
+    def _current_segment(self):
+        if self._segment is not None and self._segment.tell() < self.segment_max_bytes:
+            return self._segment
+
+        if self._segment is not None:
+            self._segment.flush()
+            os.fsync(self._segment.fileno())
+            self._segment.close()
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._segment_name = f"segment-{int(time.time() * 1000)}-{os.getpid()}.log"
+        self._segment = open(os.path.join(self.directory, self._segment_name), 'ab')
+        return self._segment
+
+    def _discard_segment(self):
+        if self._segment is not None:
+            try:
+                self._segment.close()
+            except OSError:
+                pass
+            self._segment = None
+
+    def _connect(self):
+        if not self._index_ready:
+            os.makedirs(self.directory, exist_ok=True)
+
+        index = sqlite3.connect(os.path.join(self.directory, 'index.sqlite3'), timeout=30)
+        if not self._index_ready:
+            index.execute('PRAGMA journal_mode=WAL')
+            index.execute(
+                'CREATE TABLE IF NOT EXISTS confirmations ('
+                'payment_id TEXT NOT NULL, segment TEXT NOT NULL, offset INTEGER NOT NULL, length INTEGER NOT NULL, created REAL NOT NULL)'
+            )
+            index.execute('CREATE INDEX IF NOT EXISTS ix_confirmations_payment_id ON confirmations (payment_id)')
+            index.commit()
+            self._index_ready = True
+        return index
+
+
+def import_json_files(store: ConfirmationStore, source_directory: str, delete: bool = False):
+    """One-time import of the legacy resources/confirmations/{id}_confirmed.json files."""
+    paths = sorted(glob.glob(os.path.join(source_directory, '*_confirmed.json')))
+    imported = 0
+
+    for start in range(0, len(paths), 500):
+        batch = []
+        batch_paths = []
+        for path in paths[start:start + 500]:
+            payment_id = os.path.basename(path)[:-len('_confirmed.json')]
+            try:
+                with open(path, 'r') as f:
+                    batch.append((payment_id, json.load(f)))
+                batch_paths.append(path)
+            except (OSError, ValueError) as e:
+                logging.error("Skipping confirmation file %s: %s", path, e)
+
+        if batch:
+            store.write_batch(batch)
+            imported += len(batch)
+
+        if delete:
+            for path in batch_paths:
+                os.remove(path)
+
+    return imported
+
+
+config = load_config()
+confirmation_config = config.get('confirmations', {})
+
+confirmation_store = ConfirmationStore(
+    confirmation_config.get('path', 'resources/confirmations'),
+    segment_max_bytes=confirmation_config.get('segmentMaxBytes', 64 * 1024 * 1024),
+    queue_size=confirmation_config.get('queueSize', 10000),
+    put_timeout=confirmation_config.get('putTimeoutSeconds', 5),
+    retry_max_seconds=confirmation_config.get('retryMaxSeconds', 30)
+)
+
+
+if __name__ == "__main__":
+    # Usage: python -m src.utils.confirmation_store [source_directory] [--delete]
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    source = args[0] if args else confirmation_store.directory
+    count = import_json_files(confirmation_store, source, delete='--delete' in sys.argv)
+    print(f"Imported {count} confirmation files from {source}")
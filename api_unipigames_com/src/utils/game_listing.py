@@ -0,0 +1,106 @@
+# src/utils/game_listing.py
+import base64
+import orjson
+from datetime import datetime
+from sqlalchemy import tuple_
+from src.db.models import Session, Game, GameType, GameConfig
+
+# Fields a client can ask for with fields=, and the column each one is read from
+GAME_FIELDS = {
+    'id': Game.id,
+    'name': Game.name,
+    'game_type': GameType.name,
+    'pool_amount': Game.pool_amount,
+    'entry_fee': Game.entry_fee,
+    'end_time': Game.end_time,
+    'status': Game.status,
+    'winner_id': Game.winner_id,
+    'dateCreated': Game.dateCreated,
+    'dateModified': Game.dateModified,
+    'max_players': Game.max_players,
+    # Read with one query for the whole page rather than a column
+    'game_config': None,
+}
+
+SORT_ORDERS = ('id', 'end_time')
+
+# Page size when a cursor is passed without a limit
+DEFAULT_LIMIT = 50
+
+
+def parse_fields(fields: str):
+    """Requested field names in GAME_FIELDS order, or every field when none are given."""
+    if not fields:
+        return list(GAME_FIELDS)
+
+    requested = {field.strip() for field in fields.split(',') if field.strip()}
+    unknown = requested - GAME_FIELDS.keys()
+    if unknown:
+        raise ValueError(f"Invalid fields: {', '.join(sorted(unknown))}. Valid fields are: {', '.join(GAME_FIELDS)}")
+    return [field for field in GAME_FIELDS if field in requested]
+
+def encode_cursor(sort: str, row) -> str:
+    key = [row.id] if sort == 'id' else [row.end_time.isoformat(), row.id]
+    return base64.urlsafe_b64encode(orjson.dumps(key)).decode('ascii')
+
+def decode_cursor(sort: str, cursor: str):
+    try:
+        key = orjson.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        if sort == 'id':
+            return (int(key[0]),)
+        return (datetime.fromisoformat(key[0]), int(key[1]))
+    except (ValueError, TypeError, IndexError, KeyError):
+        raise ValueError('Invalid cursor')
+
+def list_games(db: Session, fields: list, statuses: list = None, game_type: str = None, ends_after: datetime = None,
+               ends_before: datetime = None, sort: str = 'id', cursor: str = None, limit: int = None):
+    """
+    One page of games with only the requested fields, and the cursor of the next page.
+
+    Pages are keyset paginated on (id) or (end_time, id), so every page is an index range
+    scan whatever its depth. Only the selected columns are read, GameType is joined only when
+    it is filtered on or returned, and configs are read for the whole page at once.
+
+    Without a limit every matching game is returned and there is no next_cursor, which is
+    the response /api/games gave before it was paginated.
+    """
+    sort_columns = (Game.id,) if sort == 'id' else (Game.end_time, Game.id)
+    columns = {field: GAME_FIELDS[field] for field in fields if GAME_FIELDS[field] is not None}
+    # The sort key is needed for the next cursor even when it is not returned
+    selected = [column.label(field) for field, column in columns.items()]
+    selected += [column.label(column.key) for column in sort_columns if column.key not in columns]
+
+    query = db.query(*selected)
+    if game_type or 'game_type' in columns:
+        query = query.outerjoin(GameType, GameType.id == Game.game_type_id)
+    if game_type:
+        query = query.filter(GameType.name == game_type)
+    if statuses:
+        query = query.filter(Game.status.in_(statuses))
+    if ends_after:
+        query = query.filter(Game.end_time > ends_after)
+    if ends_before:
+        query = query.filter(Game.end_time < ends_before)
+    if cursor:
+        query = query.filter(tuple_(*sort_columns) > tuple_(*decode_cursor(sort, cursor)))
+
+    query = query.order_by(*sort_columns)
+    if limit is None:
+        rows = query.all()
+    else:
+        rows = query.limit(limit + 1).all()
+        next_cursor = encode_cursor(sort, rows[limit - 1]) if len(rows) > limit else None
+        rows = rows[:limit]
+
+    games = [{field: getattr(row, field) for field in columns} for row in rows]
+
+    if 'game_config' in fields and rows:
+        configs = {row.id: {} for row in rows}
+        for game_id, key, value in db.query(GameConfig.game_id, GameConfig.config_key, GameConfig.config_value).filter(GameConfig.game_id.in_(list(configs))):
+            configs[game_id][key] = value
+        for game, row in zip(games, rows):
+            game['game_config'] = configs[row.id]
+
+    if limit is None:
+        return {'games': games}
+    return {'games': games, 'next_cursor': next_cursor}
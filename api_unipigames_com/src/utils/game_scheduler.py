@@ -0,0 +1,201 @@
+# src/utils/game_scheduler.py
+import heapq
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from sqlalchemy import update
+from src.db.database import SessionLocal
+from src.db.models import Game
+from src.utils.cache import cache
+from src.utils.live_updates import game_update_hub
+from src.utils.utils import load_config, logging
+
+# Bumped in the shared cache tier by schedule()/unschedule() in any worker
+SCHEDULE_NAMESPACE = 'game_schedule'
+
+
+class GameLifecycleScheduler:
+    """
+    Closes games to new tickets at their exact end_time and hands them to the draw handlers.
+
+    Upcoming deadlines are kept in an in-memory min-heap of (end_time, game_id), rebuilt from
+    the database on start. Only the leader worker runs the scheduler. The admin routes call
+    schedule()/unschedule() in whichever worker served them, which updates that worker's heap
+    and bumps a version in the shared cache tier; the leader rebuilds its heap when it sees a
+    new version, within sync_seconds. Every resync_seconds it rebuilds anyway, which catches
+    games changed outside the routes and hosts without a shared tier. Closing is a conditional
+    UPDATE, so a game is closed and handed to the draw once even across a leader change.
+
+    The app does not draw games itself: there is no winner selection or payout code yet. Until
+    a handler is registered with register_draw_handler, closed games stay in the 'closed'
+    status, are logged, and can be listed with /api/games?status=closed.
+    """
+
+    def __init__(self, session_factory, cache, draw_workers: int = 2, sync_seconds: float = 1.0, resync_seconds: float = 60):
+        self._session_factory = session_factory
+        self._cache = cache
+        self._sync_seconds = sync_seconds
+        self._resync_seconds = resync_seconds
+        self._synced_version = None
+        self._synced_at = 0
+        self._heap = []
+        self._deadlines = {}  # game_id -> end_time of the live heap entry, older entries are skipped
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread = None
+        self._draw_handlers = []
+        self._draw_workers = draw_workers
+        self._draw_executor = None
+
+    def start(self):
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+
+        self._draw_executor = ThreadPoolExecutor(max_workers=self._draw_workers, thread_name_prefix='game-draw')
+        logging.info("LIFECYCLE: Scheduled %s active games", self.rebuild())
+        self._thread = threading.Thread(target=self._run, name='game-lifecycle', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+        if self._draw_executor is not None:
+            self._draw_executor.shutdown(wait=True)
+            self._draw_executor = None
+
+    def rebuild(self) -> int:
+        # Read before the games, so a change signalled during the query is picked up next time
+        version = self._cache.version(SCHEDULE_NAMESPACE)
+        session = self._session_factory()
+        try:
+            rows = session.query(Game.id, Game.end_time).filter(Game.status == 'active').all()
+        finally:
+            session.close()
+
+        with self._condition:
+            self._deadlines = {game_id: end_time for game_id, end_time in rows}
+            self._heap = [(end_time, game_id) for game_id, end_time in self._deadlines.items()]
+            heapq.heapify(self._heap)
+            self._synced_version = version
+            self._synced_at = time.monotonic()
+            self._condition.notify()
+
+        logging.debug("LIFECYCLE: Rebuilt the schedule of %s active games", len(rows))
+        return len(rows)
+
+    def schedule(self, game_id: int, end_time: datetime):
+        self._push(game_id, end_time)
+        self._cache.invalidate(SCHEDULE_NAMESPACE)
+
+    def unschedule(self, game_id: int):
+        with self._condition:
+            # The heap entry is left in place and discarded when it reaches the top
+            self._deadlines.pop(game_id, None)
+        self._cache.invalidate(SCHEDULE_NAMESPACE)
+
+    def _push(self, game_id: int, end_time: datetime):
+        with self._condition:
+            self._deadlines[game_id] = end_time
+            heapq.heappush(self._heap, (end_time, game_id))
+            self._condition.notify()
+
+    def _sync(self):
+        try:
+            if self._cache.version(SCHEDULE_NAMESPACE) != self._synced_version or time.monotonic() - self._synced_at >= self._resync_seconds:
+                self.rebuild()
+        except Exception as e:
+            logging.error("LIFECYCLE: Failed to rebuild the schedule: %s", e)
+
+    def register_draw_handler(self, handler):
+        """
+        Call handler(game_id) on a draw thread for every game this worker closes.
+
+        Register before start(). Each game is handed over once, by the leader whose UPDATE
+        closed it, and not again after a failure or restart, so a handler should move the game
+        out of 'closed' itself (e.g. to 'drawn') in the same transaction as its results.
+        """
+        self._draw_handlers.append(handler)
+
+    def _run(self):
+        while True:
+            self._sync()
+            with self._condition:
+                if not self._running:
+                    return
+
+                while self._heap and self._deadlines.get(self._heap[0][1]) != self._heap[0][0]:
+                    heapq.heappop(self._heap)
+
+                delay = (self._heap[0][0] - datetime.now()).total_seconds() if self._heap else self._sync_seconds
+                if delay > 0:
+                    # Wakes at the next deadline, or earlier to look for changes made by other workers
+                    self._condition.wait(timeout=min(delay, self._sync_seconds))
+                    continue
+
+                _, game_id = heapq.heappop(self._heap)
+                self._deadlines.pop(game_id, None)
+
+            self._close_game(game_id)
+
+    def _close_game(self, game_id: int):
+        closed = False
+        session = self._session_factory()
+        try:
+            result = session.execute(
+                update(Game)
+                .where(Game.id == game_id, Game.status == 'active', Game.end_time <= datetime.now())
+                .values(status='closed')
+                .execution_options(synchronize_session=False)
+            )
+            session.commit()
+            closed = result.rowcount == 1
+
+            if closed:
+                # The bulk UPDATE is not seen by the session hooks, live clients are told here
+                game_update_hub.publish_games(session.get_bind(), [game_id])
+            else:
+                # Another worker closed it, or the end_time was moved by an edit we did not see
+                game = session.get(Game, game_id)
+                if game is not None and game.status == 'active':
+                    self._push(game.id, game.end_time)
+        except Exception as e:
+            session.rollback()
+            logging.error("Error closing game %s: %s", game_id, e)
+        finally:
+            session.close()
+
+        if not closed:
+            return
+
+        logging.info("LIFECYCLE: Game %s closed to new tickets", game_id)
+
+        if not self._draw_handlers:
+            logging.warning("LIFECYCLE: No draw handler registered. Game %s is waiting to be drawn", game_id)
+            return
+
+        for handler in self._draw_handlers:
+            self._draw_executor.submit(self._draw, handler, game_id)
+
+    def _draw(self, handler, game_id: int):
+        try:
+            handler(game_id)
+        except Exception as e:
+            logging.error("Error drawing game %s: %s", game_id, e)
+
+
+scheduler_config = load_config().get('game_scheduler', {})
+game_scheduler = GameLifecycleScheduler(
+    SessionLocal,
+    cache,
+    sync_seconds=scheduler_config.get('syncSeconds', 1.0),
+    resync_seconds=scheduler_config.get('resyncSeconds', 60)
+)
@@ -0,0 +1,131 @@
+# src/utils/health.py
+import time
+import asyncio
+import requests
+from datetime import datetime
+from sqlalchemy import text
+from src.db.database import engine
+from src.dependencies import pi_network
+from src.utils.payment_stream import payment_stream
+from src.utils.single_flight import single_flight
+from src.utils.startup import leader_election, pi_network_warmup
+from src.utils.utils import load_config, logging
+
+PROBES = ('database', 'pool', 'pi_platform', 'horizon')
+
+
+class HealthChecker:
+    """
+    Readiness probes for the dependencies a worker needs to serve requests.
+
+    Each probe result is kept for cache_seconds, so a load balancer polling /readyz every
+    second costs one database round trip and one upstream call per worker per period, and
+    concurrent polls share the probe in flight. A worker is ready when every probe listed in
+    `required` passes; the others are reported with their latency but do not take it out of
+    rotation, since an upstream outage affects every worker alike.
+    """
+
+    def __init__(self, engine, pi_network, payment_stream, leader_election, warmup, cache_seconds: float = 5,
+                 timeout: float = 3, pool_saturation: float = 0.9, required=('database', 'pool', 'horizon')):
+        self._engine = engine
+        self._pi_network = pi_network
+        self._payment_stream = payment_stream
+        self._leader_election = leader_election
+        self._warmup = warmup
+        self.cache_seconds = cache_seconds
+        self.timeout = timeout
+        self.pool_saturation = pool_saturation
+        self.required = tuple(required)
+        self._results = {}
+        self._flight = single_flight('health.probes')
+
+    def probe_database(self) -> dict:
+        with self._engine.connect() as connection:
+            connection.execute(text('SELECT 1'))
+        return {'ok': True}
+
+    def probe_pool(self) -> dict:
+        pool = self._engine.pool
+        if not hasattr(pool, 'checkedout') or not hasattr(pool, 'size'):
+            # NullPool and the SQLite singleton pools do not limit connections
+            return {'ok': True, 'pool': type(pool).__name__}
+
+        capacity = pool.size() + max(pool._max_overflow, 0)
+        checked_out = pool.checkedout()
+        saturation = checked_out / capacity if capacity else 0
+        return {
+            'ok': saturation < self.pool_saturation,
+            'checked_out': checked_out,
+            'capacity': capacity,
+            'saturation': round(saturation, 3)
+        }
+
+    def probe_pi_platform(self) -> dict:
+        response = requests.get(
+            f"{self._pi_network.base_url}/v2/payments/incomplete_server_payments",
+            headers=self._pi_network.get_http_headers(),
+            timeout=self.timeout
+        )
+        return {'ok': response.status_code == 200, 'status_code': response.status_code}
+
+    def probe_horizon(self) -> dict:
+        if not self._pi_network.ready:
+            return {'ok': False, 'error': self._warmup.last_error or 'not connected yet', 'attempts': self._warmup.attempts}
+
+        # A connected payment stream already proves Horizon is reachable
+        if self._payment_stream.connected:
+            return {'ok': True, 'stream': 'connected'}
+
+        response = requests.get(self._pi_network.horizon_url(self._pi_network.network), timeout=self.timeout)
+        return {'ok': response.status_code == 200, 'status_code': response.status_code}
+
+    def _run_probe(self, name: str) -> dict:
+        started = time.monotonic()
+        try:
+            result = getattr(self, f'probe_{name}')()
+        except Exception as e:
+            logging.warning("HEALTH: Probe %s failed: %s", name, e)
+            result = {'ok': False, 'error': str(e)}
+
+        result['latency_ms'] = round((time.monotonic() - started) * 1000, 1)
+        result['checked_at'] = datetime.now().isoformat()
+        self._results[name] = (time.monotonic(), result)
+        return result
+
+    async def probe(self, name: str) -> dict:
+        cached = self._results.get(name)
+        if cached is not None and time.monotonic() - cached[0] < self.cache_seconds:
+            return cached[1]
+        return await self._flight.do_async(name, self._run_probe, name)
+
+    async def readiness(self, scheduler=None):
+        results = await asyncio.gather(*(self.probe(name) for name in PROBES))
+        checks = dict(zip(PROBES, results))
+        ready = all(checks[name]['ok'] for name in self.required if name in checks)
+
+        body = {
+            'status': 'ready' if ready else 'not_ready',
+            'checks': checks,
+            'required': list(self.required),
+            'leader': {
+                'is_leader': self._leader_election.is_leader,
+                'scheduler_running': bool(scheduler is not None and scheduler.running),
+                'payment_stream_connected': self._payment_stream.connected
+            }
+        }
+        return ready, body
+
+
+health_config = load_config().get('health', {})
+
+health_checker = HealthChecker(
+    engine,
+    pi_network,
+    payment_stream,
+    leader_election,
+    pi_network_warmup,
+    cache_seconds=health_config.get('probeCacheSeconds', 5),
+    timeout=health_config.get('probeTimeoutSeconds', 3),
+    pool_saturation=health_config.get('poolSaturation', 0.9),
+    required=health_config.get('required', ['database', 'pool', 'horizon'])
+)
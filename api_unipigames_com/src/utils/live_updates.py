@@ -0,0 +1,219 @@
+# src/utils/live_updates.py
+import asyncio
+import threading
+import orjson
+from sqlalchemy import select
+from src.db.models import Game, GameStats, Ticket
+from src.utils.cache import shared_tier
+from src.utils.utils import dumps_json, load_config, logging
+
+CHANNEL = 'games'
+
+
+class Subscriber:
+    """One live connection: the games it follows and the changes not yet sent to it."""
+
+    __slots__ = ('game_ids', 'pending', 'event')
+
+    def __init__(self, game_ids):
+        self.game_ids = game_ids
+        self.pending = {}
+        self.event = asyncio.Event()
+
+    def push(self, game_id: int, delta: dict):
+        # Changes to the same game coalesce until the client reads them, a slow client never queues more than one entry per game
+        self.pending.setdefault(game_id, {'game_id': game_id}).update(delta)
+        self.event.set()
+
+    async def next(self, timeout: float):
+        """The pending changes, or None if nothing changed within timeout seconds."""
+        if not self.pending:
+            self.event.clear()
+            try:
+                await asyncio.wait_for(self.event.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+
+        pending, self.pending = self.pending, {}
+        return list(pending.values())
+
+
+class GameUpdateHub:
+    """
+    Pushes pool, player count and status changes of games to live connections.
+
+    Committed changes are published as the game's current state. Each worker keeps the last
+    state of every game it has seen and sends its subscribers only the fields that changed.
+    With a shared cache tier the states go through its event log, which a relay thread in
+    every worker polls, so a ticket bought through one worker reaches clients connected to
+    all of them. Fan-out runs on the event loop: an idle connection is a coroutine waiting on
+    an asyncio.Event plus a dict of pending changes, without a thread or buffer of its own.
+    """
+
+    def __init__(self, shared=None, poll_interval: float = 0.5, max_subscribers: int = 50000):
+        self.shared = shared
+        self.poll_interval = poll_interval
+        self.max_subscribers = max_subscribers
+        self._states = {}
+        self._by_game = {}
+        self._all = set()
+        self._count = 0
+        self._loop = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self, loop):
+        self._loop = loop
+        if self.shared is None or self._thread is not None:
+            return
+
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._relay, name='live-updates-relay', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread = None
+
+    @property
+    def subscribers(self) -> int:
+        return self._count
+
+    def subscribe(self, game_ids=None) -> Subscriber:
+        if self._count >= self.max_subscribers:
+            return None
+
+        subscriber = Subscriber(frozenset(game_ids) if game_ids else None)
+        if subscriber.game_ids is None:
+            self._all.add(subscriber)
+        else:
+            for game_id in subscriber.game_ids:
+                self._by_game.setdefault(game_id, set()).add(subscriber)
+        self._count += 1
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        if subscriber.game_ids is None:
+            self._all.discard(subscriber)
+        else:
+            for game_id in subscriber.game_ids:
+                subscribers = self._by_game.get(game_id)
+                if subscribers is not None:
+                    subscribers.discard(subscriber)
+                    if not subscribers:
+                        del self._by_game[game_id]
+        self._count -= 1
+
+    def snapshot(self, game_ids=None) -> list:
+        """Last known state of the given games, sent to a connection when it opens."""
+        if game_ids is None:
+            return list(self._states.values())
+        return [self._states[game_id] for game_id in game_ids if game_id in self._states]
+
+    def publish(self, states: list):
+        """Publish game states from any thread, to this worker and through the shared tier to the others."""
+        if not states:
+            return
+
+        if self.shared is not None:
+            try:
+                self.shared.append_event(CHANNEL, dumps_json(states))
+                return
+            except Exception as e:
+                logging.error("LIVE: Failed to relay game updates: %s", e)
+
+        self._dispatch_threadsafe(orjson.loads(dumps_json(states)))
+
+    def publish_games(self, bind, game_ids):
+        """Read the current state of the games on bind (an engine or connection) and publish it."""
+        if not game_ids:
+            return
+
+        try:
+            with bind.connect() as connection:
+                rows = connection.execute(
+                    select(Game.id, Game.status, Game.pool_amount.label('pool_amount'), Game.end_time, Game.max_players, GameStats.tickets_sold, GameStats.players)
+                    .outerjoin(GameStats, GameStats.game_id == Game.id)
+                    .where(Game.id.in_(list(game_ids)))
+                ).all()
+        except Exception as e:
+            logging.error("LIVE: Failed to read game states: %s", e)
+            return
+
+        self.publish([{
+            'game_id': row.id,
+            'status': row.status,
+            'pool_amount': row.pool_amount,
+            'end_time': row.end_time,
+            'max_players': row.max_players,
+            'tickets_sold': row.tickets_sold or 0,
+            'players': row.players or 0
+        } for row in rows])
+
+    def _dispatch_threadsafe(self, states: list):
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._dispatch, states)
+
+    def _dispatch(self, states: list):
+        for state in states:
+            game_id = state['game_id']
+            previous = self._states.get(game_id, {})
+            delta = {key: value for key, value in state.items() if previous.get(key) != value}
+            self._states[game_id] = state
+            if not delta:
+                continue
+
+            for subscriber in self._by_game.get(game_id, ()):
+                subscriber.push(game_id, delta)
+            for subscriber in self._all:
+                subscriber.push(game_id, delta)
+
+    def _relay(self):
+        try:
+            # Only what is published from now on, clients get the current state from /api/games
+            last_id = self.shared.last_event_id()
+        except Exception as e:
+            logging.error("LIVE: Relay could not read the event log: %s", e)
+            last_id = 0
+
+        while not self._stopped.wait(self.poll_interval):
+            try:
+                events = self.shared.read_events(CHANNEL, last_id)
+            except Exception as e:
+                logging.error("LIVE: Relay failed to read game updates: %s", e)
+                continue
+
+            if events:
+                last_id = events[-1][0]
+                states = [state for _, payload in events for state in orjson.loads(payload)]
+                self._dispatch_threadsafe(states)
+
+
+def track_game_changes(session, flush_context):
+    # Games whose state may have changed in this transaction, published once it commits
+    changed = session.info.setdefault('live_games', set())
+    for instance in session.new:
+        if isinstance(instance, Ticket):
+            changed.add(instance.game_id)
+    for instance in session.dirty:
+        if isinstance(instance, Game) and session.is_modified(instance):
+            changed.add(instance.id)
+
+def publish_on_commit(session):
+    game_ids = session.info.pop('live_games', None)
+    if game_ids:
+        # The session cannot run SQL in after_commit, the states are read on a new connection
+        game_update_hub.publish_games(session.get_bind(), game_ids)
+
+def forget_game_changes(session):
+    session.info.pop('live_games', None)
+
+
+live_config = load_config().get('live_updates', {})
+
+game_update_hub = GameUpdateHub(
+    shared_tier,
+    poll_interval=live_config.get('pollIntervalSeconds', 0.5),
+    max_subscribers=live_config.get('maxSubscribers', 50000)
+)
+HEARTBEAT_SECONDS = live_config.get('heartbeatSeconds', 15)
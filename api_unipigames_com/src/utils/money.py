@@ -0,0 +1,96 @@
+# src/utils/money.py
+import sys
+from decimal import Decimal, ROUND_HALF_EVEN
+from sqlalchemy import text, bindparam
+from sqlalchemy.types import TypeDecorator, BigInteger
+
+# Amounts are stored as integer units of 0.0000001 Pi, the precision of the Pi blockchain
+MONEY_SCALE = 10_000_000
+MONEY_QUANTUM = Decimal(1) / MONEY_SCALE
+
+# (table, primary key, legacy float column, integer units column) of every money column
+MONEY_COLUMNS = [
+    ('user', 'id', 'balance', 'balance_units'),
+    ('game', 'id', 'pool_amount', 'pool_amount_units'),
+    ('game', 'id', 'entry_fee', 'entry_fee_units'),
+    ('transaction', 'id', 'amount', 'amount_units'),
+    ('account_transaction', 'id', 'amount', 'amount_units'),
+    ('payment', 'id', 'amount', 'amount_units'),
+    ('lotto_stats', 'id', 'win_amount', 'win_amount_units'),
+]
+
+def to_money(value) -> Decimal:
+    if value is None:
+        return None
+    if isinstance(value, float):
+        # repr gives the shortest decimal that round-trips, so 0.1 stays 0.1
+        value = repr(value)
+    return Decimal(value).quantize(MONEY_QUANTUM, rounding=ROUND_HALF_EVEN)
+
+def to_units(value) -> int:
+    return int(to_money(value) * MONEY_SCALE)
+
+def from_units(units: int) -> Decimal:
+    return (Decimal(units) / MONEY_SCALE).quantize(MONEY_QUANTUM)
+
+class Money(TypeDecorator):
+    """Exact Pi amount. Decimal in Python, integer units in the database."""
+
+    impl = BigInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else to_units(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else from_units(value)
+
+def backfill_money_columns(connection, batch_size: int = 1000):
+    """
+    Copy the legacy float columns into the integer units columns.
+
+    Walks each table by primary key in batches. Run on an autocommit connection every batch
+    commits on its own, so a live table is never locked for long. Only rows whose units value is missing or differs from the float
+    are written, which makes it resumable and lets it be re-run to catch up rows changed by
+    workers still running the float-only code.
+    """
+    for table, pk, legacy, units in MONEY_COLUMNS:
+        converted = f"CAST(ROUND(COALESCE({legacy}, 0) * {MONEY_SCALE}) AS BIGINT)"
+        select_first = text(f'SELECT {pk} FROM "{table}" ORDER BY {pk} LIMIT :limit')
+        select_next = text(f'SELECT {pk} FROM "{table}" WHERE {pk} > :last ORDER BY {pk} LIMIT :limit')
+        update_batch = text(
+            f'UPDATE "{table}" SET {units} = {converted} '
+            f'WHERE {pk} IN :keys AND ({units} IS NULL OR {units} <> {converted})'
+        ).bindparams(bindparam('keys', expanding=True))
+
+        last = None
+        updated = 0
+        while True:
+            if last is None:
+                keys = connection.execute(select_first, {'limit': batch_size}).scalars().all()
+            else:
+                keys = connection.execute(select_next, {'last': last, 'limit': batch_size}).scalars().all()
+            if not keys:
+                break
+
+            updated += connection.execute(update_batch, {'keys': keys}).rowcount
+            last = keys[-1]
+
+        print(f"Backfilled {updated} rows of {table}.{units}")
+
+
+if __name__ == "__main__":
+    # Usage: python -m src.utils.money backfill [--batch=1000]
+    if len(sys.argv) < 2 or sys.argv[1] != 'backfill':
+        print("Usage: python -m src.utils.money backfill [--batch=1000]")
+        sys.exit(1)
+
+    from src.db.database import engine
+
+    batch = 1000
+    for arg in sys.argv:
+        if arg.startswith("--batch="):
+            batch = int(arg.split("=")[1])
+
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        backfill_money_columns(connection, batch)
@@ -0,0 +1,80 @@
+# src/utils/number_heatmap.py
+import json
+from array import array
+from src.db.models import Session, Game, GameConfig, GameNumberCount, GameStats
+from src.utils.cache import cache
+from src.utils.utils import load_config
+
+KINDS = ('main', 'power')
+
+
+class NumberHeatmap:
+    """
+    How often each main and power number of a game has been played.
+
+    The counts are GameNumberCount rows, kept current by the ticket listeners, so building a
+    heatmap reads at most one row per number of the game's range whatever its ticket count.
+    Each heatmap is held as one array of counts per kind, indexed from the start of the range,
+    and shared between workers through the two-tier cache for ttl seconds.
+    """
+
+    def __init__(self, cache, namespace: str = 'numbers', ttl: float = 5.0):
+        self.cache = cache
+        self.namespace = namespace
+        self.ttl = ttl
+
+    def get(self, db: Session, game_id: int):
+        """The game's heatmap, or None if there is no such game."""
+        heatmap = self.cache.get(self.namespace, game_id, decode=self.decode)
+        if heatmap is None:
+            heatmap = self.build(db, game_id)
+            if heatmap is not None and self.ttl > 0:
+                self.cache.set(self.namespace, game_id, heatmap, self.ttl, encode=self.encode)
+        return heatmap
+
+    def build(self, db: Session, game_id: int):
+        if db.get(Game, game_id) is None:
+            return None
+
+        ranges = game_number_ranges(db, game_id)
+        counts = {kind: {} for kind in KINDS}
+        for kind, number, count in db.query(GameNumberCount.kind, GameNumberCount.number, GameNumberCount.count).filter(GameNumberCount.game_id == game_id):
+            if kind in counts and count:
+                counts[kind][number] = count
+
+        heatmap = {'tickets': db.query(GameStats.tickets_sold).filter(GameStats.game_id == game_id).scalar() or 0}
+        for kind in KINDS:
+            played = counts[kind]
+            # Numbers played outside the configured range, or a game without one, widen it to what was played
+            start = min([ranges[kind][0]] + list(played)) if kind in ranges else min(played, default=0)
+            end = max([ranges[kind][1]] + list(played)) if kind in ranges else max(played, default=-1)
+            heatmap[kind] = {'start': start, 'counts': array('I', (played.get(number, 0) for number in range(start, end + 1)))}
+        return heatmap
+
+    # The shared cache tier holds JSON, the counts go through it as lists
+    @staticmethod
+    def encode(heatmap: dict) -> dict:
+        return {'tickets': heatmap['tickets'], **{kind: {'start': heatmap[kind]['start'], 'counts': heatmap[kind]['counts'].tolist()} for kind in KINDS}}
+
+    @staticmethod
+    def decode(data: dict) -> dict:
+        return {'tickets': data['tickets'], **{kind: {'start': data[kind]['start'], 'counts': array('I', data[kind]['counts'])} for kind in KINDS}}
+
+    @classmethod
+    def to_json(cls, game_id: int, heatmap: dict) -> dict:
+        return {'game_id': game_id, **cls.encode(heatmap)}
+
+
+def game_number_ranges(db: Session, game_id: int) -> dict:
+    """The game's number_range config as {'main': (low, high), 'power': (low, high)}, without the kinds it does not set."""
+    value = db.query(GameConfig.config_value).filter(GameConfig.game_id == game_id, GameConfig.config_key == 'number_range').scalar()
+    try:
+        number_range = json.loads(value) if value else {}
+        return {kind: (int(number_range[kind][0]), int(number_range[kind][1])) for kind in KINDS if kind in number_range}
+    except (ValueError, TypeError, IndexError, KeyError):
+        return {}
+
+
+cache_config = load_config().get('cache', {})
+number_heatmap = NumberHeatmap(cache, ttl=cache_config.get('numberHeatmapTtlSeconds', 5))
+
@@ -0,0 +1,233 @@
+# src/utils/payment_stream.py
+import json
+import time
+import threading
+import requests
+from requests_sse import EventSource
+from stellar_sdk.utils import urljoin_with_query
+from src.db.database import SessionLocal
+from src.db.models import Transaction, StreamCursor
+from src.dependencies import pi_network
+from src.utils.confirmation_store import confirmation_store
+from src.utils.money import to_money
+from src.utils.transactions import complete_transaction
+from src.utils.utils import load_config, logging
+
+CURSOR_NAME = 'app_wallet_payments'
+
+
+class StreamStopped(Exception):
+    pass
+
+
+class HorizonPaymentStream:
+    """
+    Follows the app wallet's payments on Horizon and acts on them as they land.
+
+    Every record refreshes the cached app wallet balance. An incoming payment whose memo is
+    the Pi payment id of an approved deposit is completed with the Pi Platform and credited,
+    without waiting for the client to call /complete_payment. The paging token of every
+    processed record is stored in stream_cursor, so after a restart or a dropped connection
+    the stream resumes where it stopped and replays what it missed. A record whose deposit
+    could not be completed is not passed: the stream reconnects from the last stored cursor
+    and retries it. Completing is idempotent, so a record seen twice, or a deposit the client
+    completes at the same moment, is only credited once.
+
+    Reads time out after read_timeout_seconds without data, so stop() is noticed within that
+    time even when no payments arrive.
+    """
+
+    def __init__(self, session_factory, pi_network, base_url: str, api_key: str, reconnect_max_seconds: float = 60, read_timeout_seconds: float = 30):
+        self._session_factory = session_factory
+        self._pi_network = pi_network
+        self._base_url = base_url
+        self._api_key = api_key
+        self._reconnect_max_seconds = reconnect_max_seconds
+        self._read_timeout_seconds = read_timeout_seconds
+        self._running = False
+        self._thread = None
+        self._source = None
+        self.address = None
+        self.connected = False
+        self.last_event_at = None
+
+    def start(self):
+        if self._running:
+            return
+
+        if not self._pi_network.keypair:
+            logging.warning("STREAM: App wallet is not loaded. Payment stream not started")
+            return
+
+        self.address = self._pi_network.keypair.public_key
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='horizon-payments', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5):
+        self._running = False
+        source = self._source
+        if source is not None:
+            # Closing the response wakes a blocked read, the read timeout covers it otherwise
+            source.close()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        self._set_connected(False)
+
+    def _run(self):
+        delay = 1
+        while self._running:
+            cursor = self._load_cursor()
+            try:
+                logging.info("STREAM: Following payments of %s from cursor %s", self.address, cursor)
+                self._refresh_balance()
+                self._set_connected(True)
+
+                builder = self._pi_network.server.payments().for_account(self.address).join('transactions').cursor(cursor)
+                with EventSource(
+                    urljoin_with_query(builder.horizon_url, builder.endpoint),
+                    params=builder.params,
+                    timeout=self._read_timeout_seconds,
+                    on_error=self._raise_if_stopped
+                ) as source:
+                    self._source = source
+                    for event in source:
+                        self._raise_if_stopped()
+                        if event.data in ('"hello"', '"byebye"'):
+                            continue
+                        self.handle_record(json.loads(event.data))
+                        delay = 1
+            except StreamStopped:
+                return
+            except Exception as e:
+                if not self._running:
+                    return
+                logging.error("STREAM: Payment stream failed: %s. Reconnecting in %ss", e, delay)
+
+            finally:
+                self._source = None
+
+            self._set_connected(False)
+            time.sleep(delay)
+            delay = min(delay * 2, self._reconnect_max_seconds)
+
+    def _raise_if_stopped(self):
+        # EventSource calls this on a read timeout or dropped connection before reconnecting itself
+        if not self._running:
+            raise StreamStopped()
+
+    def _set_connected(self, connected: bool):
+        # While connected every balance change reaches us, so the cached balance can be served
+        self.connected = connected
+        self._pi_network.balance_streaming = connected
+
+    def _refresh_balance(self):
+        balances = self._pi_network.server.accounts().account_id(self.address).call()['balances']
+        for balance in balances:
+            if balance['asset_type'] == 'native':
+                self._pi_network.cached_balance = float(balance['balance'])
+                return
+
+    def handle_record(self, record: dict):
+        self.last_event_at = time.time()
+        try:
+            self._refresh_balance()
+        except Exception as e:
+            # Fall back to asking Horizon on every get_balance until the next record
+            self._pi_network.balance_streaming = False
+            logging.error("STREAM: Failed to refresh app wallet balance: %s", e)
+
+        if record.get('type') == 'payment' and record.get('asset_type') == 'native' and record.get('to') == self.address:
+            transaction = record.get('transaction') or {}
+            if transaction.get('successful', record.get('transaction_successful', True)):
+                if not self.handle_incoming_payment(record['transaction_hash'], transaction.get('memo'), record['amount']):
+                    # Keep the cursor before this record, the reconnect replays it
+                    raise RuntimeError(f"payment {record['transaction_hash']} not completed")
+
+        self._save_cursor(record['paging_token'])
+
+    def handle_incoming_payment(self, txid: str, memo: str, amount: str) -> bool:
+        """
+        Completes the deposit the payment is for. Returns False if it should be retried, True
+        once it is completed or there is nothing to complete.
+        """
+        if not memo:
+            return True
+
+        session = self._session_factory()
+        try:
+            # Pi puts the payment identifier in the memo, approve_payment stored it as reference_id
+            deposit = session.query(Transaction).filter(
+                Transaction.reference_id == memo,
+                Transaction.transaction_type == 'deposit',
+                Transaction.status == 'approved'
+            ).first()
+
+            if deposit is None:
+                logging.info("STREAM: No approved deposit for payment %s. Transaction: %s", memo, txid)
+                return True
+
+            if to_money(amount) != deposit.amount:
+                logging.error("STREAM: Payment %s of %s does not match deposit %s of %s. Left for review", memo, amount, deposit.id, deposit.amount)
+                return True
+
+            headers = {
+                "Authorization": f"Key {self._api_key}",
+                "Content-Type": "application/json"
+            }
+            response = requests.post(f"{self._base_url}/v2/payments/{memo}/complete", json={"txid": txid}, headers=headers, timeout=30)
+            if response.status_code != 200:
+                logging.error("STREAM: Pi rejected completion of payment %s: %s", memo, response.content)
+                return False
+
+            confirmation_store.put(deposit.id, response.json())
+            if complete_transaction(deposit.id, txid, session):
+                logging.info("STREAM: Deposit %s completed from transaction %s", deposit.id, txid)
+                return True
+
+            # Not claimed here, fine if the client's /complete_payment got there first
+            session.expire_all()
+            return session.get(Transaction, deposit.id).status == 'completed'
+        except Exception as e:
+            session.rollback()
+            logging.error("STREAM: Error completing payment %s: %s", memo, e)
+            return False
+        finally:
+            session.close()
+
+    def _load_cursor(self) -> str:
+        session = self._session_factory()
+        try:
+            row = session.get(StreamCursor, CURSOR_NAME)
+            # Without a stored cursor only payments from now on are followed
+            return row.cursor if row is not None else 'now'
+        finally:
+            session.close()
+
+    def _save_cursor(self, cursor: str):
+        session = self._session_factory()
+        try:
+            row = session.get(StreamCursor, CURSOR_NAME)
+            if row is None:
+                session.add(StreamCursor(name=CURSOR_NAME, cursor=cursor))
+            else:
+                row.cursor = cursor
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            logging.error("STREAM: Failed to save cursor %s: %s", cursor, e)
+        finally:
+            session.close()
+
+
+config = load_config()
+stream_config = config.get('horizon_stream', {})
+
+payment_stream = HorizonPaymentStream(
+    SessionLocal,
+    pi_network,
+    config['api']['base_url'],
+    config['api']['server_api_key'],
+    reconnect_max_seconds=stream_config.get('reconnectMaxSeconds', 60),
+    read_timeout_seconds=stream_config.get('readTimeoutSeconds', 30)
+)
@@ -0,0 +1,59 @@
+# src/utils/quick_pick.py
+import os
+import numpy as np
+
+# Main numbers on a ticket, as checked by validate_lotto_numbers
+MAIN_NUMBERS = 5
+
+# Random 32-bit words drawn per value needed when sampling below a bound; the extra covers rejected words
+OVERDRAW = 1.25
+
+
+def secure_words(count: int, dtype=np.uint32):
+    """count uniformly random integers of dtype, read from the operating system CSPRNG."""
+    dtype = np.dtype(dtype)
+    return np.frombuffer(os.urandom(count * dtype.itemsize), dtype=dtype)
+
+def secure_below(bound: int, count: int):
+    """
+    count integers uniform in [0, bound) from os.urandom.
+
+    Words at or above the largest multiple of bound below 2**32 are rejected, so that
+    reducing the rest modulo bound favours no value.
+    """
+    limit = (1 << 32) - (1 << 32) % bound
+    values = np.empty(0, dtype=np.int64)
+    while len(values) < count:
+        words = secure_words(int((count - len(values)) * OVERDRAW) + 16)
+        values = np.concatenate((values, words[words < limit] % bound))
+    return values[:count]
+
+def quick_pick(lines: int, main_range, power_range, numbers: int = MAIN_NUMBERS):
+    """
+    Random lines for a game: a (lines, numbers) array of distinct main numbers, sorted within
+    each line, and a (lines,) array of power numbers. Ranges are inclusive (low, high) pairs.
+
+    Every line is generated at once with a partial Fisher-Yates shuffle of the main range:
+    step j swaps position j of each row with a random position at or after it, so the first
+    `numbers` positions are a uniformly random combination. It needs one random word per
+    number picked, however wide the range.
+    """
+    main_low, main_high = int(main_range[0]), int(main_range[1])
+    power_low, power_high = int(power_range[0]), int(power_range[1])
+    span = main_high - main_low + 1
+    if lines < 1:
+        raise ValueError('At least one line must be picked')
+    if numbers > span or power_high < power_low:
+        raise ValueError(f'Cannot pick {numbers} distinct numbers from {main_low}-{main_high} and a power number from {power_low}-{power_high}')
+
+    pool = np.tile(np.arange(main_low, main_high + 1, dtype=np.int32), (lines, 1))
+    rows = np.arange(lines)
+    for position in range(numbers):
+        chosen = position + secure_below(span - position, lines)
+        picked = pool[rows, chosen]
+        pool[rows, chosen] = pool[:, position]
+        pool[:, position] = picked
+
+    main_numbers = np.sort(pool[:, :numbers], axis=1)
+    power_numbers = secure_below(power_high - power_low + 1, lines) + power_low
+    return main_numbers, power_numbers
@@ -0,0 +1,196 @@
+# src/utils/rate_limit.py
+import os
+import math
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from fastapi import Request, status, HTTPException
+from starlette.concurrency import run_in_threadpool
+from src.auth import SECRET_KEY, ALGORITHM, JWTError, jwt
+from src.utils.utils import load_config, logging
+
+
+# Used for routes that have no entry under rate_limits.routes in config.yml
+DEFAULT_ROUTE_LIMITS = {
+    'ticket_details': {'perUser': {'ratePerMinute': 20, 'burst': 5}, 'perIp': {'ratePerMinute': 60, 'burst': 20}},
+    'lotto_pool': {'perUser': {'ratePerMinute': 30, 'burst': 10}, 'perIp': {'ratePerMinute': 120, 'burst': 30}},
+    'signin': {'perIp': {'ratePerMinute': 20, 'burst': 10}},
+    'quick_pick': {'perUser': {'ratePerMinute': 30, 'burst': 10}, 'perIp': {'ratePerMinute': 120, 'burst': 30}},
+}
+
+
+class MemoryBucketStore:
+    """
+    Token buckets of this worker, kept in an OrderedDict in least recently used order.
+
+    Past max_keys each new bucket evicts the least recently used one, so a take costs the
+    same however many clients there are. The evicted bucket is the one idle the longest and
+    the likeliest to be full again, i.e. the same as a new one.
+    """
+
+    blocking = False
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, burst: float, now: float):
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+
+            if tokens >= 1:
+                tokens -= 1
+                allowed, retry_after = True, 0.0
+            else:
+                allowed, retry_after = False, (1 - tokens) / rate
+
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+
+        return allowed, retry_after
+
+
+class SqliteBucketStore:
+    """
+    Token buckets shared by every worker on the host through an SQLite file.
+
+    Each take is one short IMMEDIATE transaction, so the limits hold across gunicorn workers
+    at the cost of a local file write per limited request.
+    """
+
+    blocking = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)')
+            self._local.connection = connection
+        return connection
+
+    def take(self, key: str, rate: float, burst: float, now: float):
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute('SELECT tokens, updated FROM buckets WHERE key = ?', (key,)).fetchone()
+            tokens, updated = row if row is not None else (burst, now)
+            tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+
+            if tokens >= 1:
+                tokens -= 1
+                allowed, retry_after = True, 0.0
+            else:
+                allowed, retry_after = False, (1 - tokens) / rate
+
+            connection.execute('INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)', (key, tokens, now))
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+
+        return allowed, retry_after
+
+
+class RateLimiter:
+    """
+    Per-route token buckets keyed by client IP and by signed-in user.
+
+    Limits come from the rate_limits section of config.yml, one entry per route name with an
+    optional perIp and perUser limit of ratePerMinute requests and a burst allowance.
+    """
+
+    def __init__(self, store, routes: dict, trust_forwarded_for: bool = False, enabled: bool = True):
+        self.store = store
+        self.routes = routes
+        self.trust_forwarded_for = trust_forwarded_for
+        self.enabled = enabled
+
+    def client_ip(self, request: Request) -> str:
+        if self.trust_forwarded_for:
+            forwarded_for = request.headers.get('x-forwarded-for')
+            if forwarded_for:
+                return forwarded_for.split(',')[0].strip()
+        return request.client.host if request.client else 'unknown'
+
+    @staticmethod
+    def user_key(request: Request):
+        authorization = request.headers.get('authorization', '')
+        if not authorization.lower().startswith('bearer '):
+            return None
+        try:
+            return jwt.decode(authorization[7:], SECRET_KEY, algorithms=[ALGORITHM]).get('sub')
+        except JWTError:
+            # Rejected by the route's own authentication, the IP limit still applies
+            return None
+
+    def check(self, route: str, request: Request):
+        limits = self.routes.get(route)
+        if not self.enabled or not limits:
+            return
+
+        now = time.time()
+        checks = []
+        if 'perIp' in limits:
+            checks.append((f"{route}:ip:{self.client_ip(request)}", limits['perIp']))
+        if 'perUser' in limits:
+            user = self.user_key(request)
+            if user is not None:
+                checks.append((f"{route}:user:{user}", limits['perUser']))
+
+        for key, limit in checks:
+            rate = limit['ratePerMinute'] / 60.0
+            burst = limit.get('burst', limit['ratePerMinute'])
+            try:
+                allowed, retry_after = self.store.take(key, rate, burst, now)
+            except Exception as e:
+                # A broken shared store must not take the API down with it
+                logging.error("Rate limit store error for %s: %s", key, e)
+                return
+
+            if not allowed:
+                logging.warning("RATE LIMIT: %s exceeded, retry after %.1fs", key, retry_after)
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail='Too many requests',
+                    headers={'Retry-After': str(max(1, math.ceil(retry_after)))}
+                )
+
+
+def rate_limit(route: str):
+    """FastAPI dependency enforcing the limits configured for `route`."""
+    async def dependency(request: Request):
+        if rate_limiter.store.blocking:
+            await run_in_threadpool(rate_limiter.check, route, request)
+        else:
+            rate_limiter.check(route, request)
+    return dependency
+
+
+rate_limit_config = load_config().get('rate_limits', {})
+
+if rate_limit_config.get('backend', 'memory') == 'sqlite':
+    bucket_store = SqliteBucketStore(rate_limit_config.get('path', 'resources/rate_limits.sqlite3'))
+else:
+    bucket_store = MemoryBucketStore(rate_limit_config.get('maxKeys', 100000))
+
+rate_limiter = RateLimiter(
+    bucket_store,
+    {**DEFAULT_ROUTE_LIMITS, **rate_limit_config.get('routes', {})},
+    trust_forwarded_for=rate_limit_config.get('trustForwardedFor', False),
+    enabled=rate_limit_config.get('enabled', True)
+)
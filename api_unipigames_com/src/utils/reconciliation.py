@@ -0,0 +1,230 @@
+# src/utils/reconciliation.py
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import update
+from src.db.database import SessionLocal
+from src.db.models import Transaction
+from src.dependencies import pi_network
+from src.utils.audit_log import append_transaction_log
+from src.utils.transactions import complete_transaction, release_withdrawal_holds, OPEN_STATUSES
+from src.utils.utils import load_config, logging
+
+def decide(payment: dict, cancel_after: timedelta, now: datetime):
+    """What to do with a Pi payment that is not completed on our side: (action, txid, reason)."""
+    status = payment.get('status') or {}
+    txid = (payment.get('transaction') or {}).get('txid')
+
+    if status.get('cancelled') or status.get('user_cancelled'):
+        return 'cancel_local', None, 'cancelled on Pi'
+    if status.get('developer_completed') and txid:
+        return 'complete_local', txid, 'completed on Pi'
+    if txid and status.get('transaction_verified'):
+        return 'complete', txid, 'verified on chain'
+    if txid:
+        return 'flag', txid, 'waiting for blockchain verification'
+
+    created_at = payment.get('created_at')
+    if created_at:
+        created = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
+        if created.tzinfo is None:
+            created = created.replace(tzinfo=timezone.utc)
+        if now - created > cancel_after:
+            return 'cancel', None, f'no transaction after {cancel_after}'
+
+    return 'flag', None, 'no transaction yet'
+
+
+class PaymentReconciler:
+    """
+    Resolves payments left half-done when a client never came back to complete them.
+
+    Each sweep collects the Pi Platform's incomplete server payments (app-to-user
+    withdrawals) and every local deposit or withdrawal still approved after min_age, looks up
+    the Pi state of the latter with bounded concurrency, and then completes, cancels or
+    flags each one. Remote calls run on at most `concurrency` threads; local cancellations
+    are written with one UPDATE per batch. The size of what is left over is kept in
+    `backlog` for monitoring.
+    """
+
+    def __init__(self, session_factory, pi_network, concurrency: int = 4, batch_size: int = 200,
+                 min_age_minutes: float = 10, cancel_after_minutes: float = 60):
+        self._session_factory = session_factory
+        self._pi_network = pi_network
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.min_age = timedelta(minutes=min_age_minutes)
+        self.cancel_after = timedelta(minutes=cancel_after_minutes)
+        self._lock = threading.Lock()
+        self.backlog = {
+            'incomplete_server_payments': 0,
+            'approved_transactions': 0,
+            'flagged': 0,
+            'completed': 0,
+            'cancelled': 0,
+            'last_run': None,
+            'duration_seconds': None
+        }
+
+    def sweep(self):
+        # A slow sweep must not overlap the next scheduled one
+        if not self._lock.acquire(blocking=False):
+            logging.warning("RECONCILE: Previous sweep still running")
+            return self.backlog
+
+        started = time.monotonic()
+        try:
+            payments = {payment['identifier']: payment for payment in self._pi_network.get_incomplete_server_payments() or []}
+            server_count = len(payments)
+
+            local, unmatched = self._approved_transactions()
+            missing = [payment_id for payment_id in local if payment_id not in payments]
+
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='reconcile') as executor:
+                for payment_id, payment in zip(missing, executor.map(self._pi_network.get_payment, missing)):
+                    if payment:
+                        payments[payment_id] = payment
+                    else:
+                        logging.warning("RECONCILE: Pi did not return payment %s (transaction %s)", payment_id, local[payment_id])
+
+                now = datetime.now(timezone.utc)
+                plan = {payment_id: decide(payment, self.cancel_after, now) for payment_id, payment in payments.items()}
+                remote = [(payment_id, action, txid) for payment_id, (action, txid, _) in plan.items() if action in ('complete', 'cancel')]
+                results = dict(zip([payment_id for payment_id, _, _ in remote], executor.map(lambda item: self._apply_remote(*item), remote)))
+
+            # Approved transactions without a Pi payment id, or that Pi did not return, need a person
+            flagged = unmatched + len([payment_id for payment_id in local if payment_id not in payments])
+            completed, cancelled, resolved_flagged = self._apply_local(plan, results, dict(local))
+            flagged += resolved_flagged
+
+            self.backlog = {
+                'incomplete_server_payments': server_count,
+                'approved_transactions': len(local) + unmatched,
+                'flagged': flagged,
+                'completed': completed,
+                'cancelled': cancelled,
+                'last_run': datetime.now().isoformat(),
+                'duration_seconds': round(time.monotonic() - started, 3)
+            }
+            if completed or cancelled or flagged:
+                logging.info("RECONCILE: %s completed, %s cancelled, %s flagged", completed, cancelled, flagged)
+            return self.backlog
+        except Exception as e:
+            logging.error("RECONCILE: Sweep failed: %s", e)
+            return self.backlog
+        finally:
+            self._lock.release()
+
+    def _approved_transactions(self):
+        """Pi payment id -> local transaction id of deposits and withdrawals stuck in approved, and how many have no Pi payment id."""
+        cutoff = datetime.now() - self.min_age
+        found = {}
+        unmatched = 0
+        last_id = ''
+
+        session = self._session_factory()
+        try:
+            while True:
+                rows = session.query(Transaction.id, Transaction.reference_id).filter(
+                    Transaction.status == 'approved',
+                    Transaction.transaction_type.in_(('deposit', 'withdrawal')),
+                    Transaction.dateModified <= cutoff,
+                    Transaction.id > last_id
+                ).order_by(Transaction.id).limit(self.batch_size).all()
+
+                for transaction_id, reference_id in rows:
+                    if reference_id:
+                        found[reference_id] = transaction_id
+                    else:
+                        unmatched += 1
+                        logging.warning("RECONCILE: Approved transaction %s has no Pi payment id", transaction_id)
+
+                if len(rows) < self.batch_size:
+                    return found, unmatched
+                last_id = rows[-1][0]
+        finally:
+            session.close()
+
+    def _apply_remote(self, payment_id: str, action: str, txid: str) -> bool:
+        try:
+            if action == 'complete':
+                return bool(self._pi_network.complete_payment(payment_id, txid))
+            return bool(self._pi_network.cancel_payment(payment_id))
+        except Exception as e:
+            logging.error("RECONCILE: Pi %s of payment %s failed: %s", action, payment_id, e)
+            return False
+
+    def _apply_local(self, plan: dict, results: dict, local: dict):
+        completed = cancelled = flagged = 0
+        session = self._session_factory()
+        try:
+            # Server payments may not be in `local` yet, e.g. approved less than min_age ago. Only open
+            # transactions are matched, so a late Pi state cannot complete one cancelled here
+            lookup = [payment_id for payment_id in plan if payment_id not in local]
+            for start in range(0, len(lookup), self.batch_size):
+                for transaction_id, reference_id in session.query(Transaction.id, Transaction.reference_id).filter(
+                    Transaction.reference_id.in_(lookup[start:start + self.batch_size]),
+                    Transaction.status.in_(OPEN_STATUSES)
+                ):
+                    local.setdefault(reference_id, transaction_id)
+
+            to_cancel = []
+            for payment_id, (action, txid, reason) in plan.items():
+                transaction_id = local.get(payment_id)
+
+                if action in ('complete', 'cancel') and not results.get(payment_id):
+                    action, reason = 'flag', f'Pi {action} failed'
+
+                if transaction_id is None:
+                    if action == 'flag':
+                        flagged += 1
+                        logging.warning("RECONCILE: Pi payment %s has no local transaction: %s", payment_id, reason)
+                    continue
+
+                if action in ('complete', 'complete_local'):
+                    if complete_transaction(transaction_id, txid, session):
+                        completed += 1
+                    else:
+                        flagged += 1
+                elif action in ('cancel', 'cancel_local'):
+                    to_cancel.append((transaction_id, reason))
+                else:
+                    flagged += 1
+                    logging.warning("RECONCILE: Payment %s (transaction %s) left open: %s", payment_id, transaction_id, reason)
+
+            for start in range(0, len(to_cancel), self.batch_size):
+                batch = dict(to_cancel[start:start + self.batch_size])
+                cancelled_ids = session.execute(
+                    update(Transaction)
+                    .where(Transaction.id.in_(list(batch)), Transaction.status.in_(OPEN_STATUSES))
+                    .values(status='cancelled')
+                    .returning(Transaction.id)
+                    .execution_options(synchronize_session=False)
+                ).scalars().all()
+
+                for transaction_id in cancelled_ids:
+                    append_transaction_log(session, transaction_id, f"Transaction cancelled by reconciliation: {batch[transaction_id]}")
+                # Withdrawals that were never paid out get their held amount back with the cancellation
+                release_withdrawal_holds(cancelled_ids, session)
+                session.commit()
+                cancelled += len(cancelled_ids)
+        except Exception as e:
+            session.rollback()
+            logging.error("RECONCILE: Failed to apply results: %s", e)
+        finally:
+            session.close()
+
+        return completed, cancelled, flagged
+
+
+reconciliation_config = load_config().get('reconciliation', {})
+
+payment_reconciler = PaymentReconciler(
+    SessionLocal,
+    pi_network,
+    concurrency=reconciliation_config.get('concurrency', 4),
+    batch_size=reconciliation_config.get('batchSize', 200),
+    min_age_minutes=reconciliation_config.get('minAgeMinutes', 10),
+    cancel_after_minutes=reconciliation_config.get('cancelAfterMinutes', 60)
+)
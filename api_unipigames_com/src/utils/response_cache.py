@@ -0,0 +1,133 @@
+# src/utils/response_cache.py
+import gzip
+import hashlib
+import brotli
+from fastapi import Response, status
+from src.db.models import Game, GameType, GameConfig
+from src.utils.utils import dumps_json, load_config
+from src.utils.single_flight import single_flight
+from src.utils.cache import cache
+
+# Models whose changes invalidate the cached public game catalog responses
+CACHED_MODELS = (Game, GameType, GameConfig)
+
+# Variants smaller than this are not worth compressing
+MIN_COMPRESS_BYTES = 512
+
+
+class CachedBody:
+    def __init__(self, body: bytes, etag: str = None):
+        self.etag = etag or '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        self.variants = {'identity': body}
+
+        # Compressed once per data version and worker, then served as-is to every poll
+        if len(body) >= MIN_COMPRESS_BYTES:
+            self.variants['gzip'] = gzip.compress(body, compresslevel=6)
+            self.variants['br'] = brotli.compress(body, quality=5)
+
+    # The shared cache tier holds the JSON body and its ETag, each worker compresses its own copy
+    def to_json(self) -> dict:
+        return {'body': self.variants['identity'].decode('utf-8'), 'etag': self.etag}
+
+    @classmethod
+    def from_json(cls, data: dict):
+        return cls(data['body'].encode('utf-8'), data['etag'])
+
+
+class ResponseCache:
+    """
+    Caches the JSON bodies of rarely changing public read routes.
+
+    Entries are kept in the two-tier cache, keyed by path and query string, under a namespace
+    whose version is bumped whenever a Game, GameType or GameConfig change is committed. The
+    bump reaches every worker through the shared tier, and a body built by one worker is
+    served by all of them. The ETag is a hash of the body, so it is the same on every worker
+    serving the same data; max_age only bounds how long an unused entry is kept.
+    """
+
+    def __init__(self, cache, namespace: str = 'catalog', max_age: float = 300.0):
+        self.cache = cache
+        self.namespace = namespace
+        self.max_age = max_age
+        self._flight = single_flight('response_cache.catalog')
+
+    @property
+    def version(self) -> int:
+        return self.cache.version(self.namespace)
+
+    def invalidate(self):
+        self.cache.invalidate(self.namespace)
+
+    async def get_or_build(self, key: str, build) -> CachedBody:
+        entry = self.cache.get(self.namespace, key, decode=CachedBody.from_json)
+        if entry is not None:
+            return entry
+
+        # Concurrent misses for the same data build it once, in the threadpool so the others wait without blocking the loop
+        version = self.version
+        return await self._flight.do_async((key, version), self._build, key, version, build)
+
+    def _build(self, key: str, version: int, build) -> CachedBody:
+        entry = CachedBody(dumps_json(build()))
+        # Stored under the version read before building, a change committed meanwhile is never masked
+        self.cache.set(self.namespace, key, entry, self.max_age, version=version, encode=CachedBody.to_json)
+        return entry
+
+    async def respond(self, request, build) -> Response:
+        key = request.url.path + '?' + request.url.query
+        entry = await self.get_or_build(key, build)
+
+        headers = {
+            'ETag': entry.etag,
+            'Cache-Control': 'public, no-cache',
+            'Vary': 'Accept-Encoding',
+        }
+
+        if_none_match = request.headers.get('if-none-match')
+        if if_none_match and (if_none_match.strip() == '*' or entry.etag in [tag.strip() for tag in if_none_match.split(',')]):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        encoding = choose_encoding(request.headers.get('accept-encoding', ''), entry.variants)
+        if encoding != 'identity':
+            headers['Content-Encoding'] = encoding
+
+        return Response(content=entry.variants[encoding], status_code=status.HTTP_200_OK, media_type='application/json', headers=headers)
+
+
+def choose_encoding(accept_encoding: str, variants: dict) -> str:
+    accepted = set()
+    for part in accept_encoding.lower().split(','):
+        coding, _, params = part.strip().partition(';')
+        if params.strip().replace(' ', '') in ('q=0', 'q=0.0'):
+            continue
+        accepted.add(coding.strip())
+
+    for encoding in ('br', 'gzip'):
+        if encoding in variants and encoding in accepted:
+            return encoding
+    return 'identity'
+
+
+def track_catalog_changes(session, flush_context):
+    # Remember that this transaction touched the catalog, the version is bumped once it commits
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(instance, CACHED_MODELS):
+            session.info['catalog_changed'] = True
+            return
+
+def track_catalog_statements(orm_execute_state):
+    # Bulk UPDATE/DELETE statements bypass the flush, e.g. the game lifecycle scheduler
+    if (orm_execute_state.is_update or orm_execute_state.is_delete) and orm_execute_state.bind_mapper is not None:
+        if issubclass(orm_execute_state.bind_mapper.class_, CACHED_MODELS):
+            orm_execute_state.session.info['catalog_changed'] = True
+
+def invalidate_on_commit(session):
+    if session.info.pop('catalog_changed', False):
+        response_cache.invalidate()
+
+def forget_catalog_changes(session):
+    session.info.pop('catalog_changed', None)
+
+
+cache_config = load_config().get('response_cache', {})
+response_cache = ResponseCache(cache, max_age=cache_config.get('maxAgeSeconds', 300))
@@ -0,0 +1,126 @@
+# src/utils/single_flight.py
+import asyncio
+import threading
+from starlette.concurrency import run_in_threadpool
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Runs a call once for all concurrent callers asking for the same key.
+
+    The first caller for a key executes it, callers arriving while it is in flight wait for
+    and share its result or exception, and the next caller after it finishes starts a fresh
+    call. Nothing is cached. do() is for threads, do_async() for the event loop, where
+    waiters await the leader instead of each holding a threadpool thread.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._futures = {}
+        self.requests = 0
+        self.executions = 0
+        self.errors = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            self.requests += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def do_async(self, key, fn, *args):
+        """
+        Like do(), for a coroutine function or a blocking function, which runs in the threadpool.
+
+        The call runs in a task of its own that every caller, the first one included, awaits
+        through a shield. A caller that is cancelled, e.g. by a client disconnecting, only stops
+        waiting; the call goes on and the other callers still get its result.
+        """
+        with self._lock:
+            self.requests += 1
+            task = self._futures.get(key)
+            if task is None:
+                task = self._futures[key] = asyncio.get_running_loop().create_task(self._run(key, fn, args))
+                task.add_done_callback(_retrieve_exception)
+                self.executions += 1
+
+        return await asyncio.shield(task)
+
+    async def _run(self, key, fn, args):
+        try:
+            if asyncio.iscoroutinefunction(fn):
+                return await fn(*args)
+            return await run_in_threadpool(fn, *args)
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._lock:
+                del self._futures[key]
+
+    def metrics(self) -> dict:
+        with self._lock:
+            shared = self.requests - self.executions
+            return {
+                'requests': self.requests,
+                'executions': self.executions,
+                'shared': shared,
+                'errors': self.errors,
+                'in_flight': len(self._calls) + len(self._futures),
+                'coalescing_ratio': round(shared / self.requests, 4) if self.requests else 0.0
+            }
+
+
+def _retrieve_exception(task):
+    # Every caller may have been cancelled before the call failed, nobody is left to read the error
+    if not task.cancelled():
+        task.exception()
+
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+def single_flight(name: str) -> SingleFlight:
+    """The SingleFlight of a use site, created on first use so its metrics can be listed."""
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = SingleFlight(name)
+        return _registry[name]
+
+def single_flight_metrics() -> dict:
+    with _registry_lock:
+        flights = list(_registry.values())
+    return {flight.name: flight.metrics() for flight in flights}
@@ -0,0 +1,154 @@
+# src/utils/startup.py
+import os
+import fcntl
+import threading
+from contextlib import contextmanager
+from src.dependencies import pi_network
+from src.utils.utils import load_config, logging
+
+
+@contextmanager
+def file_lock(path: str):
+    """Exclusive lock on path held for the duration of the block, shared by all processes on the host."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    with open(path, 'a') as file:
+        fcntl.flock(file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(file, fcntl.LOCK_UN)
+
+
+class PiNetworkWarmup:
+    """
+    Connects PiNetwork to Horizon in the background once the worker is up.
+
+    Loading the app wallet account and the base fee used to happen at import time in every
+    worker, so a slow or unreachable Horizon delayed or failed the whole start. Here it is
+    retried with exponential backoff until it succeeds; until then pi_network.ready is False
+    and the routes that need Horizon answer 503. The on_ready callbacks run once connected.
+    """
+
+    def __init__(self, pi_network, retry_max_seconds: float = 60):
+        self._pi_network = pi_network
+        self._retry_max_seconds = retry_max_seconds
+        self._stopped = threading.Event()
+        self._thread = None
+        self.attempts = 0
+        self.last_error = None
+
+    def start(self, on_ready=()):
+        if self._thread is not None or self._pi_network.ready:
+            return
+
+        if not self._pi_network.keypair:
+            logging.warning("STARTUP: App wallet is not configured. Not connecting to Horizon")
+            return
+
+        self._on_ready = list(on_ready)
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='pi-network-warmup', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self):
+        delay = 1
+        while not self._connect():
+            if self._stopped.wait(delay):
+                return
+            delay = min(delay * 2, self._retry_max_seconds)
+
+        for callback in self._on_ready:
+            try:
+                callback()
+            except Exception as e:
+                logging.error("STARTUP: Warm-up callback %s failed: %s", getattr(callback, '__name__', callback), e)
+
+    def _connect(self) -> bool:
+        self.attempts += 1
+        try:
+            self._pi_network.connect()
+        except Exception as e:
+            self.last_error = str(e)
+            logging.error("STARTUP: Horizon not reachable: %s. Attempt %s", e, self.attempts)
+            return False
+
+        self.last_error = None
+        logging.info("STARTUP: Connected to Horizon after %s attempt(s)", self.attempts)
+        return True
+
+
+class LeaderElection:
+    """
+    Picks the one worker on the host that runs the singleton jobs.
+
+    Every gunicorn worker runs the startup handlers, but the periodic jobs and the Horizon
+    payment stream must run once. The leader is whichever worker holds a non-blocking flock
+    on path; the others retry every retry_seconds, so when the leader exits (and the kernel
+    drops its lock) another worker takes over and runs on_elected.
+    """
+
+    def __init__(self, path: str, retry_seconds: float = 15):
+        self.path = path
+        self.retry_seconds = retry_seconds
+        self.is_leader = False
+        self._file = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self, on_elected):
+        if self._thread is not None:
+            return
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._on_elected = on_elected
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='leader-election', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._file is not None:
+            # Closing the file releases the lock for the next worker
+            self._file.close()
+            self._file = None
+        self.is_leader = False
+
+    def _try_acquire(self) -> bool:
+        file = open(self.path, 'a')
+        try:
+            fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            file.close()
+            return False
+
+        self._file = file
+        return True
+
+    def _run(self):
+        while not self._stopped.is_set():
+            if self._try_acquire():
+                self.is_leader = True
+                logging.info("STARTUP: Worker %s is the leader, starting singleton jobs", os.getpid())
+                try:
+                    self._on_elected()
+                except Exception as e:
+                    logging.error("STARTUP: Starting singleton jobs failed: %s", e)
+                return
+            self._stopped.wait(self.retry_seconds)
+
+
+startup_config = load_config().get('startup', {})
+lock_dir = startup_config.get('lockDir', 'resources')
+
+pi_network_warmup = PiNetworkWarmup(pi_network, retry_max_seconds=startup_config.get('horizonRetryMaxSeconds', 60))
+leader_election = LeaderElection(os.path.join(lock_dir, 'leader.lock'), retry_seconds=startup_config.get('leaderRetrySeconds', 15))
+SCHEMA_LOCK_PATH = os.path.join(lock_dir, 'schema.lock')
@@ -0,0 +1,120 @@
+# src/utils/ticket_numbers.py
+import sys
+from sqlalchemy import text, bindparam
+
+# Main numbers are indexed as a bitmask with bit n set for number n. Written as fixed-width hex
+# it is one short string that is the same for every ordering of the same numbers
+MASK_BITS = 128
+MASK_WIDTH = MASK_BITS // 4
+
+def parse_numbers(numbers_played: str) -> list:
+    """Sorted main numbers of a ticket. Raises ValueError for anything but distinct integers in mask range."""
+    numbers = [int(value) for value in numbers_played.split(',') if value.strip()]
+    if len(set(numbers)) != len(numbers):
+        raise ValueError(f'Duplicate numbers: {numbers_played}')
+    if any(number < 0 or number >= MASK_BITS for number in numbers):
+        raise ValueError(f'Numbers must be between 0 and {MASK_BITS - 1}: {numbers_played}')
+    return sorted(numbers)
+
+def numbers_mask(numbers) -> str:
+    mask = 0
+    for number in numbers:
+        mask |= 1 << number
+    return format(mask, f'0{MASK_WIDTH}x')
+
+def mask_numbers(mask: str) -> list:
+    value = int(mask, 16)
+    return [number for number in range(MASK_BITS) if value >> number & 1]
+
+def ticket_mask(numbers_played: str):
+    """Mask of a ticket's numbers, or None when they cannot be indexed."""
+    try:
+        return numbers_mask(parse_numbers(numbers_played))
+    except (ValueError, AttributeError):
+        return None
+
+def backfill_ticket_numbers(connection, batch_size: int = 1000):
+    """
+    Fill ticket.numbers_mask and the ticket_number rows of tickets that do not have them.
+
+    Walks the ticket table by primary key in batches. Run on an autocommit connection every
+    batch commits on its own. Tickets already indexed are skipped, so it is resumable and can be
+    re-run to catch up tickets written by workers still running code without the index.
+    """
+    select_batch = text(
+        'SELECT id, game_id, numbers_played FROM ticket WHERE id > :last AND numbers_mask IS NULL ORDER BY id LIMIT :limit'
+    )
+    update_mask = text('UPDATE ticket SET numbers_mask = :mask WHERE id = :id')
+    delete_numbers = text('DELETE FROM ticket_number WHERE ticket_id IN :ids').bindparams(bindparam('ids', expanding=True))
+    insert_number = text('INSERT INTO ticket_number (ticket_id, game_id, number) VALUES (:ticket_id, :game_id, :number)')
+
+    last = 0
+    indexed = skipped = 0
+    while True:
+        rows = connection.execute(select_batch, {'last': last, 'limit': batch_size}).all()
+        if not rows:
+            break
+
+        masks, numbers = [], []
+        for ticket_id, game_id, numbers_played in rows:
+            mask = ticket_mask(numbers_played)
+            if mask is None:
+                skipped += 1
+                continue
+            masks.append({'id': ticket_id, 'mask': mask})
+            numbers += [{'ticket_id': ticket_id, 'game_id': game_id, 'number': number} for number in mask_numbers(mask)]
+
+        if masks:
+            connection.execute(delete_numbers, {'ids': [row['id'] for row in masks]})
+            connection.execute(insert_number, numbers)
+            connection.execute(update_mask, masks)
+            indexed += len(masks)
+        last = rows[-1][0]
+
+    print(f"Indexed {indexed} tickets, skipped {skipped} with numbers that cannot be indexed")
+
+def rebuild_number_counts(connection, game_id: int = None):
+    """
+    Recount how often each number of one game, or of every game, was played from the ticket tables.
+
+    Runs in the connection's transaction, so readers see either the old counts or the new
+    ones. Main numbers are counted from the ticket_number index and power numbers from ticket.
+    """
+    where = 'WHERE game_id = :game_id' if game_id is not None else ''
+    params = {'game_id': game_id} if game_id is not None else {}
+
+    connection.execute(text(f'DELETE FROM game_number_count {where}'), params)
+    connection.execute(text(
+        'INSERT INTO game_number_count (game_id, kind, number, count) '
+        f"SELECT game_id, 'main', number, COUNT(*) FROM ticket_number {where} GROUP BY game_id, number"
+    ), params)
+    connection.execute(text(
+        'INSERT INTO game_number_count (game_id, kind, number, count) '
+        f"SELECT game_id, 'power', power_number, COUNT(*) FROM ticket {where} GROUP BY game_id, power_number"
+    ), params)
+
+
+if __name__ == "__main__":
+    # Usage: python -m src.utils.ticket_numbers backfill [--batch=1000]
+    #        python -m src.utils.ticket_numbers recount [--game=ID]
+    if len(sys.argv) < 2 or sys.argv[1] not in ('backfill', 'recount'):
+        print("Usage: python -m src.utils.ticket_numbers backfill [--batch=1000] | recount [--game=ID]")
+        sys.exit(1)
+
+    from src.db.database import engine
+
+    batch = 1000
+    game = None
+    for arg in sys.argv:
+        if arg.startswith("--batch="):
+            batch = int(arg.split("=")[1])
+        elif arg.startswith("--game="):
+            game = int(arg.split("=")[1])
+
+    if sys.argv[1] == 'backfill':
+        with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+            backfill_ticket_numbers(connection, batch)
+    else:
+        with engine.begin() as connection:
+            rebuild_number_counts(connection, game)
+        print(f"Recounted the numbers of {'game ' + str(game) if game is not None else 'every game'}")
@@ -0,0 +1,53 @@
+# src/utils/token_cache.py
+import hashlib
+from src.utils.cache import cache
+from src.utils.single_flight import single_flight
+from src.utils.utils import load_config
+
+
+class VerifiedTokenCache:
+    """
+    Short-lived cache of the Pi Platform /v2/me payload for verified access tokens.
+
+    Entries live in the two-tier cache keyed by the sha256 of the token, so raw tokens are
+    never stored, and a token verified by one worker is trusted by the others. Only
+    successful verifications are cached, and only for ttl seconds, which bounds how long a
+    token revoked on the Pi side can still be used to sign in. Concurrent sign-ins with the
+    same token share one /v2/me call.
+    """
+
+    def __init__(self, cache, namespace: str = 'pi_me', ttl: float = 60.0):
+        self.cache = cache
+        self.namespace = namespace
+        self.ttl = ttl
+        self._flight = single_flight('pi.verify_token')
+
+    @staticmethod
+    def key(access_token: str) -> str:
+        return hashlib.sha256(access_token.encode('utf-8')).hexdigest()
+
+    def get(self, key: str):
+        return self.cache.get(self.namespace, key)
+
+    def put(self, key: str, payload):
+        self.cache.set(self.namespace, key, payload, self.ttl)
+
+    async def get_or_fetch(self, access_token: str, fetch):
+        """Return the cached payload, or run the blocking fetch(access_token) once for all waiters."""
+        key = self.key(access_token)
+        if self.ttl > 0:
+            payload = self.get(key)
+            if payload is not None:
+                return payload
+
+        def fetch_and_store():
+            payload = fetch(access_token)
+            if self.ttl > 0:
+                self.put(key, payload)
+            return payload
+
+        return await self._flight.do_async(key, fetch_and_store)
+
+
+api_config = load_config()['api']
+verified_token_cache = VerifiedTokenCache(cache, ttl=api_config.get('meCacheTtlSeconds', 60))
@@ -1,11 +1,15 @@
 # src/utils/transactions.py
+import hashlib
 from typing import Optional
+from sqlalchemy import update, cast, Float
 from jose import JWTError, jwt
 from typing_extensions import Annotated
 from datetime import datetime, timedelta, timezone
 from src.utils.utils import colorama, logging, uuid
 from src.auth import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, OAUTH2_SCHEME
-from src.db.models import User, UserScopes, Game, Transaction, TransactionData, Payment, TransactionLog, Session, AccountTransaction
+from src.db.models import User, UserScopes, Game, Transaction, TransactionData, Payment, Session, AccountTransaction, upsert_statement
+from src.utils.audit_log import append_transaction_log
+from src.utils.money import to_money, MONEY_SCALE
 from src.dependencies import get_db_session, Depends, status, HTTPException
 
 
@@ -13,32 +17,53 @@ from src.dependencies import get_db_session, Depends, status, HTTPException
 def update_user_data(user_data, db: Session):
     user = db.query(User).filter(User.username == user_data['username']).first()
     if user is None:
-        new_user = User(username=user_data['username'], uid=user_data['uid'])
-        db.add(new_user)
+        user = User(username=user_data['username'], uid=user_data['uid'])
+        db.add(user)
+        db.flush()
+
+    # Nothing is written when a returning user signs in with the scopes they already have
+    if sync_user_scopes(user, user_data['credentials']['scopes'], db):
         db.commit()
-        db.refresh(new_user)
-    else:
-        new_user = user
-
-    # Add the user's scopes to the database. Deactivate any scopes that are not in the user's credentials
-    for scope in user_data['credentials']['scopes']:
-        user_scope = db.query(UserScopes).filter(UserScopes.user_id == new_user.id, UserScopes.scope == scope).first()
-        if user_scope is None:
-            new_user_scope = UserScopes(user_id=new_user.id, scope=scope)
-            db.add(new_user_scope)
-            db.commit()
-        else:
-            user_scope.active = True
-            db.commit()
 
-    # Deactivate any scopes that are not in the user's credentials
-    user_scopes = db.query(UserScopes).filter(UserScopes.user_id == new_user.id).all()
-    for user_scope in user_scopes:
-        if user_scope.scope not in user_data['credentials']['scopes']:
-            user_scope.active = False
-            db.commit()
+    return user
+
+def hash_scopes(scopes) -> str:
+    return hashlib.sha256('\n'.join(sorted(set(scopes))).encode('utf-8')).hexdigest()
+
+def sync_user_scopes(user: User, scopes, db: Session) -> bool:
+    """
+    Make the user's active scopes match the scopes in their Pi credentials.
+
+    The stored set is diffed against the new one and applied with one bulk upsert of the
+    missing and inactive scopes and one bulk deactivate. The upsert resolves conflicts on
+    uq_user_scopes_user_scope, so concurrent sign-ins of the same user that read the same diff
+    do not fail on each other's rows. The hash of the last synced set is kept on the user, so
+    an unchanged set costs no query at all. Returns True if anything was changed; the caller
+    commits.
+    """
+    scopes = set(scopes)
+    scopes_hash = hash_scopes(scopes)
+    if user.scopes_hash == scopes_hash:
+        return False
 
-    return new_user
+    stored = dict(db.query(UserScopes.scope, UserScopes.active).filter(UserScopes.user_id == user.id))
+
+    activate = [scope for scope in scopes if not stored.get(scope)]
+    deactivate = [scope for scope, active in stored.items() if active and scope not in scopes]
+
+    if activate:
+        statement = upsert_statement(db.get_bind().dialect.name, UserScopes.__table__, ['user_id', 'scope'], lambda added: {'active': True})
+        db.execute(statement, [{'user_id': user.id, 'scope': scope, 'active': True} for scope in activate])
+    if deactivate:
+        db.execute(
+            update(UserScopes)
+            .where(UserScopes.user_id == user.id, UserScopes.scope.in_(deactivate))
+            .values(active=False)
+            .execution_options(synchronize_session=False)
+        )
+
+    user.scopes_hash = scopes_hash
+    return True
 
 # Function to generate a unique game_id. It verifies that the game_id is unique in the database
 def generate_game_id(db: Session):
@@ -78,46 +103,125 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def update_user_balance(user_id: int, transaction_amount: float, transaction_type: str, db: Session):
-    try:
-        user = db.query(User).get(user_id)
-        if user:
-            logging.info(colorama.Fore.GREEN + f"UPDATE: Updating user balance for user: {user.username} with transaction amount: {transaction_amount} and transaction type: {transaction_type}")
-
-            if transaction_type == 'deposit':
-                user.balance += transaction_amount
-            elif transaction_type == 'withdrawal':
-                user.balance -= transaction_amount
-            elif transaction_type == 'game_entry':
-                user.balance -= transaction_amount
-            elif transaction_type == 'game_winnings':
-                user.balance += transaction_amount
-            elif transaction_type == 'lotto_winnings':
-                user.balance += transaction_amount
-            elif transaction_type == 'lotto_entry':
-                user.balance -= transaction_amount
-            else:
-                raise ValueError('Invalid transaction type')
+# Statuses of transactions that can still be completed or cancelled
+OPEN_STATUSES = ('pending', 'approved')
+
+# Transaction types that add to or take from the user's balance
+CREDIT_TRANSACTION_TYPES = ('deposit', 'game_winnings', 'lotto_winnings', 'withdrawal_refund')
+DEBIT_TRANSACTION_TYPES = ('withdrawal', 'game_entry', 'lotto_entry')
+
+def apply_balance_change(user_id: int, transaction_type: str, amount, reference_id: str, db: Session):
+    """
+    Credit or debit the user's balance with one conditional UPDATE and add the ledger entry.
+
+    A debit only matches while the balance still covers it, so concurrent purchases and
+    withdrawals can neither overdraw the account nor overwrite each other's change, and no
+    row lock is held between reading and writing the balance. Nothing is committed here: the
+    UPDATE and the AccountTransaction INSERT go out in the caller's transaction.
+    Returns the new balance, or None if the user does not exist or cannot cover the debit.
+    """
+    amount = to_money(amount)
+    if transaction_type in CREDIT_TRANSACTION_TYPES:
+        delta = amount
+    elif transaction_type in DEBIT_TRANSACTION_TYPES:
+        delta = -amount
+    else:
+        raise ValueError('Invalid transaction type')
 
-            db.commit()
-            return True
-        else:
-            raise ValueError('User not found')
+    statement = update(User).where(User.id == user_id)
+    if delta < 0:
+        statement = statement.where(User.balance >= amount)
+
+    new_balance = db.execute(
+        statement
+        .values(balance=User.balance + delta, legacy_balance=cast(User.balance + delta, Float) / MONEY_SCALE)
+        .returning(User.balance)
+        .execution_options(synchronize_session='fetch')
+    ).scalar_one_or_none()
+
+    if new_balance is None:
+        return None
+
+    db.add(AccountTransaction(
+        user_id=user_id,
+        transaction_type=transaction_type,
+        amount=amount,
+        reference_id=reference_id
+    ))
+    return new_balance
+
+def held_withdrawals(transaction_ids, db: Session) -> set:
+    """Ids among transaction_ids whose withdrawal amount was taken from the user's balance and not given back."""
+    held, released = set(), set()
+    for reference_id, transaction_type in db.query(AccountTransaction.reference_id, AccountTransaction.transaction_type).filter(
+        AccountTransaction.reference_id.in_(list(transaction_ids)),
+        AccountTransaction.transaction_type.in_(('withdrawal', 'withdrawal_refund'))
+    ):
+        (held if transaction_type == 'withdrawal' else released).add(reference_id)
+    return held - released
+
+def hold_withdrawal(transaction: Transaction, db: Session) -> bool:
+    """
+    Debit a withdrawal before anything is paid out on Pi.
+
+    The conditional debit of apply_balance_change is the only balance check concurrent
+    withdrawals cannot both pass, so it has to be committed before the payment is created.
+    complete_transaction then leaves the balance alone, and cancelling the withdrawal gives
+    the amount back with release_withdrawal_holds. Nothing is committed here.
+    """
+    return apply_balance_change(transaction.user_id, 'withdrawal', transaction.amount, transaction.id, db) is not None
+
+def release_withdrawal_holds(transaction_ids, db: Session) -> int:
+    """Credit back the held amount of cancelled withdrawals, once each. The caller commits with the cancellation."""
+    held = held_withdrawals(transaction_ids, db)
+    if not held:
+        return 0
+
+    for transaction in db.query(Transaction).filter(Transaction.id.in_(list(held))):
+        apply_balance_change(transaction.user_id, 'withdrawal_refund', transaction.amount, transaction.id, db)
+        create_transaction_log(transaction.id, f"Withdrawal cancelled, held amount returned: {transaction.id}", db)
+    return len(held)
+
+def cancel_withdrawal(transaction_id: str, reason: str, db: Session) -> bool:
+    """Cancel a withdrawal that was not paid out and give its held amount back, in one commit."""
+    try:
+        cancelled = db.execute(
+            update(Transaction)
+            .where(Transaction.id == transaction_id, Transaction.status.in_(OPEN_STATUSES))
+            .values(status='cancelled')
+            .execution_options(synchronize_session='fetch')
+        ).rowcount
+        if cancelled != 1:
+            raise ValueError(f'Transaction is no longer open: {transaction_id}')
+
+        create_transaction_log(transaction_id, f"Transaction cancelled: {reason}", db)
+        release_withdrawal_holds([transaction_id], db)
+        db.commit()
+        return True
     except Exception as e:
         db.rollback()
-        logging.error(colorama.Fore.RED + f"ERROR: Failed to update users balance. User ID: {user_id}. {str(e)}")
+        logging.error("Error cancelling withdrawal %s: %s", transaction_id, e)
         return False
 
-def create_transaction_log(transaction_id: str, log_message: str, db: Session):
+def update_user_balance(user_id: int, transaction_amount, transaction_type: str, db: Session, reference_id: str = None):
     try:
-        log_entry = TransactionLog(transaction_id=transaction_id, log_message=log_message)
-        db.add(log_entry)
+        new_balance = apply_balance_change(user_id, transaction_type, transaction_amount, reference_id, db)
+        if new_balance is None:
+            raise ValueError('User not found or insufficient balance')
+
+        logging.info("UPDATE: Updated user balance for user: %s with transaction amount: %s and transaction type: %s. New balance: %s", user_id, transaction_amount, transaction_type, new_balance)
         db.commit()
+        return True
     except Exception as e:
         db.rollback()
-        logging.error(f"Error creating transaction log: {str(e)}")
+        logging.error("ERROR: Failed to update users balance. User ID: %s. %s", user_id, e)
+        return False
+
+# Transaction logs are buffered on the session and written with the caller's next commit
+def create_transaction_log(transaction_id: str, log_message: str, db: Session):
+    append_transaction_log(db, transaction_id, log_message)
 
-def create_transaction(user_id: int, ref_id: str, wallet_id: int, amount: float, transaction_type: str, memo: str, status: str, id: str = None, transactionData: dict = None, db: Session = Depends(get_db_session)):
+def create_transaction(user_id: int, ref_id: str, wallet_id: int, amount, transaction_type: str, memo: str, status: str, id: str = None, transactionData: dict = None, db: Session = Depends(get_db_session)):
     try:
         if id is None:
             transaction_id = str(uuid.uuid4())
@@ -129,7 +233,7 @@ def create_transaction(user_id: int, ref_id: str, wallet_id: int, amount: float,
             user_id=user_id,
             reference_id=ref_id,
             wallet_id=wallet_id,
-            amount=amount,
+            amount=to_money(amount),
             transaction_type=transaction_type,
             memo=memo,
             status=status
@@ -140,44 +244,54 @@ def create_transaction(user_id: int, ref_id: str, wallet_id: int, amount: float,
         if transactionData is not None and isinstance(transactionData, dict):
             existing_transaction_data = db.query(TransactionData).filter(TransactionData.transaction_id == transaction_id).first()
             if existing_transaction_data is not None:
-                logging.warning(f"Transaction data already exists for transaction: {transaction_id}. Ignoring new data.")
+                logging.warning("Transaction data already exists for transaction: %s. Ignoring new data.", transaction_id)
             else:
                 transaction_data = TransactionData(transaction_id=transaction_id, data=transactionData)
                 db.add(transaction_data)
         else:
-            logging.warning(f"Transaction data is not provided or is not a dictionary. Ignoring data. Transaction ID: {transaction_id}. User ID: {user_id}")
+            logging.warning("Transaction data is not provided or is not a dictionary. Ignoring data. Transaction ID: %s. User ID: %s", transaction_id, user_id)
 
-        db.commit()
         create_transaction_log(transaction_id, f"Transaction created: {transaction_id}", db)
+        db.commit()
         return transaction
     except Exception as e:
         db.rollback()
-        logging.error(f"Error creating transaction: {str(e)}")
+        logging.error("Error creating transaction: %s", e)
         return None
 
 def complete_transaction(transaction_id: str, txid: str, db: Session):
     try:
         transaction = db.query(Transaction).get(transaction_id)
         if transaction:
-            transaction.transaction_id = txid
-            transaction.status = 'completed'
+            # Clients, the payment stream and the reconciliation jobs may race to complete the same payment,
+            # and a transaction cancelled by the expiry or reconciliation jobs must stay cancelled
+            claimed = db.execute(
+                update(Transaction)
+                .where(Transaction.id == transaction_id, Transaction.status.in_(OPEN_STATUSES))
+                .values(status='completed', transaction_id=txid)
+                .execution_options(synchronize_session='fetch')
+            ).rowcount
+            if claimed != 1:
+                raise ValueError(f'Transaction already completed or cancelled: {transaction_id}')
 
             # Create payment record
             payment = Payment(id=transaction_id, user_id=transaction.user_id, amount=transaction.amount, memo=transaction.memo, transaction_id=txid, status='completed')
             db.add(payment)
-
-            db.commit()
             create_transaction_log(transaction_id, f"Transaction completed: {transaction_id}", db)
 
-            if update_user_balance(transaction.user_id, transaction.amount, transaction.transaction_type, db):
-                return True
-            else:
+            # The balance change commits together with the completed status, or not at all. Withdrawals
+            # have been debited since before they were paid out
+            debited = transaction.transaction_type == 'withdrawal' and bool(held_withdrawals([transaction_id], db))
+            if not debited and apply_balance_change(transaction.user_id, transaction.transaction_type, transaction.amount, transaction_id, db) is None:
                 raise ValueError('Failed to update user balance')
+
+            db.commit()
+            return True
         else:
             raise ValueError('Transaction not found')
     except Exception as e:
         db.rollback()
-        logging.error(f"Error completing transaction: {str(e)}")
+        logging.error("Error completing transaction: %s", e)
         return False
 
 # Dependency to get the current user
@@ -203,39 +317,12 @@ async def get_current_user(token: str = Depends(OAUTH2_SCHEME), db: Session = De
 
 def create_account_transaction(user_id, transaction_type, amount, reference_id, db):
     try:
-        user = db.query(User).get(user_id)
-        if not user:
-            raise ValueError('User not found')
-
-        # Update user balance based on transaction type
-        if transaction_type == 'deposit':
-            user.balance += amount
-        elif transaction_type == 'withdrawal':
-            if user.balance < amount:
-                raise ValueError('Insufficient balance for withdrawal')
-            user.balance -= amount
-        elif transaction_type == 'game_entry' or transaction_type == 'lotto_entry':
-            if user.balance < amount:
-                raise ValueError('Insufficient balance for game entry')
-            user.balance -= amount
-        elif transaction_type == 'game_winnings' or transaction_type == 'lotto_winnings':
-            user.balance += amount
-        else:
-            raise ValueError('Invalid transaction type')
-
-        # Create the account transaction
-        new_transaction = AccountTransaction(
-            user_id=user_id,
-            transaction_type=transaction_type,
-            amount=amount,
-            reference_id=reference_id
-        )
-        db.add(new_transaction)
+        if apply_balance_change(user_id, transaction_type, amount, reference_id, db) is None:
+            raise ValueError(f'User not found or insufficient balance for {transaction_type}')
 
         db.commit()
         return True
     except Exception as e:
         db.rollback()
-        logging.error(f"Failed to create account transaction: {str(e)}")
+        logging.error("Failed to create account transaction: %s", e)
         return False
-
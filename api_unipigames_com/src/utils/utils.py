@@ -1,14 +1,40 @@
 import yaml
 import os
+import copy
+import re
+import queue
+import atexit
 import logging
+import contextvars
 import colorama
 import uuid
 import requests
 import json
 from datetime import datetime
+from decimal import Decimal
+from logging.handlers import QueueHandler, QueueListener, WatchedFileHandler
 
 
-from fastapi.responses import JSONResponse
+import orjson
+from fastapi.responses import ORJSONResponse
+
+# Types orjson does not encode natively. Money amounts are Decimals and go out as JSON numbers
+def json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError
+
+# Serialize with orjson. Datetimes are encoded natively, no .isoformat() needed
+def dumps_json(content) -> bytes:
+    return orjson.dumps(content, default=json_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+# Project-wide response class, used as the app's default and by every route
+class JSONResponse(ORJSONResponse):
+    def render(self, content) -> bytes:
+        return dumps_json(content)
+
+# Parsed config files by path, with the modification time they were parsed at
+_config_cache = {}
 
 # Function to load the config file
 def load_config():
@@ -17,25 +43,130 @@ def load_config():
     cwd = os.getcwd()
     configPath = os.path.join(cwd, 'config', 'config.yml')
 
-    with open(configPath, 'r') as file:
-        config = yaml.safe_load(file)
-    return config
+    # Most modules read the config at import, parse the file again only when it changes
+    mtime = os.stat(configPath).st_mtime_ns
+    cached = _config_cache.get(configPath)
+    if cached is None or cached[0] != mtime:
+        with open(configPath, 'r') as file:
+            cached = (mtime, yaml.safe_load(file))
+        _config_cache[configPath] = cached
+
+    # Callers may modify their copy
+    return copy.deepcopy(cached[1])
+
+# Request id of the request being handled, attached to every log record
+request_id_var = contextvars.ContextVar('request_id', default=None)
+
+ANSI_ESCAPE = re.compile(r'\x1b\[[0-9;]*[A-Za-z]')
+
+_log_listener = None
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'timestamp': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': ANSI_ESCAPE.sub('', record.getMessage()),
+            'request_id': getattr(record, 'request_id', None),
+        }
+        if record.exc_text or record.exc_info:
+            entry['exception'] = record.exc_text or self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Hands records to the background listener.
+
+    Like the stdlib QueueHandler, the message is merged with its arguments and any traceback
+    rendered to text before the record is queued, so the writer thread never reads objects the
+    caller may still be changing. The line itself (timestamp, JSON) is formatted by the writer
+    thread. When the queue is full the record is dropped.
+    """
+
+    dropped = 0
+    exception_formatter = logging.Formatter()
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = self.exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            NonBlockingQueueHandler.dropped += 1
 
 # Function to configure logging
 def configure_logging(config):
-    logging.basicConfig(
-        level=config['logging']['level'],
-        format=config['logging']['format'],
-        handlers=[logging.StreamHandler()]
-    )
-
-    if 'filePath' in config['logging']:
-        file_handler = logging.FileHandler(
-            config['logging']['filePath'],
-            mode='a',
-            encoding=None,
-            delay=False
-        )
-        logging.getLogger().addHandler(file_handler)
+    global _log_listener
+    if _log_listener is not None:
+        return
+
+    log_config = config['logging']
+
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(logging.Formatter(log_config['format']))
+    handlers = [console_handler]
+
+    if 'filePath' in log_config:
+        log_dir = os.path.dirname(log_config['filePath'])
+        if log_dir:
+            os.makedirs(log_dir, exist_ok=True)
+
+        # Every worker appends to the same file, so none of them may rotate it. Rotation is left to
+        # logrotate or similar, each worker reopens the file once it has been moved away
+        file_handler = WatchedFileHandler(log_config['filePath'], mode='a', encoding='utf-8')
+        if log_config.get('json', True):
+            file_handler.setFormatter(JsonFormatter())
+        else:
+            file_handler.setFormatter(logging.Formatter(log_config['format']))
+        handlers.append(file_handler)
+
+    # Console and file writes happen on the listener thread, off the event loop
+    log_queue = queue.Queue(maxsize=log_config.get('queueSize', 10000))
+    queue_handler = NonBlockingQueueHandler(log_queue)
+    queue_handler.addFilter(RequestIdFilter())
+
+    root_logger = logging.getLogger()
+    root_logger.setLevel(log_config['level'])
+    root_logger.handlers = [queue_handler]
+
+    _log_listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _log_listener.start()
+    atexit.register(shutdown_logging)
+    # The app is imported in the gunicorn master before the workers are forked, and threads do not survive a fork
+    os.register_at_fork(after_in_child=restart_logging)
 
     colorama.init(autoreset=True)
+
+# Gives a forked process its own log queue and writer thread, the parent's keeps draining the old ones
+def restart_logging():
+    global _log_listener
+    if _log_listener is None:
+        return
+
+    log_queue = queue.Queue(maxsize=_log_listener.queue.maxsize)
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, NonBlockingQueueHandler):
+            handler.queue = log_queue
+
+    _log_listener = QueueListener(log_queue, *_log_listener.handlers, respect_handler_level=True)
+    _log_listener.start()
+
+# Drains the log queue and stops the writer thread
+def shutdown_logging():
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+        _log_listener = None
@@ -0,0 +1,49 @@
+# tests/conftest.py
+import os
+import sys
+import tempfile
+import yaml
+import pytest
+
+# load_config() reads config/config.yml from the working directory, and the src modules load it
+# when they are imported, so the tests run from a scratch directory holding a config built from
+# the example with its own SQLite database and no shared cache tier.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKDIR = tempfile.mkdtemp(prefix='pilotto-tests-')
+
+with open(os.path.join(ROOT, 'config', 'config.yml.example')) as example:
+    config = yaml.safe_load(example)
+config['database']['uri'] = 'sqlite:///' + os.path.join(WORKDIR, 'pilotto.db')
+config['cache']['backend'] = 'local'
+config['logging']['filePath'] = os.path.join(WORKDIR, 'logs', 'server.log')
+
+os.makedirs(os.path.join(WORKDIR, 'config'))
+with open(os.path.join(WORKDIR, 'config', 'config.yml'), 'w') as config_file:
+    yaml.safe_dump(config, config_file)
+
+os.chdir(WORKDIR)
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def db():
+    """A session on a freshly created schema."""
+    from src.db.database import Base, SessionLocal, engine, create_schema
+
+    Base.metadata.drop_all(bind=engine)
+    create_schema()
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def game_type(db):
+    from src.db.models import GameType
+
+    game_type = GameType(name='lotto')
+    db.add(game_type)
+    db.commit()
+    return game_type
@@ -0,0 +1,73 @@
+# tests/test_game_listing.py
+import datetime
+import pytest
+
+START = datetime.datetime(2026, 1, 1)
+
+
+@pytest.fixture
+def games(db, game_type):
+    from src.db.models import Game
+
+    # End times run backwards against ids, with a tie, so the two sort orders differ
+    end_times = [5, 4, 4, 3, 2, 1, 0]
+    games = [
+        Game(game_type_id=game_type.id, name=f'game {index}', entry_fee=1, max_players=10,
+             end_time=START + datetime.timedelta(days=days), status='ended' if index == 2 else 'active')
+        for index, days in enumerate(end_times)
+    ]
+    db.add_all(games)
+    db.commit()
+    return games
+
+def pages(db, **kwargs):
+    from src.utils.game_listing import list_games
+
+    cursor, result = None, []
+    while True:
+        page = list_games(db, ['id', 'end_time'], cursor=cursor, **kwargs)
+        result.append([game['id'] for game in page['games']])
+        cursor = page['next_cursor']
+        if cursor is None:
+            return result
+
+def test_pages_by_id(db, games):
+    ids = [game.id for game in games]
+    assert pages(db, limit=3) == [ids[0:3], ids[3:6], ids[6:7]]
+
+def test_pages_by_end_time(db, games):
+    expected = [game.id for game in sorted(games, key=lambda game: (game.end_time, game.id))]
+    result = pages(db, sort='end_time', limit=2)
+    assert [len(page) for page in result] == [2, 2, 2, 1]
+    assert sum(result, []) == expected
+
+def test_last_page_has_no_cursor(db, games):
+    assert pages(db, limit=len(games)) == [[game.id for game in games]]
+
+def test_pages_are_filtered(db, games):
+    result = pages(db, statuses=['active'], limit=4)
+    assert sum(result, []) == [game.id for game in games if game.status == 'active']
+
+def test_without_limit_every_game_is_returned(db, games):
+    from src.utils.game_listing import list_games
+
+    page = list_games(db, ['id'])
+    assert page == {'games': [{'id': game.id} for game in games]}
+
+def test_only_requested_fields_are_returned(db, games):
+    from src.utils.game_listing import list_games, parse_fields
+
+    page = list_games(db, parse_fields('name,game_type'), sort='end_time', limit=1)
+    assert page['games'] == [{'name': 'game 6', 'game_type': 'lotto'}]
+
+def test_invalid_cursor(db, games):
+    from src.utils.game_listing import list_games
+
+    with pytest.raises(ValueError):
+        list_games(db, ['id'], cursor='not a cursor', limit=2)
+
+def test_invalid_fields():
+    from src.utils.game_listing import parse_fields
+
+    with pytest.raises(ValueError):
+        parse_fields('id,secret')
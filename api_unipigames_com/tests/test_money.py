@@ -0,0 +1,49 @@
+# tests/test_money.py
+from decimal import Decimal
+import pytest
+from src.utils.money import MONEY_SCALE, to_money, to_units, from_units
+
+
+@pytest.mark.parametrize('value, expected', [
+    (0.1, Decimal('0.1')),
+    (0.1 + 0.2, Decimal('0.3')),
+    ('3.1415926', Decimal('3.1415926')),
+    (7, Decimal('7')),
+    # Half of the smallest unit rounds to even
+    ('0.00000005', Decimal('0')),
+    ('0.00000015', Decimal('0.0000002')),
+])
+def test_to_money(value, expected):
+    assert to_money(value) == expected
+
+def test_to_money_keeps_none():
+    assert to_money(None) is None
+
+@pytest.mark.parametrize('value', ['0', '0.0000001', '1.2345678', '123456789.9999999', '-2.5'])
+def test_units_round_trip(value):
+    units = to_units(value)
+    assert isinstance(units, int)
+    assert units == int(Decimal(value) * MONEY_SCALE)
+    assert from_units(units) == Decimal(value)
+
+def test_money_column_round_trip(db):
+    from src.db.models import User
+
+    db.add(User(username='alice', uid='alice-uid', balance=0.1 + 0.2))
+    db.commit()
+    db.expire_all()
+
+    user = db.query(User).filter(User.username == 'alice').one()
+    assert user.balance == Decimal('0.3')
+    assert isinstance(user.balance, Decimal)
+    # The legacy float column is kept in step for workers still reading it
+    assert user.legacy_balance == pytest.approx(0.3)
+
+def test_money_column_stores_units(db):
+    from sqlalchemy import text
+    from src.db.models import User
+
+    db.add(User(username='bob', uid='bob-uid', balance=Decimal('1.2345678')))
+    db.commit()
+
+    assert db.execute(text('SELECT balance_units FROM "user" WHERE username = :name'), {'name': 'bob'}).scalar() == 12345678
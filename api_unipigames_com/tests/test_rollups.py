@@ -0,0 +1,77 @@
+# tests/test_rollups.py
+import datetime
+from decimal import Decimal
+import pytest
+
+
+@pytest.fixture
+def game(db, game_type):
+    from src.db.models import Game
+
+    game = Game(game_type_id=game_type.id, name='game', entry_fee=1, max_players=10,
+                end_time=datetime.datetime(2026, 1, 1))
+    db.add(game)
+    db.commit()
+    return game
+
+def test_increment_rollup_creates_then_adds(db, game):
+    from src.db.database import engine
+    from src.db.models import GameStats, increment_rollup
+
+    with engine.begin() as connection:
+        increment_rollup(connection, GameStats, {'game_id': game.id}, tickets_sold=1, total_won=Decimal('0.1'))
+    with engine.begin() as connection:
+        increment_rollup(connection, GameStats, {'game_id': game.id}, tickets_sold=2, total_won=Decimal('0.2'))
+
+    stats = db.query(GameStats).filter(GameStats.game_id == game.id).one()
+    assert stats.tickets_sold == 3
+    assert stats.total_won == Decimal('0.3')
+    # Counters that were not passed keep their defaults
+    assert stats.players == 0
+
+def test_count_numbers(db, game):
+    from src.db.database import engine
+    from src.db.models import GameNumberCount, count_numbers
+
+    with engine.begin() as connection:
+        count_numbers(connection, game.id, 'main', [1, 2, 3], 1)
+        count_numbers(connection, game.id, 'main', [2, 3], 1)
+        count_numbers(connection, game.id, 'main', [3], -1)
+        count_numbers(connection, game.id, 'power', [], 1)
+
+    counts = dict(db.query(GameNumberCount.number, GameNumberCount.count).filter(GameNumberCount.game_id == game.id, GameNumberCount.kind == 'main'))
+    assert counts == {1: 1, 2: 2, 3: 1}
+    assert db.query(GameNumberCount).filter(GameNumberCount.kind == 'power').count() == 0
+
+def test_tickets_keep_rollups_current(db, game):
+    from src.db.models import User, Transaction, Ticket, GameStats, UserLeaderboard, GameNumberCount
+
+    user = User(username='dave', uid='dave-uid')
+    db.add(user)
+    db.commit()
+    transaction = Transaction(id='entry-1', user_id=user.id, amount=2, transaction_type='lotto_entry', memo='entry', status='completed')
+    db.add(transaction)
+    db.commit()
+
+    # One ticket per commit, as /api/submit-ticket writes them
+    tickets = []
+    for numbers in ('1,2,3,4,5', '1,6,7,8,9'):
+        ticket = Ticket(game_id=game.id, user_id=user.id, transaction_id=transaction.id, numbers_played=numbers, power_number=7)
+        db.add(ticket)
+        db.commit()
+        tickets.append(ticket)
+
+    stats = db.get(GameStats, game.id)
+    assert (stats.tickets_sold, stats.players) == (2, 1)
+    leaderboard = db.get(UserLeaderboard, user.id)
+    assert (leaderboard.tickets_played, leaderboard.games_played) == (2, 1)
+    assert db.get(GameNumberCount, (game.id, 'main', 1)).count == 2
+    assert db.get(GameNumberCount, (game.id, 'power', 7)).count == 2
+
+    db.delete(tickets[1])
+    db.commit()
+    db.expire_all()
+
+    assert db.get(GameStats, game.id).tickets_sold == 1
+    assert db.get(GameNumberCount, (game.id, 'main', 1)).count == 1
+    assert db.get(GameNumberCount, (game.id, 'main', 6)).count == 0
@@ -0,0 +1,64 @@
+# tests/test_transactions.py
+from decimal import Decimal
+import pytest
+
+
+@pytest.fixture
+def user(db):
+    from src.db.models import User
+
+    user = User(username='carol', uid='carol-uid', balance=Decimal('5'))
+    db.add(user)
+    db.commit()
+    return user
+
+def account_transactions(db, user):
+    from src.db.models import AccountTransaction
+
+    return db.query(AccountTransaction).filter(AccountTransaction.user_id == user.id).all()
+
+def test_credit(db, user):
+    from src.utils.transactions import apply_balance_change
+
+    assert apply_balance_change(user.id, 'deposit', '0.1', 'deposit-1', db) == Decimal('5.1')
+    db.commit()
+    db.refresh(user)
+    assert user.balance == Decimal('5.1')
+    assert [(entry.transaction_type, entry.amount) for entry in account_transactions(db, user)] == [('deposit', Decimal('0.1'))]
+
+def test_debit_of_whole_balance(db, user):
+    from src.utils.transactions import apply_balance_change
+
+    assert apply_balance_change(user.id, 'withdrawal', 5, 'withdrawal-1', db) == Decimal('0')
+    db.commit()
+    db.refresh(user)
+    assert user.balance == Decimal('0')
+
+def test_overdraft_is_refused(db, user):
+    from src.utils.transactions import apply_balance_change
+
+    assert apply_balance_change(user.id, 'lotto_entry', '5.0000001', 'ticket-1', db) is None
+    db.commit()
+    db.refresh(user)
+    assert user.balance == Decimal('5')
+    assert account_transactions(db, user) == []
+
+def test_refused_debit_leaves_later_debits_working(db, user):
+    from src.utils.transactions import apply_balance_change
+
+    assert apply_balance_change(user.id, 'withdrawal', 3, 'withdrawal-1', db) == Decimal('2')
+    assert apply_balance_change(user.id, 'withdrawal', 3, 'withdrawal-2', db) is None
+    assert apply_balance_change(user.id, 'withdrawal', 2, 'withdrawal-3', db) == Decimal('0')
+    db.commit()
+    assert [entry.reference_id for entry in account_transactions(db, user)] == ['withdrawal-1', 'withdrawal-3']
+
+def test_unknown_user(db):
+    from src.utils.transactions import apply_balance_change
+
+    assert apply_balance_change(12345, 'deposit', 1, 'deposit-1', db) is None
+
+def test_invalid_transaction_type(db, user):
+    from src.utils.transactions import apply_balance_change
+
+    with pytest.raises(ValueError):
+        apply_balance_change(user.id, 'gift', 1, 'gift-1', db)